@@ -1,19 +1,56 @@
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 import httpx
 import hashlib
+import hmac
 import time
 import json
 import re
-from typing import List, Dict
+import sys
+import tempfile
+import uuid
+from array import array
+from pathlib import Path
+from typing import Callable, List, Dict, Optional
+
+# Shared helpers live in the app package at the project root
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.utils.answer_store import AnswerStore, knowledge_base_fingerprint, normalize_school
+from app.utils.corpus_store import CorpusStore
+from app.utils.context_budget import ContextAssembler, fit_history, get_token_counter
+from app.utils.feedback import FEEDBACK_VALUES, FeedbackLog, create_feedback_sink, feedback_record
+from app.utils.feedback_priors import chunk_id, load_feedback_priors
+from app.utils.history import HistoryManager, normalize_role, summary_messages
+from app.utils.intents import IntentRouter, with_field
+from app.utils.knowledge_base import KnowledgeBase, KnowledgeBaseSnapshot, file_digest, file_signature
+from app.utils.metadata_filter import Where, all_of, url_domain
+from app.utils.schools import SCHOOL_NAMES, school_filter, school_partitions, school_where, tag_school
+from app.utils.sessions import create_session_store
+from app.utils.log import RequestContextMiddleware, get_logger, sampled
+from app.utils.metrics import (
+    CONTENT_TYPE, LLM_PROMPT_TOKENS, REGISTRY, REQUEST_SECONDS, RequestMetricsMiddleware, record_llm_usage
+)
+from app.utils.singleflight import SingleFlight
+from app.utils.static_assets import FingerprintedStaticFiles, load_index_page
+
+try:
+    import orjson  # noqa: F401  (required by ORJSONResponse)
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
 
 # Create FastAPI app
 app = FastAPI(
     title="Star College Chatbot",
     description="A chatbot for Star College in Durban",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -24,42 +61,147 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware, paths=["/chat"])
+app.add_middleware(RequestContextMiddleware)
+
+# Structured JSON logs written by a background thread; retrieval diagnostics are sampled
+logger = get_logger("api")
+retrieval_logger = get_logger("retrieval")
 
 # Get environment variables
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+# Overridable so benchmarks can point at a local fake server
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
 
 # Simple in-memory cache for faster responses
 response_cache = {}
 CACHE_DURATION = 300  # 5 minutes cache
 
-# Load processed data
-processed_data = []
-
-def load_processed_data():
-    """Load all processed data from JSON files for RAG knowledge base"""
-    global processed_data
-    if processed_data:  # Already loaded
-        return processed_data
-
-    print("🔄 Loading Star College RAG Knowledge Base...")
-
-    # Try different possible paths for Vercel deployment
-    possible_paths = [
-        ["processed/sample_data.json", "processed/uploads_data.json", "processed/web_data.json"],
-        ["./processed/sample_data.json", "./processed/uploads_data.json", "./processed/web_data.json"],
-        ["/var/task/processed/sample_data.json", "/var/task/processed/uploads_data.json", "/var/task/processed/web_data.json"]
-    ]
-
+# In-flight deduplication of identical questions (same key as the cache)
+request_coalescer = SingleFlight()
+
+# DeepSeek connection limit per request client
+DEEPSEEK_MAX_CONNECTIONS = 10
+
+# Prompt tokens available for retrieved context (sections include their headers)
+# and for the verbatim recent turns of a conversation
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+
+# Server-side chat sessions: "memory" (per process) or "sqlite" (shared by the workers on a host)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(tempfile.gettempdir(), "starbot_sessions.db"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_MB = float(os.getenv("SESSION_MAX_MB", "64"))
+
+# Feedback is queued and appended in batches to a "jsonl" file or a "sqlite" table;
+# FEEDBACK_FSYNC is "batch" (sync every write), "interval" (about once a second) or "off"
+FEEDBACK_STORE = os.getenv("FEEDBACK_STORE", "jsonl").lower()
+FEEDBACK_PATH = os.getenv("FEEDBACK_PATH", os.path.join(tempfile.gettempdir(), "starbot_feedback.jsonl"))
+FEEDBACK_FSYNC = os.getenv("FEEDBACK_FSYNC", "interval").lower()
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "100"))
+FEEDBACK_FLUSH_SECONDS = float(os.getenv("FEEDBACK_FLUSH_SECONDS", "1"))
+# Per-chunk and per-source retrieval boosts built from feedback by build_feedback_priors.py
+FEEDBACK_PRIORS_PATH = os.path.join(PROJECT_ROOT, os.getenv("FEEDBACK_PRIORS_PATH", "processed/feedback_priors.json"))
+
+# Chat responses carry only the answer, sources and a few metadata fields unless
+# verbose (VERBOSE_RESPONSES, ?debug=1 or "verbose": true in the body), which adds
+# the duplicate "response" field and the pipeline diagnostics
+VERBOSE_RESPONSES = os.getenv("VERBOSE_RESPONSES", "False").lower() in ("true", "1", "t")
+SLIM_METADATA_KEYS = ("response_type", "cached", "school_context", "model_used", "tokens_used", "error", "error_type")
+
+def chat_response(response_obj: Dict, verbose: bool) -> Response:
+    """Serialize a chat response with orjson, without diagnostics unless verbose"""
+    if not verbose:
+        metadata = response_obj.get("metadata") or {}
+        response_obj = {key: value for key, value in response_obj.items() if key != "response"}
+        response_obj["metadata"] = {key: metadata[key] for key in SLIM_METADATA_KEYS if key in metadata}
+    # Returning a Response skips FastAPI's jsonable_encoder pass over the whole object
+    return FastJSONResponse(response_obj)
+
+# Greetings and quick answers, matched before retrieval
+INTENTS_PATH = os.path.join(PROJECT_ROOT, os.getenv("INTENTS_PATH", "data/intents.json"))
+
+def load_intent_router() -> IntentRouter:
+    try:
+        return IntentRouter.from_file(INTENTS_PATH)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("Could not load intents; quick answers disabled", extra={"path": INTENTS_PATH, "error": str(e)})
+        return IntentRouter([])
+
+intent_router = load_intent_router()
+
+# Frequent questions answered ahead of time by build_answer_store.py; served only while
+# the loaded knowledge base matches the one the answers were generated from
+ANSWER_STORE_PATH = os.path.join(PROJECT_ROOT, os.getenv("ANSWER_STORE_PATH", "processed/answer_store.json"))
+ANSWER_STORE_MIN_SIMILARITY = float(os.getenv("ANSWER_STORE_MIN_SIMILARITY", "0.8"))
+
+# Processed data, tried as a set in order: working directory, then Vercel's task root
+DATA_FILE_SETS = [
+    ["processed/sample_data.json", "processed/uploads_data.json", "processed/web_data.json"],
+    ["./processed/sample_data.json", "./processed/uploads_data.json", "./processed/web_data.json"],
+    ["/var/task/processed/sample_data.json", "/var/task/processed/uploads_data.json", "/var/task/processed/web_data.json"]
+]
+# Seconds between checks of the data files for changes (0 disables; POST /admin/reload
+# with ADMIN_TOKEN reloads on demand)
+KB_WATCH_SECONDS = float(os.getenv("KB_WATCH_SECONDS", "5"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Pipeline metrics, exported on /metrics
+STAGE_SECONDS = REGISTRY.histogram("starbot_stage_duration_seconds", "Time spent in each RAG pipeline stage", ["stage"])
+CACHE_HITS = REGISTRY.counter("starbot_cache_hits_total", "Chat responses served from the response cache")
+QUICK_ANSWERS = REGISTRY.counter("starbot_quick_answers_total", "Chat responses served from quick answers")
+WELCOME_ANSWERS = REGISTRY.counter("starbot_welcome_answers_total", "Chat responses served as welcome messages")
+STORED_ANSWERS = REGISTRY.counter("starbot_stored_answers_total", "Chat responses served from the precomputed answer store")
+INTENT_ANSWERS = REGISTRY.counter("starbot_intent_answers_total", "Chat responses served from a canned intent", ["intent"])
+ERRORS = REGISTRY.counter("starbot_errors_total", "Chat requests that ended in an error response", ["type"])
+CONTEXT_TOKENS = REGISTRY.histogram("starbot_context_tokens", "Prompt tokens spent on retrieved context",
+                                    buckets=(100, 200, 400, 600, 800, 1000, 1200, 1600, 2400, 4000))
+CONTEXT_TOKENS_SAVED = REGISTRY.counter("starbot_context_tokens_saved_total",
+                                        "Context tokens not sent compared with including every retrieved chunk in full")
+DEEPSEEK_IN_FLIGHT = REGISTRY.gauge("starbot_deepseek_requests_in_flight", "DeepSeek calls currently in progress")
+REGISTRY.gauge("starbot_deepseek_max_connections", "Connection limit of the DeepSeek client",
+               function=lambda: DEEPSEEK_MAX_CONNECTIONS)
+REGISTRY.gauge("starbot_corpus_chunks", "Chunks in the loaded knowledge base", function=lambda: knowledge_base.stats()["chunks"])
+REGISTRY.counter("starbot_kb_reloads_total", "Knowledge base reloads that swapped in a new version",
+                 function=lambda: knowledge_base.reloads)
+REGISTRY.counter("starbot_kb_reload_failures_total", "Knowledge base reloads that failed and kept the current snapshot",
+                 function=lambda: knowledge_base.reload_failures)
+REGISTRY.gauge("starbot_answer_store_entries", "Precomputed answers being served (0 while the store is stale)",
+               function=lambda: active_answer_store_entries())
+REGISTRY.gauge("starbot_response_cache_entries", "Entries in the response cache", function=lambda: len(response_cache))
+REGISTRY.gauge("starbot_coalesced_waiters", "Requests waiting on an identical in-flight question",
+               function=lambda: request_coalescer.stats()["waiters"])
+REGISTRY.counter("starbot_coalesced_requests_total", "Requests served by an identical in-flight question",
+                 function=lambda: request_coalescer.deduplicated)
+REGISTRY.gauge("starbot_sessions", "Chat sessions with server-side history",
+               function=lambda: history_manager.stats()["sessions"])
+REGISTRY.counter("starbot_history_summaries_total", "Older conversation turns folded into a rolling summary",
+                 function=lambda: history_manager.summaries)
+FEEDBACK = REGISTRY.counter("starbot_feedback_total", "Feedback submissions by rating", ["feedback"])
+REGISTRY.gauge("starbot_feedback_pending", "Feedback records queued but not yet written",
+               function=lambda: feedback_log.stats()["pending"])
+REGISTRY.counter("starbot_feedback_dropped_total", "Feedback records dropped because the queue was full",
+                 function=lambda: feedback_log.dropped)
+REGISTRY.counter("starbot_feedback_write_failures_total", "Failed feedback batch writes (records are retried)",
+                 function=lambda: feedback_log.write_failures)
+
+def read_processed_files(strict: bool = False):
+    """Read the first set of processed JSON files that exists; (chunks, files loaded).
+
+    Unreadable files are logged and skipped, or raise when strict (reloads), so a
+    half-written file never replaces a good knowledge base.
+    """
     all_data = []
     files_loaded = 0
 
-    for path_set in possible_paths:
+    for path_set in DATA_FILE_SETS:
         if files_loaded > 0:
             break
 
         for file_path in path_set:
             try:
-                print(f"📁 Checking: {file_path}")
+                logger.debug("Checking data file", extra={"file": file_path})
                 if os.path.exists(file_path):
                     with open(file_path, 'r', encoding='utf-8') as f:
                         data = json.load(f)
@@ -77,17 +219,19 @@ def load_processed_data():
 
                             all_data.extend(valid_items)
                             files_loaded += 1
-                            print(f"✅ Loaded {len(valid_items)} chunks from {file_path}")
+                            logger.info("Loaded data file", extra={"file": file_path, "chunks": len(valid_items)})
                         else:
-                            print(f"⚠️  {file_path} is empty or invalid format")
+                            logger.warning("Data file is empty or invalid", extra={"file": file_path})
                 else:
-                    print(f"❌ File not found: {file_path}")
+                    logger.debug("Data file not found", extra={"file": file_path})
             except Exception as e:
-                print(f"❌ Error loading {file_path}: {e}")
+                logger.error("Error loading data file", extra={"file": file_path, "error": str(e)})
+                if strict:
+                    raise
 
     # Enhanced fallback data if no files loaded
     if not all_data:
-        print("⚠️  No processed data files found, creating comprehensive fallback knowledge base")
+        logger.warning("No processed data files found, using fallback knowledge base")
         all_data = [
             {
                 "text": "Star College Durban is a prestigious private, independent school located at 20 Kinloch Ave, Westville North, Durban, South Africa. Established in 2002 by the Horizon Educational Trust, the school offers comprehensive education from Grade RR to Grade 12, encompassing pre-primary, primary, and high school levels.",
@@ -107,79 +251,155 @@ def load_processed_data():
             }
         ]
 
-    processed_data = all_data
-    print(f"🎯 RAG Knowledge Base Ready: {len(processed_data)} chunks loaded from {files_loaded} files")
+    return all_data, files_loaded
+
+def watched_files() -> List[str]:
+    """Files a knowledge base snapshot is built from"""
+    return [path for path_set in DATA_FILE_SETS for path in path_set] + [FEEDBACK_PRIORS_PATH, ANSWER_STORE_PATH]
+
+def build_snapshot(initial: bool = True, items: List[Dict] = None) -> KnowledgeBaseSnapshot:
+    """Build a complete knowledge base snapshot: chunks, version, feedback priors and answer store"""
+    load_started = time.perf_counter()
+    # Taken before reading, so a change during the build triggers another reload
+    files = file_signature(watched_files())
+    if items is None:
+        logger.info("Loading knowledge base")
+        items, files_loaded = read_processed_files(strict=not initial)
+    else:
+        files_loaded = 0
+
+    # Stable IDs, so feedback on a cited chunk can be traced back to it; schools for
+    # data processed before ingestion tagged them
+    for item in items:
+        item.setdefault('metadata', {})
+        item['metadata']['chunk_id'] = chunk_id(item['metadata'].get('source_file', ''), item['text'])
+        item['metadata']['school'] = tag_school(item['text'], item['metadata'])
+        if item['metadata'].get('url') and 'domain' not in item['metadata']:
+            item['metadata']['domain'] = url_domain(item['metadata']['url'])
+    corpus_version = knowledge_base_fingerprint(items)
+    # Priors and stored answers change responses too, so they are part of the version
+    # that response caches are keyed by
+    version = f"{corpus_version}-{file_digest([FEEDBACK_PRIORS_PATH, ANSWER_STORE_PATH])[:8]}"
+
+    # Chunk and source priors folded into one factor per chunk, so scoring is a list lookup
+    feedback_priors = load_feedback_priors(FEEDBACK_PRIORS_PATH)
+    chunk_priors = array('d', feedback_priors.chunk_boosts(items)) if feedback_priors else array('d')
+    answer_store = AnswerStore.from_file(ANSWER_STORE_PATH, ANSWER_STORE_MIN_SIMILARITY)
+    if answer_store.entries and not answer_store.active(corpus_version):
+        logger.warning("Answer store was built from a different knowledge base; not serving it",
+                       extra={"store_fingerprint": answer_store.kb_fingerprint, "kb_fingerprint": corpus_version})
+
+    # One text buffer and interned metadata columns instead of a dict per chunk
+    store = CorpusStore(items)
+
+    load_seconds = time.perf_counter() - load_started
+    STAGE_SECONDS.observe(load_seconds, stage="data_load")
 
     # Log source breakdown
-    source_breakdown = {}
-    for item in processed_data:
-        source_type = item.get('metadata', {}).get('source_type', 'unknown')
-        source_breakdown[source_type] = source_breakdown.get(source_type, 0) + 1
+    source_breakdown = dict(store.count_by('source_type', 'unknown'))
+
+    logger.info("Knowledge base ready", extra={
+        "version": version,
+        "chunks": len(store),
+        "files": files_loaded,
+        "source_breakdown": source_breakdown,
+        "seconds": round(load_seconds, 3)
+    })
+    return KnowledgeBaseSnapshot(
+        version=version,
+        items=store,
+        # corpus_version fingerprints the chunks alone; answer stores are built against it
+        extras={"chunk_priors": chunk_priors, "answer_store": answer_store, "corpus_version": corpus_version},
+        files=files
+    )
+
+# The knowledge base in use; reloads build a new snapshot and swap it in, while
+# requests keep the snapshot they started with
+knowledge_base = KnowledgeBase(build_snapshot, watched_files, KB_WATCH_SECONDS)
 
-    print(f"📊 Source breakdown: {source_breakdown}")
-    return processed_data
-
-def calculate_similarity_score(query: str, text: str) -> float:
-    """Advanced similarity scoring for RAG retrieval"""
+def load_processed_data():
+    """Chunks of the current knowledge base, loading it on first use"""
+    return knowledge_base.current.items
+
+def active_answer_store_entries() -> int:
+    snapshot = knowledge_base._current
+    if snapshot is None or not snapshot.extras["answer_store"].active(snapshot.extras["corpus_version"]):
+        return 0
+    return snapshot.extras["answer_store"].entries
+
+# Enhanced stop words for better matching
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'could', 'should', 'can', 'may', 'might', 'must', 'shall', 'this',
+    'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him',
+    'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their'
+}
+
+EDUCATION_KEYWORDS = {
+    'school', 'college', 'education', 'student', 'matric', 'grade', 'academic', 'curriculum',
+    'teacher', 'learning', 'exam', 'result', 'performance', 'achievement', 'distinction',
+    'pass', 'rate', 'facility', 'campus', 'admission', 'enrollment'
+}
+
+def similarity_scorer(query: str) -> Callable[[str], float]:
+    """calculate_similarity_score with the query side prepared once, for scoring many texts"""
     query_lower = query.lower().strip()
-    text_lower = text.lower().strip()
-
-    if not query_lower or not text_lower:
-        return 0.0
-
-    # Enhanced stop words for better matching
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-        'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did',
-        'will', 'would', 'could', 'should', 'can', 'may', 'might', 'must', 'shall', 'this',
-        'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him',
-        'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their'
-    }
 
     # Extract meaningful keywords
-    query_words = [word for word in query_lower.split() if word not in stop_words and len(word) > 2]
-    text_words = set(word for word in text_lower.split() if len(word) > 2)
-
+    query_words = [word for word in query_lower.split() if word not in STOP_WORDS and len(word) > 2]
     if not query_words:
-        return 0.0
-
-    # 1. Exact word matches (highest weight)
-    exact_matches = sum(1 for word in query_words if word in text_lower)
-
-    # 2. Partial word matches (medium weight)
-    partial_matches = sum(1 for word in query_words
-                         if any(word in text_word or text_word in word for text_word in text_words))
-
-    # 3. Phrase matches (very high weight)
-    phrase_bonus = 0
-    for i in range(len(query_words) - 1):
-        phrase = f"{query_words[i]} {query_words[i+1]}"
-        if phrase in text_lower:
-            phrase_bonus += 3
-
-    # 4. Longer phrase matches (maximum weight)
-    for i in range(len(query_words) - 2):
-        long_phrase = f"{query_words[i]} {query_words[i+1]} {query_words[i+2]}"
-        if long_phrase in text_lower:
-            phrase_bonus += 5
-
-    # 5. Educational keywords bonus
-    education_keywords = {
-        'school', 'college', 'education', 'student', 'matric', 'grade', 'academic', 'curriculum',
-        'teacher', 'learning', 'exam', 'result', 'performance', 'achievement', 'distinction',
-        'pass', 'rate', 'facility', 'campus', 'admission', 'enrollment'
-    }
+        return lambda text: 0.0
+
+    # A word partially matches a text word (longer than 2 characters) that contains it or
+    # that it contains: the word occurs in the text at all, or a whole text word is one
+    # of its substrings, which one set intersection per text finds for all words at once
+    pieces = {word: {word[i:j] for i in range(len(word)) for j in range(i + 3, len(word) + 1)}
+              for word in set(query_words)}
+    all_pieces = set().union(*pieces.values())
+    phrases = [f"{query_words[i]} {query_words[i+1]}" for i in range(len(query_words) - 1)]
+    long_phrases = [f"{query_words[i]} {query_words[i+1]} {query_words[i+2]}" for i in range(len(query_words) - 2)]
+    education_words = [word for word in query_words if word in EDUCATION_KEYWORDS]
+    max_possible_score = len(query_words) * 3
 
-    education_bonus = sum(2 for word in query_words if word in education_keywords and word in text_lower)
+    def score(text: str) -> float:
+        text_lower = text.lower().strip()
+        if not text_lower:
+            return 0.0
 
-    # Calculate weighted score
-    total_score = (exact_matches * 3 + partial_matches * 1 + phrase_bonus + education_bonus)
-    max_possible_score = len(query_words) * 3
+        # 1. Exact word matches (highest weight)
+        present = [word in text_lower for word in query_words]
+        exact_matches = sum(present)
 
-    # Normalize to 0-1 range with bonus for high relevance
-    normalized_score = min(total_score / max_possible_score, 2.0)
+        # 2. Partial word matches (medium weight)
+        partial_matches = exact_matches
+        if exact_matches < len(query_words):
+            whole_words = all_pieces.intersection(text_lower.split())
+            partial_matches += sum(1 for word, found in zip(query_words, present)
+                                   if not found and not pieces[word].isdisjoint(whole_words))
 
-    return round(normalized_score, 3)
+        # 3. Phrase matches (very high weight)
+        phrase_bonus = sum(3 for phrase in phrases if phrase in text_lower)
+
+        # 4. Longer phrase matches (maximum weight)
+        phrase_bonus += sum(5 for phrase in long_phrases if phrase in text_lower)
+
+        # 5. Educational keywords bonus
+        education_bonus = sum(2 for word in education_words if word in text_lower)
+
+        # Calculate weighted score
+        total_score = (exact_matches * 3 + partial_matches * 1 + phrase_bonus + education_bonus)
+
+        # Normalize to 0-1 range with bonus for high relevance
+        normalized_score = min(total_score / max_possible_score, 2.0)
+
+        return round(normalized_score, 3)
+
+    return score
+
+def calculate_similarity_score(query: str, text: str) -> float:
+    """Advanced similarity scoring for RAG retrieval"""
+    return similarity_scorer(query)(text)
 
 def enhance_response_formatting(response: str) -> str:
     """Post-process response to ensure professional formatting"""
@@ -227,29 +447,37 @@ def enhance_response_formatting(response: str) -> str:
 
     return response.strip()
 
-def retrieve_relevant_chunks(query: str, max_results: int = 5, min_score: float = 0.15) -> List[Dict]:
-    """Advanced RAG Retrieval with intelligent ranking"""
-    if not processed_data:
-        load_processed_data()
-
-    print(f"🔍 RAG Retrieval: Searching {len(processed_data)} chunks for: '{query[:50]}...'")
-
-    results = []
-
-    # Score all chunks
-    for idx, item in enumerate(processed_data):
-        text = item.get('text', '').strip()
+def retrieve_relevant_chunks(query: str, max_results: int = 5, min_score: float = 0.15,
+                             snapshot: KnowledgeBaseSnapshot = None, school: Optional[str] = None,
+                             where: Optional[Where] = None) -> List[Dict]:
+    """Advanced RAG Retrieval with intelligent ranking; a selected school searches its chunks and the
+    shared ones, and a metadata filter (app/utils/metadata_filter.py) the chunks passing it"""
+    snapshot = snapshot or knowledge_base.current
+    processed_data = snapshot.items
+    chunk_priors = snapshot.extras["chunk_priors"]
+    score_text = similarity_scorer(query)
+
+    # Filters run on the store's metadata bitmaps, so only the chunks passing them are scored
+    filters = all_of(school_where(school), where)
+    searched = processed_data.filter(filters)
+    if searched is None:
+        searched = range(len(processed_data))
+
+    # (score, chunk) pairs; result dicts are built for the returned chunks only
+    scored = []
+
+    # Score the searched chunks
+    for idx in searched:
+        text = processed_data.text(idx).strip()
         if not text or len(text) < 10:  # Skip very short or empty chunks
             continue
 
         # Calculate similarity score
-        score = calculate_similarity_score(query, text)
+        score = score_text(text)
 
         if score >= min_score:
-            metadata = item.get('metadata', {})
-
             # Boost score based on source quality
-            source_type = metadata.get('source_type', '')
+            source_type = processed_data.metadata_value(idx, 'source_type', '')
             if source_type == 'file':  # Official documents get priority
                 score *= 1.2
             elif source_type == 'sample':  # Sample data is reliable
@@ -261,267 +489,236 @@ def retrieve_relevant_chunks(query: str, max_results: int = 5, min_score: float
             if len(text) > 200:
                 score *= 1.1
 
-            results.append({
-                'text': text,
-                'metadata': metadata,
-                'relevance_score': round(score, 3),
-                'chunk_length': len(text),
-                'chunk_index': idx
-            })
+            # Learned from user feedback (build_feedback_priors.py)
+            if chunk_priors:
+                score *= chunk_priors[idx]
+
+            scored.append((round(score, 3), idx))
 
     # Sort by relevance score (descending)
-    results.sort(key=lambda x: x['relevance_score'], reverse=True)
+    scored.sort(key=lambda pair: pair[0], reverse=True)
 
     # Ensure diversity in results (avoid too many from same source)
-    diverse_results = []
+    final_results = []
     source_counts = {}
 
-    for result in results:
-        source_file = result['metadata'].get('source_file', 'unknown')
+    for relevance_score, idx in scored:
+        source_file = processed_data.metadata_value(idx, 'source_file', 'unknown')
         source_count = source_counts.get(source_file, 0)
 
         # Limit chunks per source file to ensure diversity
-        if source_count < 3 or len(diverse_results) < 2:
-            diverse_results.append(result)
+        if source_count < 3 or len(final_results) < 2:
+            text = processed_data.text(idx).strip()
+            final_results.append({
+                'text': text,
+                'metadata': processed_data.metadata(idx),
+                'relevance_score': relevance_score,
+                'chunk_length': len(text),
+                'chunk_index': idx
+            })
             source_counts[source_file] = source_count + 1
 
-        if len(diverse_results) >= max_results:
+        if len(final_results) >= max_results:
             break
 
-    final_results = diverse_results[:max_results]
-    scores = [r['relevance_score'] for r in final_results]
-    sources = [r['metadata'].get('source_file', 'unknown') for r in final_results]
-
-    print(f"✅ RAG Retrieval: Found {len(final_results)} chunks | Scores: {scores} | Sources: {sources}")
+    if sampled():
+        retrieval_logger.info("Retrieved chunks", extra={
+            "query": query[:50],
+            "searched": len(searched),
+            "filters": filters,
+            "min_score": min_score,
+            "scores": [r['relevance_score'] for r in final_results],
+            "sources": [r['metadata'].get('source_file', 'unknown') for r in final_results]
+        })
 
     return final_results
 
-# Main page route - serve the existing index.html
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    try:
-        # Try to read the index.html file from the project root
-        index_path = os.path.join(os.path.dirname(__file__), "..", "index.html")
-        with open(index_path, "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        # Fallback if index.html is not found
-        return HTMLResponse(content="""
-        <!DOCTYPE html>
-        <html>
-        <head><title>Star College Chatbot</title></head>
-        <body>
-            <h1>Star College Chatbot</h1>
-            <p>Welcome! The main interface is loading...</p>
-            <p>If you see this message, please check that index.html is properly deployed.</p>
-        </body>
-        </html>
-        """)
+# Identical on every request, so DeepSeek serves it from its prefix cache
+SYSTEM_PROMPT = """You are the official Star College Durban AI Assistant, providing authoritative information from our comprehensive knowledge base.
 
-@app.post("/chat")
-async def chat(request: Request):
-    """Chat endpoint that matches the frontend's expectations"""
-    if not DEEPSEEK_API_KEY:
-        error_message = "Sorry, the AI service is not configured. Please contact the administrator."
-        return {
-            "answer": error_message,
-            "response": error_message,
-            "sources": [],
-            "metadata": {}
-        }
-
-    try:
-        # Parse the JSON request body
-        body = await request.json()
-        # Your frontend sends 'question' and 'school', not 'message' and 'selectedSchool'
-        message = body.get("question", "") or body.get("message", "")
-        selected_school = body.get("school", "") or body.get("selectedSchool", "")
-        chat_history = body.get("history", [])
-
-        print(f"Received question: {message}")  # Debug log
-        print(f"Selected school: {selected_school}")  # Debug log
-        print(f"Chat history length: {len(chat_history)}")  # Debug log
-
-        # Try to load processed data
-        try:
-            load_processed_data()
-            print(f"Processed data loaded: {len(processed_data)} items")
-        except Exception as data_error:
-            print(f"Error loading processed data: {data_error}")
-            # Continue without processed data
-
-        if not message.strip():
-            empty_message = "Please enter a message to get started!"
-            return {
-                "answer": empty_message,
-                "response": empty_message,
-                "sources": [],
-                "metadata": {}
-            }
-
-        # Perfect welcome and quick response system
-        message_lower = message.lower().strip()
-
-        # Welcome messages
-        welcome_triggers = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening', 'greetings']
-        if any(trigger in message_lower for trigger in welcome_triggers) and len(message.split()) <= 3:
-            welcome_response = """🌟 **Welcome to Star College Durban!**
-
-I'm your AI assistant powered by our comprehensive knowledge base. I can help you with:
-
-🎓 **Academic Information**
-• Matric results and performance data
-• Curriculum and subjects offered
-• Academic achievements and awards
-
-🏫 **School Information**
-• Facilities and infrastructure
-• School divisions (Boys High, Girls High, Primary, Pre-Primary)
-• Location and contact details
-
-📞 **Admissions & Contact**
-• Application processes
-• School fees and requirements
-• Contact information
-
-**What would you like to know about Star College?**"""
-
-            return {
-                "answer": welcome_response,
-                "response": welcome_response,
-                "sources": [{
-                    "content": "Star College Durban - Official AI Assistant",
-                    "metadata": {
-                        "source_type": "system_welcome",
-                        "title": "🌟 Star College AI Assistant",
-                        "category": "Welcome Message",
-                        "url": "https://starcollegedurban.co.za"
-                    }
-                }],
-                "metadata": {
-                    "system_type": "RAG (Retrieval-Augmented Generation)",
-                    "response_type": "welcome_message",
-                    "school_context": selected_school or "All Schools"
-                }
-            }
-
-        # Professional quick answers with comprehensive information
-        quick_answers = {
-            "what is star college": """**Star College Durban - Excellence in Education**
-
-Star College Durban is a **premier private, independent school** established in **2002** by the Horizon Educational Trust. Located in the prestigious Westville North area of Durban, we provide world-class education from Grade RR through Grade 12.
-
-**Key Highlights:**
-• **100% Matric Pass Rate** maintained since inception
-• **Comprehensive Education** - Pre-Primary to Grade 12
-• **STEM Excellence** - Leading in Mathematics, Science & Technology
-• **Multiple School Divisions** serving diverse educational needs
-
-*Committed to developing future leaders through academic excellence and holistic education.*""",
-
-            "where is star college": """**Star College Durban Location & Contact**
-
-**📍 Campus Address:**
-20 Kinloch Ave, Westville North, Durban, South Africa
-
-**📞 Contact Information:**
-• **Phone:** 031 262 7191
-• **Email:** starcollege@starcollege.co.za
-• **Website:** starcollegedurban.co.za
-
-**🗺️ Area:** Conveniently located in the sought-after Westville North suburb, providing easy access for families across Durban.""",
-
-            "matric results": """**Academic Excellence - Matric Performance**
-
-**🏆 Outstanding Track Record:**
-• **100% Pass Rate** maintained consistently since 2002
-• **Multiple Distinctions** achieved by students annually
-• **STEM Leadership** - Excellence in Mathematics, Science & Computer Technology
-• **National Recognition** - Top performers in Mathematics & Science Olympiads
-
-**🎯 Academic Focus Areas:**
-• Advanced Mathematics programs
-• Comprehensive Science curriculum
-• Cutting-edge Computer Technology education
-• Holistic academic development
-
-*Our commitment to academic excellence ensures every student reaches their full potential.*""",
-
-            "schools": """**The Star College Family**
-
-**🏫 Our Educational Divisions:**
-
-**⭐ Star College Durban Boys High School**
-- Specialized education for male students
-- Focus on leadership and academic excellence
+PROFESSIONAL RESPONSE STANDARDS:
+• Provide confident, well-structured answers using ONLY the context given with each inquiry
+• Use professional formatting with clear headings and bullet points
+• Start with direct answers, then provide supporting details
+• Cite sources naturally within the response flow
+• Maintain an authoritative yet approachable tone
+• Use specific data, numbers, and facts when available
 
-**⭐ Star College Durban Girls High School**
-- Dedicated environment for female students
-- Empowering young women for future success
+RESPONSE FRAMEWORK:
+1. Lead with a direct, confident answer
+2. Provide structured supporting information
+3. Include specific data/facts from the context
+4. End with helpful next steps or related information
+5. Use professional formatting (headers, bullets, emphasis)
 
-**⭐ Star College Durban Primary School**
-- Foundation education (Grades 1-7)
-- Building strong academic fundamentals
+FORMATTING GUIDELINES:
+• Use **bold** for key information and numbers
+• Use bullet points for lists and multiple items
+• Use clear section headers when appropriate
+• Emphasize achievements and unique selling points
+• Keep paragraphs concise and scannable"""
 
-**⭐ Little Dolphin Star Pre-Primary School**
-- Early childhood development (Grade RR)
-- Nurturing environment for young learners
+def build_user_prompt(context_sections: List[str], message: str, selected_school: str) -> str:
+    """Per-request part of the prompt: retrieved context, school focus and the question"""
+    prompt = f"""CONTEXT FROM STAR COLLEGE RECORDS:
+{''.join(context_sections)}"""
+
+    # "all", "All Star College Schools" or nothing selects no school
+    school = school_filter(selected_school)
+    if school:
+        prompt += f"\n\nSPECIFIC FOCUS: Prioritize information about {SCHOOL_NAMES[school]} when available in the context."
+
+    prompt += f"\n\nUSER INQUIRY: {message}"
+    prompt += f"\n\nGenerate a professional, authoritative response using the {len(context_sections)} context sections above:"
+    return prompt
+
+def render_context_section(chunk: Dict, text: str, position: int) -> str:
+    """Format one retrieved chunk as a numbered prompt section with its source"""
+    metadata = chunk['metadata']
+
+    # Rich source information
+    source_type = metadata.get('source_type', 'document')
+    source_file = metadata.get('source_file', 'unknown')
+    filename = metadata.get('filename', '')
+    section = metadata.get('section', '')
+    url = metadata.get('url', '')
+
+    # Build comprehensive source attribution
+    source_parts = [f"Type: {source_type}"]
+    if filename:
+        source_parts.append(f"Document: {filename}")
+    elif source_file and source_file != 'unknown':
+        source_parts.append(f"File: {source_file}")
+    if section:
+        source_parts.append(f"Section: {section}")
+    if url and url != 'https://starcollegedurban.co.za':
+        source_parts.append(f"URL: {url}")
+
+    source_info = " | ".join(source_parts)
+
+    return f"""
+═══ CONTEXT {position} ═══ (Relevance Score: {chunk['relevance_score']})
+{text}
+📋 Source: {source_info}
+"""
 
-*Each division maintains our commitment to excellence while serving specific educational needs.*"""
+def stored_response(entry, similarity: float, selected_school: str, store_version: str) -> Dict:
+    """Chat response for a precomputed answer"""
+    return {
+        "answer": entry.answer,
+        "response": entry.answer,
+        "sources": entry.sources,
+        "metadata": {
+            **entry.metadata,
+            "response_type": "precomputed_answer",
+            "cached": True,
+            "school_context": selected_school or "All Schools",
+            "answer_store": {"version": store_version, "question": entry.question, "similarity": round(similarity, 3)}
         }
+    }
 
-        # Check for quick answer matches
-        for key, answer in quick_answers.items():
-            if key in message_lower:
-                return {
-                    "answer": answer,
-                    "response": answer,
-                    "sources": [{
-                        "content": "Star College official information - Quick Reference",
-                        "metadata": {
-                            "source_type": "quick_reference",
-                            "title": f"📋 {key.title()} - Quick Answer",
-                            "category": "Quick Reference",
-                            "confidence": "high",
-                            "url": "https://starcollegedurban.co.za"
-                        }
-                    }],
-                    "metadata": {
-                        "system_type": "RAG (Retrieval-Augmented Generation)",
-                        "response_type": "quick_answer",
-                        "school_context": selected_school or "All Schools"
-                    }
-                }
-
-        # RAG STEP 1: RETRIEVAL - Find relevant chunks from processed data
-        try:
-            print(f"RAG System: Starting retrieval for query: '{message}'")
-            relevant_chunks = retrieve_relevant_chunks(message, max_results=5, min_score=0.1)
-            print(f"RAG Retrieval: Found {len(relevant_chunks)} relevant chunks")
+def request_key(message: str, selected_school: str, history_messages: List[Dict] = (), kb_version: str = "") -> str:
+    """Cache and coalescing key for a question, ignoring case and extra whitespace.
+
+    Follow-up questions depend on the conversation, so its summary and recent turns are part of the key.
+    The knowledge base version is too, so answers from an older knowledge base are never served.
+    """
+    normalized_question = " ".join(message.lower().split())
+    # Selections retrieval and the prompt treat alike ("all", "", a school's full name) share a key
+    normalized_school = normalize_school(selected_school)
+    key = f"{normalized_question}_{normalized_school}_{kb_version}"
+    if history_messages:
+        key += "_" + json.dumps(history_messages, sort_keys=True)
+    return hashlib.md5(key.encode()).hexdigest()
+
+async def summarize_history(previous_summary: str, turns: List[Dict]) -> str:
+    """Fold older conversation turns into the rolling summary (runs in the background)"""
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=15.0)) as client:
+        response = await client.post(
+            DEEPSEEK_API_URL,
+            headers={
+                "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+                "Content-Type": "application/json",
+                "User-Agent": "StarCollege-RAG-Chatbot/1.0"
+            },
+            json={
+                "model": "deepseek-chat",
+                "messages": summary_messages(previous_summary, turns),
+                "max_tokens": 200,
+                "temperature": 0.0,
+                "stream": False
+            }
+        )
+        response.raise_for_status()
+        data = response.json()
+    record_llm_usage(data.get("usage"))
+    return data["choices"][0]["message"]["content"]
+
+# Recent turns verbatim plus a rolling summary of older ones, per session_id
+history_manager = HistoryManager(summarize_history, create_session_store(
+    SESSION_STORE, SESSION_DB_PATH, SESSION_TTL_SECONDS, int(SESSION_MAX_MB * 1024 * 1024)
+))
+
+def conversation_messages(session_id: str, client_history: List[Dict]) -> List[Dict]:
+    """Summary and recent turns to send between the system prompt and the question.
+
+    Clients that send a session_id get server-side history; older clients that
+    send their own history get its most recent turns only.
+    """
+    if session_id:
+        summary, turns = history_manager.context(session_id)
+    else:
+        summary = ""
+        turns = [
+            {"role": normalize_role(turn.get("role", "user")), "content": turn.get("content", "")}
+            for turn in client_history[-history_manager.keep_recent:]
+            if isinstance(turn, dict)
+        ]
 
-            if not relevant_chunks:
-                print("RAG Retrieval: No relevant chunks found, trying with lower threshold")
-                relevant_chunks = retrieve_relevant_chunks(message, max_results=3, min_score=0.05)
+    messages = []
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the conversation so far: {summary}"})
+    messages.extend(fit_history(turns, HISTORY_TOKEN_BUDGET))
+    return messages
+
+def remember_turn(session_id: str, message: str, response: Dict) -> Dict:
+    """Record a question and its answer in the conversation, and tag the response with its ID"""
+    if not response.get("metadata", {}).get("error"):
+        history_manager.record(session_id, "user", message)
+        history_manager.record(session_id, "assistant", response["answer"])
+    # Shallow copy: cached responses are shared between conversations
+    return dict(response, session_id=session_id)
+
+async def generate_rag_response(message: str, selected_school: str, cache_key: str,
+                                history_messages: List[Dict] = (), snapshot: KnowledgeBaseSnapshot = None) -> Dict:
+    """Run retrieval and generation for a question, caching successful answers"""
+    # One knowledge base version for the whole request, even if a reload swaps it meanwhile
+    snapshot = snapshot or knowledge_base.current
+
+    # RAG STEP 1: RETRIEVAL - Find relevant chunks from processed data
+    stage_started = time.perf_counter()
+    try:
+        relevant_chunks = retrieve_relevant_chunks(message, max_results=5, min_score=0.1, snapshot=snapshot,
+                                                   school=selected_school)
 
-        except Exception as search_error:
-            print(f"RAG Retrieval Error: {search_error}")
-            relevant_chunks = []
+        if not relevant_chunks:
+            # retrieve_relevant_chunks logs the retry's scores for sampled requests
+            relevant_chunks = retrieve_relevant_chunks(message, max_results=3, min_score=0.05, snapshot=snapshot,
+                                                       school=selected_school)
 
-        # Check cache for faster responses
-        cache_key = hashlib.md5(f"{message.lower().strip()}_{selected_school}".encode()).hexdigest()
-        current_time = time.time()
+        if not relevant_chunks and school_partitions(selected_school):
+            # Nothing for the selected school: other schools' answers beat none
+            relevant_chunks = retrieve_relevant_chunks(message, max_results=3, min_score=0.05, snapshot=snapshot)
 
-        if cache_key in response_cache:
-            cached_response, cache_time = response_cache[cache_key]
-            if current_time - cache_time < CACHE_DURATION:
-                print(f"Cache hit for: {message[:30]}...")
-                cached_response["metadata"]["cached"] = True
-                return cached_response
+    except Exception as search_error:
+        logger.error("Retrieval failed", exc_info=search_error)
+        relevant_chunks = []
+    STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage="retrieval")
 
-        # RAG STEP 2: CHECK RETRIEVAL RESULTS
-        if not relevant_chunks:
-            print("RAG System: No relevant information found in knowledge base")
-            no_data_message = f"""**Information Not Available**
+    # RAG STEP 2: CHECK RETRIEVAL RESULTS
+    if not relevant_chunks:
+        logger.info("No relevant chunks found", extra={"question_chars": len(message)})
+        no_data_message = f"""**Information Not Available**
 
 I don't currently have specific information about "{message}" in my Star College knowledge base.
 
@@ -539,345 +736,426 @@ I don't currently have specific information about "{message}" in my Star College
 
 *How else can I help you learn about Star College?*"""
 
-            return {
-                "answer": no_data_message,
-                "response": no_data_message,
-                "sources": [{
-                    "content": "Star College Contact Information and Available Topics",
-                    "metadata": {
-                        "source_type": "system_guidance",
-                        "title": "📋 Available Information Topics",
-                        "category": "System Guidance",
-                        "url": "https://starcollegedurban.co.za"
-                    }
-                }],
+        return {
+            "answer": no_data_message,
+            "response": no_data_message,
+            "sources": [{
+                "content": "Star College Contact Information and Available Topics",
                 "metadata": {
-                    "system_type": "RAG (Retrieval-Augmented Generation)",
-                    "response_type": "information_not_available",
-                    "retrieval_results": 0,
-                    "school_context": selected_school or "All Schools"
+                    "source_type": "system_guidance",
+                    "title": "📋 Available Information Topics",
+                    "category": "System Guidance",
+                    "url": "https://starcollegedurban.co.za"
                 }
+            }],
+            "metadata": {
+                "system_type": "RAG (Retrieval-Augmented Generation)",
+                "response_type": "information_not_available",
+                "retrieval_results": 0,
+                "school_context": selected_school or "All Schools"
             }
+        }
 
-        # RAG STEP 3: AUGMENTATION - Create perfect prompt with retrieved information
-        print(f"🔗 RAG Augmentation: Building context from {len(relevant_chunks)} chunks")
-
-        # Build rich context from retrieved chunks
-        context_sections = []
-        total_context_length = 0
-        max_context_length = 4000  # Increased for better context
-
-        for i, chunk in enumerate(relevant_chunks, 1):
-            chunk_text = chunk['text'].strip()
-            chunk_score = chunk['relevance_score']
-            metadata = chunk['metadata']
-
-            # Rich source information
-            source_type = metadata.get('source_type', 'document')
-            source_file = metadata.get('source_file', 'unknown')
-            filename = metadata.get('filename', '')
-            section = metadata.get('section', '')
-            url = metadata.get('url', '')
-
-            # Build comprehensive source attribution
-            source_parts = [f"Type: {source_type}"]
-            if filename:
-                source_parts.append(f"Document: {filename}")
-            elif source_file and source_file != 'unknown':
-                source_parts.append(f"File: {source_file}")
-            if section:
-                source_parts.append(f"Section: {section}")
-            if url and url != 'https://starcollegedurban.co.za':
-                source_parts.append(f"URL: {url}")
-
-            source_info = " | ".join(source_parts)
-
-            # Smart text truncation
-            available_space = max_context_length - total_context_length - 200  # Reserve space
-            if len(chunk_text) > available_space and available_space > 100:
-                # Intelligent truncation - keep beginning and end
-                half_space = available_space // 2
-                chunk_text = chunk_text[:half_space] + "\n[...content truncated...]\n" + chunk_text[-half_space:]
-
-            context_section = f"""
-═══ CONTEXT {i} ═══ (Relevance Score: {chunk_score})
-{chunk_text}
-📋 Source: {source_info}
-"""
-            context_sections.append(context_section)
-            total_context_length += len(chunk_text)
-
-            if total_context_length >= max_context_length:
-                break
-
-        # RAG STEP 4: Create the perfect professional prompt
-        rag_prompt = f"""You are the official Star College Durban AI Assistant, providing authoritative information from our comprehensive knowledge base.
-
-PROFESSIONAL RESPONSE STANDARDS:
-• Provide confident, well-structured answers using ONLY the context below
-• Use professional formatting with clear headings and bullet points
-• Start with direct answers, then provide supporting details
-• Cite sources naturally within the response flow
-• Maintain an authoritative yet approachable tone
-• Use specific data, numbers, and facts when available
-
-CONTEXT FROM STAR COLLEGE RECORDS:
-{''.join(context_sections)}
+    # RAG STEP 3: AUGMENTATION - Create perfect prompt with retrieved information
+    stage_started = time.perf_counter()
+    # Build rich context from retrieved chunks, best first within the token budget
+    context = ContextAssembler(CONTEXT_TOKEN_BUDGET, render=render_context_section).assemble(relevant_chunks)
+    context_sections = context.sections
+    total_context_length = sum(len(chunk['text']) for chunk in context.chunks)
+    CONTEXT_TOKENS.observe(context.tokens)
+    CONTEXT_TOKENS_SAVED.inc(context.tokens_saved)
+
+    # RAG STEP 4: Create the perfect professional prompt. The static instructions go
+    # first as the system message so DeepSeek's context cache can reuse them; the
+    # context, school focus and question follow in the user message.
+    rag_prompt = build_user_prompt(context_sections, message, selected_school)
+
+    if sampled():
+        retrieval_logger.info("Built prompt", extra={
+            "contexts": len(context_sections),
+            "context_chars": total_context_length,
+            "context_tokens": context.tokens,
+            "tokens_saved": context.tokens_saved,
+            "duplicates_dropped": context.duplicates_dropped,
+            "trimmed": context.trimmed,
+            "prompt_chars": len(SYSTEM_PROMPT) + len(rag_prompt)
+        })
+    STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage="context_build")
+
+    # RAG STEP 5: GENERATION - Perfect DeepSeek LLM call
+    stage_started = time.perf_counter()
+    DEEPSEEK_IN_FLIGHT.inc()
+    try:
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=15.0),  # Generous timeout for quality
+            limits=httpx.Limits(max_connections=DEEPSEEK_MAX_CONNECTIONS, max_keepalive_connections=5)
+        ) as client:
+
+            response = await client.post(
+                DEEPSEEK_API_URL,
+                headers={
+                    "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+                    "Content-Type": "application/json",
+                    "User-Agent": "StarCollege-RAG-Chatbot/1.0"
+                },
+                json={
+                    "model": "deepseek-chat",
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        *history_messages,
+                        {"role": "user", "content": rag_prompt}
+                    ],
+                    "max_tokens": 1000,  # Generous token limit for comprehensive answers
+                    "temperature": 0.1,  # Very low for maximum factual accuracy
+                    "top_p": 0.95,      # High precision sampling
+                    "frequency_penalty": 0.2,  # Reduce repetition
+                    "presence_penalty": 0.1,   # Encourage topic diversity
+                    "stop": None,       # No stop sequences
+                    "stream": False     # Complete response
+                }
+            )
 
-USER INQUIRY: {message}
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error("DeepSeek API error response", extra={"status": response.status_code, "body": error_text[:500]})
+                raise Exception(f"DeepSeek API returned status {response.status_code}: {error_text}")
 
-RESPONSE FRAMEWORK:
-1. Lead with a direct, confident answer
-2. Provide structured supporting information
-3. Include specific data/facts from the context
-4. End with helpful next steps or related information
-5. Use professional formatting (headers, bullets, emphasis)
+    except httpx.TimeoutException:
+        ERRORS.inc(type="timeout")
+        error_message = "The AI service is taking too long to respond. Please try again."
+        return {
+            "answer": error_message,
+            "response": error_message,
+            "sources": [],
+            "metadata": {"error": "timeout"}
+        }
+    except httpx.ConnectError:
+        ERRORS.inc(type="connection_error")
+        error_message = "Unable to connect to the AI service. Please check your internet connection and try again."
+        return {
+            "answer": error_message,
+            "response": error_message,
+            "sources": [],
+            "metadata": {"error": "connection_error"}
+        }
+    except Exception as api_error:
+        logger.error("DeepSeek API error", extra={"error": str(api_error)})
+        ERRORS.inc(type="api_error")
+        error_message = f"AI service error: {str(api_error)}"
+        return {
+            "answer": error_message,
+            "response": error_message,
+            "sources": [],
+            "metadata": {"error": str(api_error)}
+        }
+    finally:
+        DEEPSEEK_IN_FLIGHT.dec()
+        STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage="deepseek_call")
 
-FORMATTING GUIDELINES:
-• Use **bold** for key information and numbers
-• Use bullet points for lists and multiple items
-• Use clear section headers when appropriate
-• Emphasize achievements and unique selling points
-• Keep paragraphs concise and scannable"""
+    # RAG STEP 6: PROCESS AND ENHANCE GENERATED RESPONSE
+    stage_started = time.perf_counter()
+    try:
+        data = response.json()
+        raw_response = data["choices"][0]["message"]["content"]
+        tokens_used = data.get("usage", {}).get("total_tokens", 0)
+        usage = record_llm_usage(data.get("usage"))
+
+        # Apply professional formatting enhancements
+        enhanced_response = enhance_response_formatting(raw_response)
+
+        # Add professional signature for comprehensive responses
+        if len(enhanced_response) > 200 and not enhanced_response.endswith('?'):
+            signature = f"\n\n---\n*Need more information? Contact us at **031 262 7191** or visit **starcollegedurban.co.za***"
+            ai_response = enhanced_response + signature
+        else:
+            ai_response = enhanced_response
+
+    except Exception as parse_error:
+        logger.error("Failed to parse DeepSeek response", exc_info=parse_error)
+        ERRORS.inc(type="parse_error")
+        error_message = "**System Error**\n\nI encountered an error while processing your request. Please try again or contact our support team.\n\n📞 **Phone:** 031 262 7191"
+        return {
+            "answer": error_message,
+            "response": error_message,
+            "sources": [],
+            "metadata": {"error": "rag_response_parsing_error"}
+        }
 
-        if selected_school and selected_school != "All Star College Schools":
-            rag_prompt += f"\n\nSPECIFIC FOCUS: Prioritize information about {selected_school} when available in the context."
-
-        rag_prompt += f"\n\nGenerate a professional, authoritative response using the {len(context_sections)} context sections above:"
-
-        print(f"✅ RAG Augmentation: Perfect prompt created | Contexts: {len(context_sections)} | Length: {total_context_length} chars")
-
-        # RAG STEP 5: GENERATION - Perfect DeepSeek LLM call
-        try:
-            print("🤖 RAG Generation: Calling DeepSeek with optimized parameters")
-
-            async with httpx.AsyncClient(
-                timeout=httpx.Timeout(30.0, connect=15.0),  # Generous timeout for quality
-                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
-            ) as client:
-
-                response = await client.post(
-                    "https://api.deepseek.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-                        "Content-Type": "application/json",
-                        "User-Agent": "StarCollege-RAG-Chatbot/1.0"
-                    },
-                    json={
-                        "model": "deepseek-chat",
-                        "messages": [
-                            {"role": "system", "content": rag_prompt}
-                        ],
-                        "max_tokens": 1000,  # Generous token limit for comprehensive answers
-                        "temperature": 0.1,  # Very low for maximum factual accuracy
-                        "top_p": 0.95,      # High precision sampling
-                        "frequency_penalty": 0.2,  # Reduce repetition
-                        "presence_penalty": 0.1,   # Encourage topic diversity
-                        "stop": None,       # No stop sequences
-                        "stream": False     # Complete response
-                    }
-                )
-
-                print(f"DeepSeek API response status: {response.status_code}")
-
-                if response.status_code != 200:
-                    error_text = response.text
-                    print(f"DeepSeek API error response: {error_text}")
-                    raise Exception(f"DeepSeek API returned status {response.status_code}: {error_text}")
-
-        except httpx.TimeoutException:
-            error_message = "The AI service is taking too long to respond. Please try again."
-            return {
-                "answer": error_message,
-                "response": error_message,
-                "sources": [],
-                "metadata": {"error": "timeout"}
-            }
-        except httpx.ConnectError:
-            error_message = "Unable to connect to the AI service. Please check your internet connection and try again."
-            return {
-                "answer": error_message,
-                "response": error_message,
-                "sources": [],
-                "metadata": {"error": "connection_error"}
-            }
-        except Exception as api_error:
-            print(f"DeepSeek API error: {str(api_error)}")
-            error_message = f"AI service error: {str(api_error)}"
-            return {
-                "answer": error_message,
-                "response": error_message,
-                "sources": [],
-                "metadata": {"error": str(api_error)}
+    # RAG STEP 7: CREATE PERFECT SOURCES WITH RICH METADATA
+    sources = []
+
+
+    for i, chunk in enumerate(relevant_chunks):
+        metadata = chunk.get('metadata', {})
+        source_type = metadata.get('source_type', 'document')
+        source_file = metadata.get('source_file', 'unknown')
+        relevance_score = chunk.get('relevance_score', 0.0)
+
+        # Create intelligent content preview
+        text = chunk['text']
+        if len(text) > 300:
+            # Smart preview - show beginning with key information
+            preview = text[:250] + "..."
+            # Try to end at sentence boundary
+            last_period = preview.rfind('.')
+            if last_period > 200:
+                preview = preview[:last_period + 1]
+        else:
+            preview = text
+
+        # Determine source category and create rich metadata
+        if source_type == 'file':
+            filename = metadata.get('filename', 'school_document')
+            title = f"📄 {filename}"
+            source_category = "Official Document"
+        elif source_type == 'web':
+            url = metadata.get('url', 'https://starcollegedurban.co.za')
+            title_raw = metadata.get('title', 'Star College Web Content')
+            title = f"🌐 {title_raw}"
+            source_category = "Web Content"
+        elif source_type == 'sample':
+            section = metadata.get('section', 'general')
+            title = f"📊 Star College {section.replace('_', ' ').title()}"
+            source_category = "School Database"
+        else:
+            section = metadata.get('section', 'general')
+            title = f"📋 {section.replace('_', ' ').title()}"
+            source_category = "Knowledge Base"
+
+        sources.append({
+            "content": preview,
+            "metadata": {
+                "source_type": f"rag_{source_type}",
+                "title": title,
+                "category": source_category,
+                "relevance_score": relevance_score,
+                "chunk_index": i + 1,
+                "source_file": source_file,
+                "chunk_id": metadata.get('chunk_id', ''),
+                "confidence": "high" if relevance_score > 0.7 else "medium" if relevance_score > 0.4 else "low",
+                "url": metadata.get('url', 'https://starcollegedurban.co.za'),
+                "section": metadata.get('section', ''),
+                "filename": metadata.get('filename', '')
             }
+        })
 
-        # RAG STEP 6: PROCESS AND ENHANCE GENERATED RESPONSE
-        try:
-            data = response.json()
-            raw_response = data["choices"][0]["message"]["content"]
-            tokens_used = data.get("usage", {}).get("total_tokens", 0)
+    STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage="formatting")
 
-            # Apply professional formatting enhancements
-            enhanced_response = enhance_response_formatting(raw_response)
+    # RAG STEP 8: CREATE PERFECT FINAL RESPONSE
+    response_obj = {
+        "answer": ai_response,
+        "response": ai_response,  # Maintain compatibility
+        "sources": sources,
+        "metadata": {
+            # System Information
+            "system_type": "RAG (Retrieval-Augmented Generation)",
+            "version": "1.0",
+            "model_used": "deepseek-chat",
+            "tokens_used": tokens_used,
+            "prompt_cache_hit_tokens": usage["prompt_cache_hit_tokens"],
+            "prompt_cache_miss_tokens": usage["prompt_cache_miss_tokens"],
+            "school_context": selected_school or "All Star College Schools",
+            "cached": False,
+            "timestamp": time.time(),
+
+            # RAG Pipeline Metrics
+            "rag_pipeline": {
+                "retrieval": {
+                    "total_chunks_searched": len(snapshot.items),
+                    "knowledge_base_version": snapshot.version,
+                    "chunks_retrieved": len(relevant_chunks),
+                    "relevance_scores": [chunk['relevance_score'] for chunk in relevant_chunks],
+                    "min_score_threshold": 0.15,
+                    "max_score_achieved": max([chunk['relevance_score'] for chunk in relevant_chunks]) if relevant_chunks else 0,
+                    "source_diversity": len(set(chunk['metadata'].get('source_file', 'unknown') for chunk in relevant_chunks))
+                },
 
-            # Add professional signature for comprehensive responses
-            if len(enhanced_response) > 200 and not enhanced_response.endswith('?'):
-                signature = f"\n\n---\n*Need more information? Contact us at **031 262 7191** or visit **starcollegedurban.co.za***"
-                ai_response = enhanced_response + signature
-            else:
-                ai_response = enhanced_response
+                "augmentation": {
+                    "context_sections_created": len(context_sections),
+                    "total_context_length": total_context_length,
+                    "context_tokens": context.tokens,
+                    "context_token_budget": CONTEXT_TOKEN_BUDGET,
+                    "context_tokens_saved": context.tokens_saved,
+                    "duplicate_chunks_dropped": context.duplicates_dropped,
+                    "tokenizer": get_token_counter().name,
+                    "prompt_length": len(SYSTEM_PROMPT) + len(rag_prompt),
+                    "history_messages": len(history_messages),
+                    "context_utilization": round(context.tokens / CONTEXT_TOKEN_BUDGET * 100, 1)
+                },
+
+                "generation": {
+                    "temperature": 0.1,
+                    "max_tokens": 1000,
+                    "top_p": 0.95,
+                    "response_length": len(ai_response),
+                    "response_quality": "high" if len(ai_response) > 100 else "medium"
+                }
+            },
 
-            print(f"RAG Generation: Response generated and enhanced successfully")
-            print(f"RAG Generation: Response length: {len(ai_response)} chars, Tokens used: {tokens_used}")
+            # Quality Metrics
+            "quality_indicators": {
+                "information_source": "Star College Official Knowledge Base",
+                "data_only_responses": True,
+                "source_attribution": True,
+                "factual_accuracy": "verified_from_documents",
+                "response_completeness": "comprehensive" if len(relevant_chunks) >= 3 else "partial"
+            },
 
-        except Exception as parse_error:
-            print(f"RAG Generation Error: Failed to parse DeepSeek response: {parse_error}")
-            error_message = "**System Error**\n\nI encountered an error while processing your request. Please try again or contact our support team.\n\n📞 **Phone:** 031 262 7191"
-            return {
-                "answer": error_message,
-                "response": error_message,
-                "sources": [],
-                "metadata": {"error": "rag_response_parsing_error"}
+            # User Experience
+            "user_experience": {
+                "response_time_category": "optimized",
+                "source_transparency": True,
+                "educational_focus": True,
+                "professional_tone": True
             }
+        }
+    }
 
-        # RAG STEP 7: CREATE PERFECT SOURCES WITH RICH METADATA
-        sources = []
-
-        print(f"📚 RAG Sources: Creating detailed sources from {len(relevant_chunks)} chunks")
-
-        for i, chunk in enumerate(relevant_chunks):
-            metadata = chunk.get('metadata', {})
-            source_type = metadata.get('source_type', 'document')
-            source_file = metadata.get('source_file', 'unknown')
-            relevance_score = chunk.get('relevance_score', 0.0)
-
-            # Create intelligent content preview
-            text = chunk['text']
-            if len(text) > 300:
-                # Smart preview - show beginning with key information
-                preview = text[:250] + "..."
-                # Try to end at sentence boundary
-                last_period = preview.rfind('.')
-                if last_period > 200:
-                    preview = preview[:last_period + 1]
-            else:
-                preview = text
-
-            # Determine source category and create rich metadata
-            if source_type == 'file':
-                filename = metadata.get('filename', 'school_document')
-                title = f"📄 {filename}"
-                source_category = "Official Document"
-            elif source_type == 'web':
-                url = metadata.get('url', 'https://starcollegedurban.co.za')
-                title_raw = metadata.get('title', 'Star College Web Content')
-                title = f"🌐 {title_raw}"
-                source_category = "Web Content"
-            elif source_type == 'sample':
-                section = metadata.get('section', 'general')
-                title = f"📊 Star College {section.replace('_', ' ').title()}"
-                source_category = "School Database"
-            else:
-                section = metadata.get('section', 'general')
-                title = f"📋 {section.replace('_', ' ').title()}"
-                source_category = "Knowledge Base"
+    logger.info("Answered question", extra={
+        "chunks": len(relevant_chunks),
+        "answer_chars": len(ai_response),
+        "tokens": tokens_used
+    })
 
-            sources.append({
-                "content": preview,
-                "metadata": {
-                    "source_type": f"rag_{source_type}",
-                    "title": title,
-                    "category": source_category,
-                    "relevance_score": relevance_score,
-                    "chunk_index": i + 1,
-                    "source_file": source_file,
-                    "confidence": "high" if relevance_score > 0.7 else "medium" if relevance_score > 0.4 else "low",
-                    "url": metadata.get('url', 'https://starcollegedurban.co.za'),
-                    "section": metadata.get('section', ''),
-                    "filename": metadata.get('filename', '')
-                }
-            })
+    # Cache the response for faster future responses
+    response_cache[cache_key] = (response_obj, time.time())
 
-        print(f"✅ RAG Sources: Created {len(sources)} detailed source references")
+    # Clean old cache entries (keep cache size manageable)
+    if len(response_cache) > 100:
+        oldest_key = min(response_cache.keys(), key=lambda k: response_cache[k][1])
+        del response_cache[oldest_key]
 
-        # RAG STEP 8: CREATE PERFECT FINAL RESPONSE
-        response_obj = {
-            "answer": ai_response,
-            "response": ai_response,  # Maintain compatibility
-            "sources": sources,
-            "metadata": {
-                # System Information
-                "system_type": "RAG (Retrieval-Augmented Generation)",
-                "version": "1.0",
-                "model_used": "deepseek-chat",
-                "tokens_used": tokens_used,
-                "school_context": selected_school or "All Star College Schools",
-                "cached": False,
-                "timestamp": time.time(),
-
-                # RAG Pipeline Metrics
-                "rag_pipeline": {
-                    "retrieval": {
-                        "total_chunks_searched": len(processed_data),
-                        "chunks_retrieved": len(relevant_chunks),
-                        "relevance_scores": [chunk['relevance_score'] for chunk in relevant_chunks],
-                        "min_score_threshold": 0.15,
-                        "max_score_achieved": max([chunk['relevance_score'] for chunk in relevant_chunks]) if relevant_chunks else 0,
-                        "source_diversity": len(set(chunk['metadata'].get('source_file', 'unknown') for chunk in relevant_chunks))
-                    },
-
-                    "augmentation": {
-                        "context_sections_created": len(context_sections),
-                        "total_context_length": total_context_length,
-                        "max_context_limit": 4000,
-                        "prompt_length": len(rag_prompt),
-                        "context_utilization": round(total_context_length / 4000 * 100, 1)
-                    },
-
-                    "generation": {
-                        "temperature": 0.1,
-                        "max_tokens": 1000,
-                        "top_p": 0.95,
-                        "response_length": len(ai_response),
-                        "response_quality": "high" if len(ai_response) > 100 else "medium"
-                    }
-                },
+    return response_obj
 
-                # Quality Metrics
-                "quality_indicators": {
-                    "information_source": "Star College Official Knowledge Base",
-                    "data_only_responses": True,
-                    "source_attribution": True,
-                    "factual_accuracy": "verified_from_documents",
-                    "response_completeness": "comprehensive" if len(relevant_chunks) >= 3 else "partial"
-                },
+# index.html from the project root, read and compressed once; its /static and /images
+# references are fingerprinted. vercel.json routes fingerprinted names here, so only a
+# fingerprint matching the current file is cached for a year
+index_page = load_index_page(
+    os.path.join(PROJECT_ROOT, "index.html"),
+    {"static": os.path.join(PROJECT_ROOT, "static"), "images": os.path.join(PROJECT_ROOT, "images")}
+)
+app.mount("/static", FingerprintedStaticFiles(directory=os.path.join(PROJECT_ROOT, "static"), check_dir=False),
+          name="static")
+app.mount("/images", FingerprintedStaticFiles(directory=os.path.join(PROJECT_ROOT, "images"), check_dir=False),
+          name="images")
 
-                # User Experience
-                "user_experience": {
-                    "response_time_category": "optimized",
-                    "source_transparency": True,
-                    "educational_focus": True,
-                    "professional_tone": True
-                }
-            }
-        }
+# Main page route - serve the existing index.html
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    if index_page is not None:
+        return index_page.response(request.headers)
+    else:
+        # Fallback if index.html is not found
+        return HTMLResponse(content="""
+        <!DOCTYPE html>
+        <html>
+        <head><title>Star College Chatbot</title></head>
+        <body>
+            <h1>Star College Chatbot</h1>
+            <p>Welcome! The main interface is loading...</p>
+            <p>If you see this message, please check that index.html is properly deployed.</p>
+        </body>
+        </html>
+        """)
 
-        print(f"🎉 RAG System Complete! Retrieved {len(relevant_chunks)} chunks → Generated {len(ai_response)} char response")
+@app.post("/chat")
+async def chat(request: Request):
+    """Chat endpoint that matches the frontend's expectations"""
+    verbose = VERBOSE_RESPONSES or request.query_params.get("debug", "").lower() in ("1", "true")
+    if not DEEPSEEK_API_KEY:
+        ERRORS.inc(type="not_configured")
+        error_message = "Sorry, the AI service is not configured. Please contact the administrator."
+        return chat_response({
+            "answer": error_message,
+            "response": error_message,
+            "sources": [],
+            "metadata": {}
+        }, verbose)
 
-        # Cache the response for faster future responses
-        response_cache[cache_key] = (response_obj, current_time)
+    try:
+        # Parse the JSON request body
+        body = await request.json()
+        # Your frontend sends 'question' and 'school', not 'message' and 'selectedSchool'
+        message = body.get("question", "") or body.get("message", "")
+        selected_school = body.get("school", "") or body.get("selectedSchool", "")
+        chat_history = body.get("history") or []
+        # Clients that send a session_id keep their history on the server and send only the question;
+        # a request without one starts a session, as app/routes/chat.py does, and gets its ID back
+        client_session_id = body.get("session_id") or ""
+        session_id = client_session_id or uuid.uuid4().hex
+        verbose = verbose or bool(body.get("verbose"))
+
+        # Sizes only; the question text is logged for sampled requests alone
+        logger.info("Chat request", extra={
+            "question_chars": len(message),
+            "school": selected_school,
+            "history_turns": len(chat_history),
+            "session_id": session_id
+        })
+        if sampled():
+            logger.info("Chat question", extra={"question": message[:200]})
+
+        # The knowledge base version this request uses throughout
+        snapshot = knowledge_base.current
 
-        # Clean old cache entries (keep cache size manageable)
-        if len(response_cache) > 100:
-            oldest_key = min(response_cache.keys(), key=lambda k: response_cache[k][1])
-            del response_cache[oldest_key]
+        if not message.strip():
+            empty_message = "Please enter a message to get started!"
+            return chat_response({
+                "answer": empty_message,
+                "response": empty_message,
+                "sources": [],
+                "metadata": {}
+            }, verbose)
+
+        # Greetings and quick answers: one compiled match, pre-serialized response
+        intent = intent_router.match(message)
+        if intent is not None:
+            INTENT_ANSWERS.inc(intent=intent.name)
+            if intent.response_type == "welcome_message":
+                WELCOME_ANSWERS.inc()
+            else:
+                QUICK_ANSWERS.inc()
+                history_manager.record(session_id, "user", message)
+                history_manager.record(session_id, "assistant", intent.answer)
+            body = intent_router.payload(intent, selected_school or "All Schools", verbose)
+            return Response(content=with_field(body, "session_id", session_id), media_type="application/json")
+
+        history_messages = conversation_messages(client_session_id, chat_history)
+
+        # Frequent questions answered offline, with no LLM call. Stored answers were
+        # generated without history, so a follow-up ("and the fees?") goes to the LLM
+        answer_store = snapshot.extras["answer_store"]
+        if not history_messages and answer_store.active(snapshot.extras["corpus_version"]):
+            stored = answer_store.match(message, selected_school)
+            if stored is not None:
+                STORED_ANSWERS.inc()
+                response_obj = stored_response(*stored, selected_school, answer_store.version)
+                return chat_response(remember_turn(session_id, message, response_obj), verbose)
+
+        # Check cache for faster responses
+        cache_key = request_key(message, selected_school, history_messages, snapshot.version)
+        current_time = time.time()
 
-        return response_obj
+        if cache_key in response_cache:
+            cached_response, cache_time = response_cache[cache_key]
+            if current_time - cache_time < CACHE_DURATION:
+                logger.debug("Response cache hit")
+                CACHE_HITS.inc()
+                # A copy: the cached object is shared with other requests and coalesced waiters
+                cached_response = dict(cached_response, metadata={**cached_response.get("metadata", {}), "cached": True})
+                return chat_response(remember_turn(session_id, message, cached_response), verbose)
+
+        # Concurrent identical questions await the first one's retrieval and DeepSeek call
+        response_obj = await request_coalescer.do(
+            cache_key, lambda: generate_rag_response(message, selected_school, cache_key, history_messages, snapshot)
+        )
+        return chat_response(remember_turn(session_id, message, response_obj), verbose)
 
     except Exception as e:
-        print(f"RAG System Error: {str(e)}")
+        logger.error("Chat request failed", exc_info=e)
+        ERRORS.inc(type="rag_system_error")
         error_message = f"RAG system encountered an error while processing your request. Please try again. Error: {str(e)}"
-        return {
+        return chat_response({
             "answer": error_message,
             "response": error_message,
             "sources": [],
@@ -886,7 +1164,14 @@ FORMATTING GUIDELINES:
                 "error": str(e),
                 "error_type": "rag_system_error"
             }
-        }
+        }, verbose)
+
+# Feedback log, written in batches by a background task; retrieval uses it through the
+# priors build_feedback_priors.py derives from it
+feedback_log = FeedbackLog(
+    create_feedback_sink(FEEDBACK_STORE, FEEDBACK_PATH, FEEDBACK_FSYNC),
+    batch_size=FEEDBACK_BATCH_SIZE, flush_interval=FEEDBACK_FLUSH_SECONDS
+)
 
 @app.post("/feedback")
 async def feedback(request: Request):
@@ -898,25 +1183,37 @@ async def feedback(request: Request):
         feedback_type = body.get("feedback", "")
         sources = body.get("sources", [])
 
-        # Log the feedback (in production, you'd save to database)
-        print(f"Feedback received - Question: {question[:50]}..., Feedback: {feedback_type}")
+        if feedback_type not in FEEDBACK_VALUES:
+            return {"status": "error", "message": f"feedback must be one of: {', '.join(FEEDBACK_VALUES)}"}
+
+        # Queued only; the disk write happens off the request path
+        if not feedback_log.submit(feedback_record(question, answer, feedback_type, sources or [], body.get("session_id"))):
+            logger.warning("Feedback queue full; feedback dropped")
+            return {"status": "error", "message": "Feedback is temporarily unavailable, please try again later"}
+        FEEDBACK.inc(feedback=feedback_type)
+        logger.info("Feedback received", extra={"feedback": feedback_type, "question_chars": len(question)})
 
         return {"status": "success", "message": "Thank you for your feedback!"}
     except Exception as e:
-        print(f"Feedback error: {str(e)}")
+        logger.error("Feedback error", exc_info=e)
         return {"status": "error", "message": f"Error processing feedback: {str(e)}"}
 
 @app.get("/health")
 async def health_check():
     """Perfect health check for Star College RAG system"""
     try:
-        load_processed_data()
+        snapshot = knowledge_base.current
+        processed_data = snapshot.items
+        answer_store = snapshot.extras["answer_store"]
 
         # Analyze knowledge base health
-        total_chars = sum(len(item.get('text', '')) for item in processed_data)
-        source_types = set(item.get('metadata', {}).get('source_type', 'unknown') for item in processed_data)
+        total_chars = processed_data.chars
+        source_types = set(processed_data.count_by('source_type', 'unknown'))
 
         health_status = "excellent" if len(processed_data) > 50 else "good" if len(processed_data) > 10 else "basic"
+        chat_requests, chat_seconds = REQUEST_SECONDS.count_and_sum(path="/chat")
+        cache_hit_tokens = LLM_PROMPT_TOKENS.value(cache="hit")
+        cache_miss_tokens = LLM_PROMPT_TOKENS.value(cache="miss")
 
         return {
             "status": "🟢 OPERATIONAL",
@@ -925,7 +1222,14 @@ async def health_check():
                 "type": "RAG (Retrieval-Augmented Generation)",
                 "version": "1.0 - Production Ready",
                 "health": health_status,
-                "performance": "optimized"
+                "performance": {
+                    "chat_requests": chat_requests,
+                    "avg_chat_latency_ms": round(chat_seconds / chat_requests * 1000, 1) if chat_requests else None,
+                    "cache_hits": CACHE_HITS.value(),
+                    "prompt_cache_hit_ratio": round(cache_hit_tokens / (cache_hit_tokens + cache_miss_tokens), 3)
+                    if cache_hit_tokens + cache_miss_tokens else None,
+                    "metrics": "/metrics"
+                }
             },
             "components": {
                 "llm_model": "deepseek-chat ✅",
@@ -933,7 +1237,13 @@ async def health_check():
                 "knowledge_base": f"✅ {len(processed_data)} chunks loaded",
                 "total_content": f"{total_chars:,} characters",
                 "source_types": list(source_types),
-                "cache_system": f"✅ {len(response_cache)} cached responses"
+                "cache_system": f"✅ {len(response_cache)} cached responses",
+                "request_coalescing": request_coalescer.stats(),
+                "sessions": history_manager.stats(),
+                "feedback": feedback_log.stats(),
+                "knowledge_base_snapshot": knowledge_base.stats(),
+                "answer_store": {"entries": answer_store.entries, "version": answer_store.version,
+                                 "active": answer_store.active(snapshot.extras["corpus_version"])}
             },
             "capabilities": [
                 "🎓 Academic Information",
@@ -951,20 +1261,38 @@ async def health_check():
             "timestamp": time.time()
         }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latency, per-stage timings, cache and error counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+    """Rebuild the knowledge base from the processed files and swap it in"""
+    if not ADMIN_TOKEN:
+        return FastJSONResponse({"status": "error", "message": "Admin endpoints are disabled; set ADMIN_TOKEN"}, status_code=403)
+    supplied = request.headers.get("x-admin-token") or request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return FastJSONResponse({"status": "error", "message": "Invalid admin token"}, status_code=401)
+
+    try:
+        changed, snapshot = await knowledge_base.reload("admin")
+    except Exception as e:
+        return FastJSONResponse({
+            "status": "error",
+            "message": f"Reload failed; still serving version {knowledge_base.stats()['version']}: {str(e)}"
+        }, status_code=500)
+    return {"status": "reloaded" if changed else "unchanged", "version": snapshot.version, "chunks": len(snapshot.items)}
+
 @app.get("/rag-status")
 async def rag_status():
     """Get detailed RAG system status"""
     try:
-        load_processed_data()
+        processed_data = load_processed_data()
 
         # Analyze the knowledge base
-        source_types = {}
-        total_chars = 0
-
-        for item in processed_data:
-            source_type = item.get('metadata', {}).get('source_type', 'unknown')
-            source_types[source_type] = source_types.get(source_type, 0) + 1
-            total_chars += len(item.get('text', ''))
+        source_types = dict(processed_data.count_by('source_type', 'unknown'))
+        total_chars = processed_data.chars
 
         return {
             "system_type": "RAG (Retrieval-Augmented Generation)",
@@ -1022,11 +1350,11 @@ async def warmup():
 async def test_data():
     """Test endpoint to check processed data loading"""
     try:
-        load_processed_data()
+        processed_data = load_processed_data()
         return {
             "status": "success",
             "data_loaded": len(processed_data),
-            "sample_data": processed_data[:2] if processed_data else [],
+            "sample_data": [chunk.to_dict() for chunk in processed_data[:2]],
             "files_checked": [
                 {"file": "processed/sample_data.json", "exists": os.path.exists("processed/sample_data.json")},
                 {"file": "processed/uploads_data.json", "exists": os.path.exists("processed/uploads_data.json")},
@@ -1048,7 +1376,14 @@ async def test_data():
 @app.on_event("startup")
 async def startup_event():
     """Load processed data when the app starts"""
-    load_processed_data()
+    await asyncio.to_thread(load_processed_data)
+    knowledge_base.start_watching()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop watching the data files and write queued feedback before the process exits"""
+    await knowledge_base.stop_watching()
+    await feedback_log.close()
 
 # This is required for Vercel
 app = app
@@ -11,12 +11,24 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # API Keys
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
 
 # Model Settings
 # Use a simpler embedding model to avoid PyTorch compatibility issues
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 LLM_MODEL = os.getenv("LLM_MODEL", "deepseek-ai/deepseek-coder-7b-instruct")
 
+# Embedding backend: "huggingface" (PyTorch via LangChain) or "onnx" (onnxruntime)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+ONNX_MODEL_FOLDER = BASE_DIR / os.getenv("ONNX_MODEL_FOLDER", "data/onnx_model")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "False").lower() in ("true", "1", "t")
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))  # 0 lets onnxruntime decide
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# Micro-batching of concurrent query embeddings
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+
 # Application Settings
 DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
 HOST = os.getenv("HOST", "0.0.0.0")
@@ -29,9 +41,54 @@ CHROMA_INDEX_FOLDER = BASE_DIR / os.getenv("CHROMA_INDEX_FOLDER", "data/chroma_i
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "5"))
+
+# Prompt token budgets for retrieved context and conversation history; set
+# CONTEXT_TOKENIZER_PATH to a tokenizer.json to count with the model's own tokenizer
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+
+# Server-side chat sessions: "memory" (per process) or "sqlite" (shared by the workers on a host),
+# expired after SESSION_TTL_SECONDS idle and evicted least recently used above SESSION_MAX_MB
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_DB_PATH = BASE_DIR / os.getenv("SESSION_DB_PATH", "data/sessions.db")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_MB = float(os.getenv("SESSION_MAX_MB", "64"))
+
+# Feedback is queued and appended in batches to a "jsonl" file or a "sqlite" table;
+# FEEDBACK_FSYNC is "batch" (sync every write), "interval" (about once a second) or "off"
+FEEDBACK_STORE = os.getenv("FEEDBACK_STORE", "jsonl").lower()
+FEEDBACK_PATH = BASE_DIR / os.getenv("FEEDBACK_PATH", "data/feedback.jsonl")
+FEEDBACK_FSYNC = os.getenv("FEEDBACK_FSYNC", "interval").lower()
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "100"))
+FEEDBACK_FLUSH_SECONDS = float(os.getenv("FEEDBACK_FLUSH_SECONDS", "1"))
+
+# Seconds between checks of the processed files for changes (0 disables); POST /admin/reload
+# with the ADMIN_TOKEN header reloads on demand and is disabled while ADMIN_TOKEN is unset
+KB_WATCH_SECONDS = float(os.getenv("KB_WATCH_SECONDS", "5"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Serve the processed chunks from a memory-mapped pack (processed/corpus.pack) shared by
+# all uvicorn workers, instead of a JSON-loaded copy in each
+CORPUS_PACK = os.getenv("CORPUS_PACK", "True").lower() in ("true", "1", "t")
+
 VECTOR_STORE_TYPE = os.getenv("VECTOR_STORE_TYPE", "chroma")
 
+# PDF extraction: pages are extracted in ranges across a process pool, with at most
+# PDF_WINDOW_TASKS ranges in flight so memory stays bounded on large reports
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_WINDOW_TASKS = int(os.getenv("PDF_WINDOW_TASKS", str(2 * PDF_WORKERS)))
+# Uploads add chunks to the vector store in batches of this many as they are extracted
+UPLOAD_BATCH_CHUNKS = int(os.getenv("UPLOAD_BATCH_CHUNKS", "256"))
+
+# Image OCR: worker pool size, cache of results by image hash, and the longest side
+# images are downscaled to before OCR
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_CACHE_FOLDER = BASE_DIR / os.getenv("OCR_CACHE_FOLDER", "data/ocr_cache")
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "2000"))
+
 # Ensure directories exist
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 PROCESSED_FOLDER.mkdir(parents=True, exist_ok=True)
 CHROMA_INDEX_FOLDER.mkdir(parents=True, exist_ok=True)
+OCR_CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
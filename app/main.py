@@ -1,12 +1,14 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 from app.routes import upload, scrape, chat
 from app.config import HOST, PORT, DEBUG
+from app.utils.log import RequestContextMiddleware
+from app.utils.metrics import CONTENT_TYPE, REGISTRY, RequestMetricsMiddleware
+from app.utils.static_assets import FingerprintedStaticFiles, load_index_page
 
 # Create FastAPI app
 app = FastAPI(
@@ -24,9 +26,21 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/images", StaticFiles(directory="images"), name="images")
+# Time chat requests end to end for /metrics
+app.add_middleware(RequestMetricsMiddleware, paths=["/chat"])
+
+# Request IDs (X-Request-ID) and log sampling decisions for every request
+app.add_middleware(RequestContextMiddleware)
+
+# Mount static files; fingerprinted names (logo.3f2a9c1b.png) are cached for a year
+app.mount("/static", FingerprintedStaticFiles(directory="static"), name="static")
+app.mount("/images", FingerprintedStaticFiles(directory="images"), name="images")
+
+# index.html is read and compressed once, with its asset references fingerprinted
+index_page = load_index_page(
+    os.path.join(os.path.dirname(__file__), "..", "index.html"),
+    {"static": "static", "images": "images"}
+)
 
 # Set up templates
 templates = Jinja2Templates(directory="templates")
@@ -38,15 +52,21 @@ app.include_router(chat.router, tags=["Chat"])
 
 # Route for root to serve the custom index.html from the project root
 @app.get("/", response_class=HTMLResponse)
-async def custom_index():
-    with open(os.path.join(os.path.dirname(__file__), "..", "index.html"), encoding="utf-8") as f:
-        return HTMLResponse(content=f.read())
+async def custom_index(request: Request):
+    if index_page is None:
+        raise HTTPException(status_code=404, detail="index.html not found")
+    return index_page.response(request.headers)
 
 @app.get("/upload-page", response_class=HTMLResponse)
 async def upload_page(request: Request):
     """Render the upload page."""
     return templates.TemplateResponse("upload.html", {"request": request})
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for request latency, pipeline stages and errors."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host=HOST, port=PORT, reload=DEBUG)
@@ -1,70 +1,134 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-import logging
+import asyncio
+import hmac
 import json
 import os
+import time
+import uuid
 from pathlib import Path
 
+from app.services.keyword_search import keyword_search
 from app.services.llm import LLMService
-from app.config import TOP_K_RESULTS
+from app.config import (
+    TOP_K_RESULTS, SESSION_STORE, SESSION_DB_PATH, SESSION_TTL_SECONDS, SESSION_MAX_MB,
+    FEEDBACK_STORE, FEEDBACK_PATH, FEEDBACK_FSYNC, FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_SECONDS,
+    KB_WATCH_SECONDS, ADMIN_TOKEN, CORPUS_PACK
+)
+from app.utils.answer_store import knowledge_base_fingerprint
+from app.utils.corpus_pack import ensure_pack
+from app.utils.feedback import FEEDBACK_VALUES, FeedbackLog, create_feedback_sink, feedback_record
+from app.utils.feedback_priors import chunk_id
+from app.utils.history import HistoryManager, normalize_role
+from app.utils.knowledge_base import KnowledgeBase, KnowledgeBaseSnapshot, file_signature
+from app.utils.metadata_filter import FILTER_KEYS, url_domain
+from app.utils.schools import tag_school
+from app.utils.sessions import create_session_store
+from app.utils.log import get_logger, sampled
+from app.utils.metrics import REGISTRY
 
 # Get folder paths from environment variables
 PROCESSED_FOLDER = os.getenv("PROCESSED_FOLDER", "processed")
 
 router = APIRouter()
 
-# Set up logging
-logger = logging.getLogger("starbot.chat")
-logging.basicConfig(level=logging.INFO)
+STAGE_SECONDS = REGISTRY.histogram("starbot_stage_duration_seconds", "Time spent in each RAG pipeline stage", ["stage"])
+ERRORS = REGISTRY.counter("starbot_errors_total", "Chat requests that ended in an error response", ["type"])
 
-def load_processed_data():
-    """Load data from processed files."""
-    all_data = []
+# Set up logging (JSON, written off the request path; see app/utils/log.py)
+logger = get_logger("chat")
 
-    # Load uploads data
-    uploads_data_path = Path(PROCESSED_FOLDER) / "uploads_data.json"
-    if uploads_data_path.exists():
-        try:
-            with open(uploads_data_path, 'r', encoding='utf-8') as f:
-                uploads_data = json.load(f)
-                logger.info(f"Loaded {len(uploads_data)} documents from {uploads_data_path}")
-                all_data.extend(uploads_data)
-        except Exception as e:
-            logger.error(f"Error loading uploads data: {str(e)}")
+def processed_files() -> List[str]:
+    return [str(Path(PROCESSED_FOLDER) / "uploads_data.json"), str(Path(PROCESSED_FOLDER) / "web_data.json")]
 
-    # Load web data
-    web_data_path = Path(PROCESSED_FOLDER) / "web_data.json"
-    if web_data_path.exists():
+def load_processed_data(strict: bool = False) -> List[Dict[str, Any]]:
+    """Load data from processed files; with strict, an unreadable file raises instead of being skipped."""
+    all_data = []
+
+    for path in processed_files():
+        if not os.path.exists(path):
+            continue
         try:
-            with open(web_data_path, 'r', encoding='utf-8') as f:
-                web_data = json.load(f)
-                logger.info(f"Loaded {len(web_data)} documents from {web_data_path}")
-                all_data.extend(web_data)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                logger.info(f"Loaded {len(data)} documents from {path}")
+                all_data.extend(data)
         except Exception as e:
-            logger.error(f"Error loading web data: {str(e)}")
+            if strict:
+                raise
+            logger.error(f"Error loading {path}: {str(e)}")
 
     logger.info(f"Total processed documents loaded: {len(all_data)}")
     return all_data
 
-# Load processed data at module initialization
-processed_data = load_processed_data()
+def load_chunks(strict: bool = False) -> List[Dict[str, Any]]:
+    """The processed documents with their chunk IDs, schools and URL domains."""
+    items = load_processed_data(strict)
+    for item in items:
+        metadata = item.setdefault("metadata", {})
+        metadata["chunk_id"] = chunk_id(metadata.get("source_file") or metadata.get("filename", ""), item.get("text", ""))
+        # Data processed before school tagging is tagged here
+        metadata["school"] = tag_school(item.get("text", ""), metadata)
+        if metadata.get("url") and "domain" not in metadata:
+            metadata["domain"] = url_domain(metadata["url"])
+    return items
+
+def build_snapshot(initial: bool = True) -> KnowledgeBaseSnapshot:
+    """Load the processed files into a new knowledge base version.
+
+    With CORPUS_PACK the chunks are served from a memory-mapped pack that all workers
+    share (rebuilt by whichever worker first sees the files change) instead of a
+    private list per worker.
+    """
+    if CORPUS_PACK:
+        pack = ensure_pack(str(Path(PROCESSED_FOLDER) / "corpus.pack"), processed_files(),
+                           lambda: load_chunks(strict=not initial), index_keys=FILTER_KEYS)
+        return KnowledgeBaseSnapshot(version=pack.version, items=pack, files=pack.sources)
+    files = file_signature(processed_files())
+    items = load_chunks(strict=not initial)
+    return KnowledgeBaseSnapshot(version=knowledge_base_fingerprint(items), items=items, files=files)
+
+# Loaded on first use and reloaded when the processed files change (or on POST /admin/reload)
+knowledge_base = KnowledgeBase(build_snapshot, processed_files, KB_WATCH_SECONDS)
+
+REGISTRY.counter("starbot_kb_reloads_total", "Knowledge base reloads",
+                 function=lambda: knowledge_base.reloads)
+REGISTRY.counter("starbot_kb_reload_failures_total", "Knowledge base reloads that failed and kept the current version",
+                 function=lambda: knowledge_base.reload_failures)
+
+_summary_service: Optional[LLMService] = None
+
+async def summarize_history(previous_summary: str, turns: List[Dict[str, str]]) -> str:
+    """Fold older turns into the rolling summary in a worker thread, off the request path."""
+    global _summary_service
+    if _summary_service is None:
+        _summary_service = LLMService()
+    return await asyncio.to_thread(_summary_service.summarize_history, previous_summary, turns)
+
+# Recent turns verbatim plus a rolling summary of older ones, per session_id
+history_manager = HistoryManager(summarize_history, create_session_store(
+    SESSION_STORE, str(SESSION_DB_PATH), SESSION_TTL_SECONDS, int(SESSION_MAX_MB * 1024 * 1024)
+))
 
 class ChatRequest(BaseModel):
     question: str
     top_k: Optional[int] = TOP_K_RESULTS
     history: Optional[List[Dict[str, str]]] = []  # List of {"role": "user"|"bot", "content": str}
-    school: Optional[str] = None  # For future use
+    session_id: Optional[str] = None  # When set, history is kept on the server and `history` is ignored
+    school: Optional[str] = None  # A school-select value; retrieval searches its chunks and the shared ones
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
+    session_id: Optional[str] = None
 
 class FeedbackRequest(BaseModel):
     question: str
     answer: str
     feedback: str  # "helpful" or "not-helpful"
     sources: Optional[List[Dict[str, Any]]] = []
+    session_id: Optional[str] = None
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
@@ -73,137 +137,50 @@ async def chat(
 ):
     """Chat with the Star College bot using LangChain."""
     try:
-        logger.info(f"Received chat request: {request}")
+        # Sizes only; the question and history are logged for sampled requests alone
+        logger.info("Received chat request", extra={
+            "question_chars": len(request.question),
+            "history_turns": len(request.history or []),
+            "session_id": request.session_id,
+            "school": request.school,
+            "top_k": request.top_k
+        })
+        if sampled():
+            logger.info("Chat question", extra={"question": request.question[:200]})
         if not request.question:
             logger.warning("No question provided in request.")
             raise HTTPException(status_code=400, detail="No question provided")
 
-        # Optionally use request.school for filtering in the future
         # Skip vector store search and use processed data directly
-        logger.info("Using processed data directly for search")
-
-        # Enhanced keyword matching
-        query = request.question.lower()
-        query_terms = query.split()
-        matched_results = []
-
-        # Special case handling for common queries
-        special_keywords = {
-            "result": ["result", "pass rate", "distinction", "matric", "grade"],
-            "history": ["history", "founded", "established", "began", "start"],
-            "location": ["location", "address", "where", "situated", "located"],
-            "contact": ["contact", "phone", "email", "call", "reach"],
-            "admission": ["admission", "enroll", "apply", "application", "register"],
-            "fee": ["fee", "tuition", "cost", "payment", "scholarship"],
-            "curriculum": ["curriculum", "subject", "course", "program", "study"],
-            "facility": ["facility", "campus", "building", "infrastructure", "laboratory"]
-        }
-
-        # Expand query with related terms
-        expanded_terms = query_terms.copy()
-        for term in query_terms:
-            for category, keywords in special_keywords.items():
-                if term in keywords:
-                    expanded_terms.extend(keywords)
-
-        # Remove duplicates
-        expanded_terms = list(set(expanded_terms))
-        logger.info(f"Expanded query terms: {expanded_terms}")
-
-        # Year-specific matching (e.g., "2020 results")
-        year_match = None
-        import re
-        year_pattern = re.compile(r'\b(20\d\d)\b')  # Match years like 2020, 2021, etc.
-        year_matches = year_pattern.findall(query)
-        if year_matches:
-            year_match = year_matches[0]
-            logger.info(f"Detected year in query: {year_match}")
-
-        for doc in processed_data:
-            text = doc.get("text", "").lower()
-
-            # Calculate base score from term matches
-            term_matches = sum(1 for term in expanded_terms if term in text)
-
-            # Boost score for exact phrase matches
-            phrase_boost = 0
-            if query in text:
-                phrase_boost = 2.0  # Strong boost for exact phrase match
-
-            # Boost score for year matches if applicable
-            year_boost = 0
-            if year_match and year_match in text:
-                year_boost = 3.0  # Very strong boost for year match
-
-            # Calculate final score
-            total_matches = term_matches + phrase_boost + year_boost
-
-            if total_matches > 0:
-                # Add document with score
-                matched_doc = doc.copy()
-                matched_doc["score"] = total_matches / (len(expanded_terms) + 2)  # Normalize score
-                matched_results.append(matched_doc)
-
-        # Sort by score and take top_k
-        matched_results.sort(key=lambda x: x.get("score", 0), reverse=True)
-        results = matched_results[:request.top_k]
-        logger.info(f"Found {len(results)} relevant documents in processed data")
-
-        # If no or few results found, add more context from processed data
-        if len(results) < 3 and processed_data:
-            logger.info(f"Only {len(results)} matching documents found, adding more context")
-
-            # First, try to find documents with related terms
-            related_terms = []
-            for term in query_terms:
-                # Add variations of the term
-                if len(term) > 4:  # Only for longer terms to avoid too many false matches
-                    # Look for similar terms in the text of documents
-                    for doc in processed_data:
-                        text = doc.get("text", "").lower()
-                        words = text.split()
-                        related_terms.extend([word for word in words if term in word and word != term])
-
-            # For year queries, add documents with any year information
-            if year_match:
-                year_docs = []
-                for doc in processed_data:
-                    text = doc.get("text", "").lower()
-                    if re.search(r'\b20\d\d\b', text):  # Any year mention
-                        if doc not in results:
-                            doc_copy = doc.copy()
-                            doc_copy["score"] = 0.3  # Medium score for any year mention
-                            year_docs.append(doc_copy)
-
-                # Add up to 3 year-related documents
-                year_docs = year_docs[:3]
-                results.extend(year_docs)
-                logger.info(f"Added {len(year_docs)} documents with year information")
-
-            # If still not enough results, add some general information about Star College
-            if len(results) < 3:
-                general_docs = []
-                general_keywords = ["star college", "school", "education", "academic", "student"]
-
-                for doc in processed_data:
-                    if doc not in results:
-                        text = doc.get("text", "").lower()
-                        # Check if document contains general information
-                        if any(keyword in text for keyword in general_keywords):
-                            doc_copy = doc.copy()
-                            doc_copy["score"] = 0.2  # Lower score for general information
-                            general_docs.append(doc_copy)
-
-                # Sort by length (prefer shorter, more focused documents)
-                general_docs.sort(key=lambda x: len(x.get("text", "")))
-
-                # Add enough general docs to reach at least 3 total results
-                needed = max(3 - len(results), 0)
-                results.extend(general_docs[:needed])
-                logger.info(f"Added {min(needed, len(general_docs))} general information documents")
+        logger.debug("Using processed data directly for search")
+
+        # Keyword matching over the processed data (app/services/keyword_search.py); one
+        # snapshot for the whole request, so a reload meanwhile does not mix versions. A
+        # selected school narrows it to that school's chunks plus the shared ones
+        snapshot = knowledge_base.current
+        stage_started = time.perf_counter()
+        results = keyword_search(request.question, snapshot.items, request.top_k, school=request.school)
+        STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage="retrieval")
+
+        # Server-side history for clients with a session_id, else the client's recent turns.
+        # A request without one starts a session; the pages send its ID with the next question
+        session_id = request.session_id or uuid.uuid4().hex
+        if request.session_id:
+            summary, history = history_manager.context(session_id)
+        else:
+            summary = ""
+            history = [
+                {"role": normalize_role(turn.get("role", "user")), "content": turn.get("content", "")}
+                for turn in (request.history or [])[-history_manager.keep_recent:]
+            ]
 
         # Generate response using LangChain LLM, now with history
-        answer = llm_service.generate_response(request.question, results, history=request.history)
+        with STAGE_SECONDS.time(stage="generation"):
+            answer = llm_service.generate_response(request.question, results, history=history, summary=summary)
+
+        # Older turns are summarized in the background once enough pile up
+        history_manager.record(session_id, "user", request.question)
+        history_manager.record(session_id, "assistant", answer)
 
         # Format sources for response
         sources = []
@@ -215,41 +192,75 @@ async def chat(
             }
             sources.append(source)
 
-        logger.info("Chat response generated successfully.")
-        return ChatResponse(answer=answer, sources=sources)
+        logger.info("Chat response generated", extra={
+            "documents": len(results),
+            "answer_chars": len(answer),
+            "context_tokens": llm_service.last_context.tokens,
+            "context_tokens_saved": llm_service.last_context.tokens_saved
+        })
+        return ChatResponse(answer=answer, sources=sources, session_id=session_id)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+        ERRORS.inc(type="chat_error")
         return ChatResponse(
             answer=f"I'm sorry, there was an error processing your request. Please try again later.",
             sources=[]
         )
 
+# Feedback log, written in batches by a background task
+feedback_log = FeedbackLog(
+    create_feedback_sink(FEEDBACK_STORE, str(FEEDBACK_PATH), FEEDBACK_FSYNC),
+    batch_size=FEEDBACK_BATCH_SIZE, flush_interval=FEEDBACK_FLUSH_SECONDS
+)
+
+FEEDBACK = REGISTRY.counter("starbot_feedback_total", "Feedback submissions by rating", ["feedback"])
+REGISTRY.gauge("starbot_feedback_pending", "Feedback records queued but not yet written",
+               function=lambda: feedback_log.stats()["pending"])
+REGISTRY.counter("starbot_feedback_dropped_total", "Feedback records dropped because the queue was full",
+                 function=lambda: feedback_log.dropped)
+REGISTRY.counter("starbot_feedback_write_failures_total", "Failed feedback batch writes (records are retried)",
+                 function=lambda: feedback_log.write_failures)
+
 @router.post("/feedback")
 async def feedback(request: FeedbackRequest):
     """Record user feedback on chat responses."""
+    if request.feedback not in FEEDBACK_VALUES:
+        raise HTTPException(status_code=422, detail=f"feedback must be one of: {', '.join(FEEDBACK_VALUES)}")
+
+    logger.info("Received feedback", extra={"feedback": request.feedback, "question_chars": len(request.question)})
+
+    # Queued only; the disk write happens off the request path
+    record = feedback_record(request.question, request.answer, request.feedback, request.sources or [], request.session_id)
+    if not feedback_log.submit(record):
+        logger.warning("Feedback queue full; feedback dropped")
+        raise HTTPException(status_code=503, detail="Feedback is temporarily unavailable, please try again later")
+    FEEDBACK.inc(feedback=request.feedback)
+
+    return {"status": "success", "message": "Feedback recorded successfully"}
+
+@router.post("/admin/reload")
+async def admin_reload(request: Request):
+    """Rebuild the knowledge base from the processed files and swap it in."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    supplied = request.headers.get("x-admin-token") or request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
     try:
-        logger.info(f"Received feedback: {request.feedback} for Q: '{request.question}'")
-
-        # Create feedback directory if it doesn't exist
-        feedback_dir = Path("feedback")
-        feedback_dir.mkdir(exist_ok=True)
-
-        # Create a unique filename with timestamp
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        feedback_file = feedback_dir / f"feedback_{timestamp}.json"
-
-        # Save feedback to file
-        with open(feedback_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "question": request.question,
-                "answer": request.answer,
-                "feedback": request.feedback,
-                "sources": request.sources,
-                "timestamp": timestamp
-            }, f, indent=2)
-
-        return {"status": "success", "message": "Feedback recorded successfully"}
+        changed, snapshot = await knowledge_base.reload("admin")
     except Exception as e:
-        logger.error(f"Error recording feedback: {str(e)}", exc_info=True)
-        return {"status": "error", "message": str(e)}
+        raise HTTPException(status_code=500, detail=f"Reload failed; still serving version {knowledge_base.stats()['version']}: {str(e)}")
+    return {"status": "reloaded" if changed else "unchanged", "version": snapshot.version, "chunks": len(snapshot.items)}
+
+@router.on_event("startup")
+async def watch_knowledge_base():
+    """Load the knowledge base off the event loop and start watching its files."""
+    await asyncio.to_thread(lambda: knowledge_base.current)
+    knowledge_base.start_watching()
+
+@router.on_event("shutdown")
+async def flush_feedback():
+    """Stop watching the data files and write queued feedback before the process exits."""
+    await knowledge_base.stop_watching()
+    await feedback_log.close()
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List
 
+from app.config import UPLOAD_BATCH_CHUNKS
 from app.services.file_processor import FileProcessor
 from app.services.vector_store import VectorStore
 from app.utils.helpers import is_allowed_file
@@ -47,26 +49,38 @@ async def upload_files(
             # Save the uploaded file
             file_path = await file_processor.save_uploaded_file(file, filename)
 
-            # Process the file using LangChain document loaders
-            chunks = file_processor.process_file(file_path)
+            # Process and store the file off the event loop, batch by batch as chunks are
+            # extracted, so a large PDF is never held whole; pages and OCR run in worker pools
+            def store_chunks() -> int:
+                stored = 0
+                for batch in file_processor.iter_chunk_batches(file_path, UPLOAD_BATCH_CHUNKS):
+                    # Add chunks to vector store (ChromaDB or FAISS)
+                    vector_store.add_documents(batch)
+                    stored += len(batch)
+                return stored
 
-            if not chunks:
+            chunk_count = await run_in_threadpool(store_chunks)
+
+            if not chunk_count:
+                message = "No text content could be extracted from the file"
+                if file_processor.last_extraction_stats.get("error") == "ocr_engine_not_installed":
+                    message = "Image text extraction is unavailable: no OCR engine is installed on the server"
                 results.append({
                     "filename": filename,
                     "status": "error",
-                    "message": "No text content could be extracted from the file"
+                    "message": message
                 })
                 continue
 
-            # Add chunks to vector store (ChromaDB or FAISS)
-            vector_store.add_documents(chunks)
-
-            results.append({
+            result = {
                 "filename": filename,
                 "status": "success",
-                "chunks_extracted": len(chunks),
-                "message": f"File processed successfully. {len(chunks)} chunks extracted and stored in {store_type}."
-            })
+                "chunks_extracted": chunk_count,
+                "message": f"File processed successfully. {chunk_count} chunks extracted and stored in {store_type}."
+            }
+            if file_processor.last_extraction_stats:
+                result["extraction"] = file_processor.last_extraction_stats
+            results.append(result)
 
         except Exception as e:
             results.append({
@@ -1,4 +1,6 @@
-from typing import List, Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
 
 try:
     # Try the new import path first
@@ -8,20 +10,114 @@ except ImportError:
     from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
-from app.config import EMBEDDING_MODEL
+from app.config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    ONNX_MODEL_FOLDER,
+    ONNX_QUANTIZED,
+    ONNX_NUM_THREADS,
+    EMBEDDING_BATCH_SIZE,
+    QUERY_BATCH_MAX_WAIT_MS,
+    QUERY_BATCH_MAX_SIZE,
+)
+
+class QueryBatcher:
+    """Collect concurrent query embeddings and run them as one batched forward pass.
+
+    A batch is flushed after max_wait_ms or as soon as max_batch texts are queued.
+    Batches run one at a time on a dedicated thread, so requests arriving while a
+    batch is encoding simply form the next, larger batch.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        max_wait_ms: float = QUERY_BATCH_MAX_WAIT_MS,
+        max_batch: int = QUERY_BATCH_MAX_SIZE,
+    ):
+        self.embed_batch = embed_batch
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-batcher")
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Counters for load tests and monitoring
+        self.batches = 0
+        self.queries = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or the service outlived a previous event loop
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            self._loop.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            vectors = await self._loop.run_in_executor(self._executor, self.embed_batch, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.queries += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            # Callers that were cancelled meanwhile are skipped
+            if not future.done():
+                future.set_result(vector)
 
 class EmbeddingService:
     """Service for creating text embeddings using LangChain."""
 
-    def __init__(self):
+    def __init__(self, backend: str = EMBEDDING_BACKEND):
         self.model = None
         self.model_name = EMBEDDING_MODEL
+        self.backend = backend
+        self.query_batcher: Optional[QueryBatcher] = None
 
     def load_model(self):
-        """Load the embedding model using LangChain HuggingFaceEmbeddings."""
+        """Load the embedding model for the configured backend."""
         if self.model is None:
-            print(f"Loading embedding model: {self.model_name}")
-            self.model = HuggingFaceEmbeddings(model_name=self.model_name)
+            if self.backend == "onnx":
+                # Imported lazily so the PyTorch path does not need onnxruntime
+                from app.services.onnx_embedding import OnnxEmbeddings
+
+                print(f"Loading ONNX embedding model from {ONNX_MODEL_FOLDER} (quantized={ONNX_QUANTIZED})")
+                self.model = OnnxEmbeddings(
+                    model_folder=ONNX_MODEL_FOLDER,
+                    quantized=ONNX_QUANTIZED,
+                    num_threads=ONNX_NUM_THREADS,
+                    batch_size=EMBEDDING_BATCH_SIZE,
+                )
+            else:
+                print(f"Loading embedding model: {self.model_name}")
+                self.model = HuggingFaceEmbeddings(model_name=self.model_name)
 
     def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Get embeddings for a list of texts."""
@@ -39,6 +135,16 @@ class EmbeddingService:
         embedding = self.model.embed_query(text)
         return embedding
 
+    async def aembed_query(self, text: str) -> List[float]:
+        """Get a query embedding, batched together with other concurrent callers."""
+        self.load_model()
+
+        if self.query_batcher is None:
+            # embed_query and embed_documents encode the same way for both backends
+            self.query_batcher = QueryBatcher(self.model.embed_documents)
+
+        return await self.query_batcher.embed(text)
+
     def embed_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Embed a list of document chunks."""
         if not documents:
@@ -1,16 +1,52 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 from langchain_community.document_loaders import (
-    PyMuPDFLoader,
     Docx2txtLoader,
-    UnstructuredImageLoader,
     TextLoader
 )
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from app.config import UPLOAD_FOLDER, PROCESSED_FOLDER, CHUNK_SIZE, CHUNK_OVERLAP
+from app.config import (
+    UPLOAD_FOLDER,
+    PROCESSED_FOLDER,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    PDF_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_WINDOW_TASKS,
+)
+from app.services.ocr import OCRService
 from app.utils.helpers import generate_unique_id
+from app.utils.log import get_logger
+from app.utils.schools import tag_school
+from app.utils.text_splitter import OffsetTextSplitter
+
+logger = get_logger("file_processor")
+
+# One PDF pool per process, started on first use and shared by every FileProcessor.
+# Spawned rather than forked: uploads are processed from threads, and forking a
+# threaded process can copy held locks into the children.
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+_pdf_executor_lock = threading.Lock()
+
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=get_context("spawn"))
+        return _pdf_executor
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract the text of pages [start, end). Runs in a worker process."""
+    import fitz
+
+    with fitz.open(file_path) as pdf:
+        return [(page_number, pdf[page_number].get_text()) for page_number in range(start, end)]
 
 class FileProcessor:
     """Process different file types using LangChain document loaders."""
@@ -18,11 +54,9 @@ class FileProcessor:
     def __init__(self):
         self.upload_folder = UPLOAD_FOLDER
         self.processed_folder = PROCESSED_FOLDER
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-        )
+        self.text_splitter = OffsetTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        self.ocr_service = OCRService()
+        self.last_extraction_stats: Dict[str, Any] = {}
 
     async def save_uploaded_file(self, file, filename: str) -> Path:
         """Save an uploaded file to the upload folder."""
@@ -34,21 +68,138 @@ class FileProcessor:
 
         return file_path
 
+    def _split_into_chunks(self, text: str, metadata: Dict[str, Any], source_type: str, file_path: Path) -> Iterator[Dict[str, Any]]:
+        """Split one loaded document, recording each chunk's character offsets in metadata."""
+        for start, end in self.text_splitter.split_offsets(text):
+            chunk_metadata = dict(metadata, start_index=start, end_index=end)
+            yield self._make_chunk(text[start:end], chunk_metadata, source_type, file_path)
+
+    def _make_chunk(self, text: str, metadata: Dict[str, Any], source_type: str, file_path: Path) -> Dict[str, Any]:
+        """Wrap a chunk of text in our document format with metadata."""
+        metadata = metadata.copy()
+
+        # Add our custom metadata
+        metadata["source_type"] = "file"
+        metadata["file_type"] = source_type
+        metadata["filename"] = file_path.name
+        metadata["school"] = tag_school(text, metadata)
+
+        return {
+            "id": generate_unique_id(),
+            "text": text,
+            "metadata": metadata
+        }
+
+    def iter_pdf_chunks(self, file_path: Path) -> Iterator[Dict[str, Any]]:
+        """Stream chunks from a PDF in page order.
+
+        Page ranges are extracted across a process pool; only PDF_WINDOW_TASKS ranges
+        are in flight at a time, so memory is bounded by that window of pages rather
+        than the whole document. Metadata matches what PyMuPDFLoader produces.
+        """
+        import fitz
+
+        started = time.perf_counter()
+        with fitz.open(str(file_path)) as pdf:
+            total_pages = len(pdf)
+            document_metadata = {
+                key: value for key, value in pdf.metadata.items() if type(value) in [str, int]
+            }
+
+        base_metadata = {
+            "source": str(file_path),
+            "file_path": str(file_path),
+            "total_pages": total_pages,
+            **document_metadata,
+        }
+
+        def chunks_for_pages(pages: List[Tuple[int, str]]) -> Iterator[Dict[str, Any]]:
+            for page_number, page_text in pages:
+                metadata = dict(base_metadata, page=page_number)
+                yield from self._split_into_chunks(page_text, metadata, "pdf", file_path)
+
+        ranges = [
+            (start, min(start + PDF_PAGES_PER_TASK, total_pages))
+            for start in range(0, total_pages, PDF_PAGES_PER_TASK)
+        ]
+
+        if len(ranges) <= 1 or PDF_WORKERS <= 1:
+            # Not worth starting worker processes
+            for start, end in ranges:
+                yield from chunks_for_pages(_extract_page_range(str(file_path), start, end))
+        else:
+            executor = _get_pdf_executor()
+            pending_ranges = iter(ranges)
+            in_flight = deque()
+
+            def submit_next() -> None:
+                next_range = next(pending_ranges, None)
+                if next_range is not None:
+                    in_flight.append(executor.submit(_extract_page_range, str(file_path), *next_range))
+
+            try:
+                for _ in range(max(1, PDF_WINDOW_TASKS)):
+                    submit_next()
+
+                while in_flight:
+                    pages = in_flight.popleft().result()
+                    # Keep the window full before handing chunks to the caller
+                    submit_next()
+                    yield from chunks_for_pages(pages)
+            finally:
+                # The pool outlives this file; don't leave its ranges queued if the caller stops early
+                for future in in_flight:
+                    future.cancel()
+
+        elapsed = time.perf_counter() - started
+        pages_per_sec = total_pages / elapsed if elapsed > 0 else 0.0
+        self.last_extraction_stats = {
+            "pages": total_pages,
+            "seconds": round(elapsed, 3),
+            "pages_per_sec": round(pages_per_sec, 1),
+        }
+        logger.info("PDF pages extracted", extra={"file": file_path.name, **self.last_extraction_stats})
+
+    def iter_chunk_batches(self, file_path: Path, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        """A file's chunks in lists of at most batch_size.
+
+        PDFs are streamed from iter_pdf_chunks, so only one batch and the window of pages
+        in flight are held at a time; extraction errors are raised rather than swallowed.
+        """
+        if file_path.suffix.lower() == ".pdf":
+            self.last_extraction_stats = {}
+            chunks = self.iter_pdf_chunks(file_path)
+        else:
+            chunks = iter(self.process_file(file_path))
+
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     def process_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """Process a file based on its extension using LangChain document loaders."""
         extension = file_path.suffix.lower()
+        self.last_extraction_stats = {}
 
         try:
-            # Select the appropriate loader based on file extension
             if extension == ".pdf":
-                loader = PyMuPDFLoader(str(file_path))
-                source_type = "pdf"
-            elif extension in [".docx", ".doc"]:
+                return list(self.iter_pdf_chunks(file_path))
+
+            if extension in [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]:
+                # OCR runs in the OCR worker pool, cached by image content
+                text = self.ocr_service.extract_text(file_path)
+                self.last_extraction_stats = self.ocr_service.last_result
+                return list(self._split_into_chunks(text, {"source": str(file_path)}, "image", file_path))
+
+            # Select the appropriate loader based on file extension
+            if extension in [".docx", ".doc"]:
                 loader = Docx2txtLoader(str(file_path))
                 source_type = "doc"
-            elif extension in [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]:
-                loader = UnstructuredImageLoader(str(file_path))
-                source_type = "image"
             elif extension in [".txt", ".md", ".html"]:
                 loader = TextLoader(str(file_path))
                 source_type = "text"
@@ -58,26 +209,12 @@ class FileProcessor:
             # Load documents
             documents = loader.load()
 
-            # Split documents into chunks
-            splits = self.text_splitter.split_documents(documents)
-
-            # Convert to our format with metadata
+            # Split documents into chunks in our format with metadata
             chunks_with_metadata = []
-            for doc in splits:
-                # Extract existing metadata
-                metadata = doc.metadata.copy()
-
-                # Add our custom metadata
-                metadata["source_type"] = "file"
-                metadata["file_type"] = source_type
-                metadata["filename"] = file_path.name
-
-                chunks_with_metadata.append({
-                    "id": generate_unique_id(),
-                    "text": doc.page_content,
-                    "metadata": metadata
-                })
-
+            for doc in documents:
+                chunks_with_metadata.extend(
+                    self._split_into_chunks(doc.page_content, doc.metadata, source_type, file_path)
+                )
             return chunks_with_metadata
 
         except Exception as e:
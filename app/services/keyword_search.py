@@ -0,0 +1,158 @@
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.corpus_pack import CorpusPack
+from app.utils.log import get_logger, sampled
+from app.utils.metadata_filter import Where, all_of, matches
+from app.utils.schools import school_where
+
+logger = get_logger("retrieval")
+
+def _lowered_texts(documents: Sequence[Dict[str, Any]], chunks: Optional[List[int]] = None) -> Iterator[Tuple[int, str]]:
+    """(index, lowercased text) of each document, or of `chunks` only; packs store it lowercased."""
+    indexes = range(len(documents)) if chunks is None else chunks
+    if isinstance(documents, CorpusPack):
+        return ((i, documents.lowered(i)) for i in indexes)
+    return ((i, documents[i].get("text", "").lower()) for i in indexes)
+
+def filtered_chunks(documents: Sequence[Dict[str, Any]], where: Optional[Where]) -> Optional[List[int]]:
+    """IDs of the documents passing a metadata filter, in order; None when there is no filter.
+
+    A pack answers from its value indexes; a list is checked document by document.
+    Raises ValueError for a malformed filter.
+    """
+    if isinstance(documents, CorpusPack):
+        return documents.filter(where)
+    where = all_of(where)
+    if where is None:
+        return None
+    return [i for i, doc in enumerate(documents) if matches(where, doc.get("metadata", {}))]
+
+def keyword_search(question: str, documents: Sequence[Dict[str, Any]], top_k: int,
+                   school: Optional[str] = None, where: Optional[Where] = None) -> List[Dict[str, Any]]:
+    """Score documents by (expanded) query term, phrase and year matches, topping up weak results.
+
+    `documents` is a list of chunk dicts or a CorpusPack, whose token index narrows the
+    scan to chunks containing a term. Returns copies of the matched documents with a
+    "score" key, best first. When fewer than three match, documents mentioning any year
+    (for year questions) and general school information are added with fixed low scores.
+    With a `school`, only that school's documents and the shared ones are searched, and
+    with `where` (app/utils/metadata_filter.py) only the documents passing the filter.
+    """
+    query = question.lower()
+    query_terms = query.split()
+    matched_results = []
+
+    # Special case handling for common queries
+    special_keywords = {
+        "result": ["result", "pass rate", "distinction", "matric", "grade"],
+        "history": ["history", "founded", "established", "began", "start"],
+        "location": ["location", "address", "where", "situated", "located"],
+        "contact": ["contact", "phone", "email", "call", "reach"],
+        "admission": ["admission", "enroll", "apply", "application", "register"],
+        "fee": ["fee", "tuition", "cost", "payment", "scholarship"],
+        "curriculum": ["curriculum", "subject", "course", "program", "study"],
+        "facility": ["facility", "campus", "building", "infrastructure", "laboratory"]
+    }
+
+    # Expand query with related terms
+    expanded_terms = query_terms.copy()
+    for term in query_terms:
+        for category, keywords in special_keywords.items():
+            if term in keywords:
+                expanded_terms.extend(keywords)
+
+    # Remove duplicates
+    expanded_terms = list(set(expanded_terms))
+    if sampled():
+        logger.info("Expanded query terms", extra={"terms": expanded_terms})
+
+    # Year-specific matching (e.g., "2020 results")
+    year_match = None
+    import re
+    year_pattern = re.compile(r'\b(20\d\d)\b')  # Match years like 2020, 2021, etc.
+    year_matches = year_pattern.findall(query)
+    if year_matches:
+        year_match = year_matches[0]
+        logger.debug("Detected year in query", extra={"year": year_match})
+
+    # Every match contains a term, the phrase or the year, so a pack only scans the chunks
+    # its token index lists for them. The year is a term of its own: in "fees 2020?" the
+    # query term is "2020?", which a chunk mentioning just "2020" does not contain
+    allowed = filtered_chunks(documents, all_of(school_where(school), where))
+    chunks = allowed
+    if isinstance(documents, CorpusPack) and query_terms:
+        chunks = documents.candidates(expanded_terms + [query] + ([year_match] if year_match else []))
+        if allowed is not None:
+            allowed_set = set(allowed)
+            chunks = [i for i in chunks if i in allowed_set]
+
+    for i, text in _lowered_texts(documents, chunks):
+        # Calculate base score from term matches
+        term_matches = sum(1 for term in expanded_terms if term in text)
+
+        # Boost score for exact phrase matches
+        phrase_boost = 0
+        if query in text:
+            phrase_boost = 2.0  # Strong boost for exact phrase match
+
+        # Boost score for year matches if applicable
+        year_boost = 0
+        if year_match and year_match in text:
+            year_boost = 3.0  # Very strong boost for year match
+
+        # Calculate final score
+        total_matches = term_matches + phrase_boost + year_boost
+
+        if total_matches > 0:
+            # Normalize score; the document itself is copied only if it makes the top_k
+            matched_results.append((total_matches / (len(expanded_terms) + 2), i))
+
+    # Sort by score and take top_k
+    matched_results.sort(key=lambda match: match[0], reverse=True)
+    results = [dict(documents[i], score=score) for score, i in matched_results[:top_k]]
+    logger.debug("Matched processed documents", extra={"documents": len(results)})
+
+    # If no or few results found, add more context from processed data
+    if len(results) < 3 and documents:
+        logger.debug("Few matching documents, adding more context", extra={"documents": len(results)})
+
+        # For year queries, add documents with any year information
+        if year_match:
+            year_docs = []
+            for i, text in _lowered_texts(documents, allowed):
+                if re.search(r'\b20\d\d\b', text):  # Any year mention
+                    doc = documents[i]
+                    if doc not in results:
+                        doc_copy = doc.copy()
+                        doc_copy["score"] = 0.3  # Medium score for any year mention
+                        year_docs.append(doc_copy)
+
+            # Add up to 3 year-related documents
+            year_docs = year_docs[:3]
+            results.extend(year_docs)
+            logger.debug("Added year documents", extra={"documents": len(year_docs)})
+
+        # If still not enough results, add some general information about Star College
+        if len(results) < 3:
+            general_docs = []
+            general_keywords = ["star college", "school", "education", "academic", "student"]
+
+            for i, text in _lowered_texts(documents, allowed):
+                # Check if document contains general information
+                if any(keyword in text for keyword in general_keywords):
+                    doc = documents[i]
+                    if doc not in results:
+                        doc_copy = doc.copy()
+                        doc_copy["score"] = 0.2  # Lower score for general information
+                        general_docs.append(doc_copy)
+
+            # Sort by length (prefer shorter, more focused documents)
+            general_docs.sort(key=lambda x: len(x.get("text", "")))
+
+            # Add enough general docs to reach at least 3 total results
+            needed = max(3 - len(results), 0)
+            results.extend(general_docs[:needed])
+            logger.debug("Added general documents", extra={"documents": min(needed, len(general_docs))})
+
+    return results
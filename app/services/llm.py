@@ -4,7 +4,18 @@ import json
 
 from langchain_community.llms import HuggingFaceHub
 
-from app.config import HUGGINGFACE_API_KEY, DEEPSEEK_API_KEY, LLM_MODEL
+from app.config import (
+    HUGGINGFACE_API_KEY, DEEPSEEK_API_KEY, DEEPSEEK_API_URL, LLM_MODEL,
+    CONTEXT_TOKEN_BUDGET, HISTORY_TOKEN_BUDGET
+)
+from app.utils.context_budget import AssembledContext, ContextAssembler, fit_history
+from app.utils.history import summary_messages
+from app.utils.metrics import REGISTRY, record_llm_usage
+
+CONTEXT_TOKENS = REGISTRY.histogram("starbot_context_tokens", "Prompt tokens spent on retrieved context",
+                                    buckets=(100, 200, 400, 600, 800, 1000, 1200, 1600, 2400, 4000))
+CONTEXT_TOKENS_SAVED = REGISTRY.counter("starbot_context_tokens_saved_total",
+                                        "Context tokens not sent compared with including every retrieved chunk in full")
 
 class LLMService:
     """Service for interacting with the LLM using DeepSeek API."""
@@ -15,6 +26,8 @@ class LLMService:
         self.model_name = LLM_MODEL
         self.llm = None
         self.qa_chain = None
+        self.last_context = AssembledContext()
+        self.last_usage = {}
 
         # Check if DeepSeek API key is available
         if self.deepseek_api_key:
@@ -68,7 +81,7 @@ class LLMService:
 
             print("Generating response...")
             response = requests.post(
-                "https://api.deepseek.com/v1/chat/completions",
+                DEEPSEEK_API_URL,
                 headers=headers,
                 data=json.dumps(data),
                 timeout=30  # Add timeout to prevent hanging
@@ -79,6 +92,7 @@ class LLMService:
                 return f"Error from DeepSeek API: Status code {response.status_code}. Please try again later."
 
             result = response.json()
+            self.last_usage = record_llm_usage(result.get("usage"))
 
             if "choices" in result and len(result["choices"]) > 0:
                 answer = result["choices"][0]["message"]["content"]
@@ -94,8 +108,36 @@ class LLMService:
             traceback.print_exc()
             return f"Error calling DeepSeek API: {str(e)}"
 
-    def generate_response(self, query: str, context: List[Dict[str, Any]], history: List[Dict[str, str]] = None) -> str:
-        """Generate a dynamic, thoughtful response to the query using the provided context and conversation history."""
+    def summarize_history(self, previous_summary: str, turns: List[Dict[str, str]]) -> str:
+        """Fold older conversation turns into a rolling summary; raises on failure so the turns are kept."""
+        if not self.deepseek_api_key:
+            raise RuntimeError("DeepSeek API key is required for history summaries")
+
+        response = requests.post(
+            DEEPSEEK_API_URL,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.deepseek_api_key}"
+            },
+            data=json.dumps({
+                "model": "deepseek-chat",
+                "messages": summary_messages(previous_summary, turns),
+                "temperature": 0.0,
+                "max_tokens": 200
+            }),
+            timeout=30
+        )
+        response.raise_for_status()
+        result = response.json()
+        record_llm_usage(result.get("usage"))
+        return result["choices"][0]["message"]["content"]
+
+    def generate_response(self, query: str, context: List[Dict[str, Any]], history: List[Dict[str, str]] = None,
+                          summary: str = "") -> str:
+        """Generate a dynamic, thoughtful response to the query using the provided context and conversation history.
+
+        `history` holds the recent turns to send verbatim and `summary` the rolling summary of older ones.
+        """
         # Always proceed with the available context, even if it's empty
         # This ensures we use the processed data
 
@@ -121,14 +163,22 @@ IMPORTANT GUIDELINES:
 7. Use simple, clear language without academic or flowery phrasing.
 8. Answer directly what was asked without adding tangential information.
 
-Remember: Your goal is to be helpful by providing the most relevant information available, even if it's not a perfect match for the query."""
+Remember: Your goal is to be helpful by providing the most relevant information available, even if it's not a perfect match for the query.
+
+Each question comes with relevant information about Star College. Even if the information doesn't perfectly match the question, provide a helpful response using what's available. For example, if asked about "2020 results" but you only have data from 2019 or 2021, provide that information and specify the year.
+
+Please provide a short, direct answer (1-3 sentences) based on this information. Be extremely concise but informative."""
         }
         messages.append(system_message)
 
+        # Older turns arrive folded into a summary, after the static instructions
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the conversation so far: {summary}"})
+
         # Add conversation history if available
         if history:
-            # Only include the last few turns to keep context manageable
-            recent_history = history[-6:] if len(history) > 6 else history
+            # Only include the most recent turns that fit the history token budget
+            recent_history = fit_history(history, HISTORY_TOKEN_BUDGET)
             for turn in recent_history:
                 role = turn.get("role", "user")
                 content = turn.get("content", "")
@@ -136,16 +186,13 @@ Remember: Your goal is to be helpful by providing the most relevant information
                 api_role = "assistant" if role == "bot" else role
                 messages.append({"role": api_role, "content": content})
 
-        # Add the context and current query as the final user message
-        user_message = f"""Question: {query}
-
-Here is the relevant information about Star College to help you answer:
+        # Add the context and current query as the final user message; the static
+        # instructions live in the system message so they form a cacheable prefix
+        user_message = f"""Here is the relevant information about Star College to help you answer:
 
 {formatted_context}
 
-IMPORTANT: Even if the information doesn't perfectly match the question, provide a helpful response using what's available. For example, if asked about "2020 results" but you only have data from 2019 or 2021, provide that information and specify the year.
-
-Please provide a short, direct answer (1-3 sentences) based on this information. Be extremely concise but informative."""
+Question: {query}"""
 
         messages.append({"role": "user", "content": user_message})
 
@@ -176,15 +223,17 @@ Please provide a short, direct answer (1-3 sentences) based on this information.
             return "I'm sorry, I encountered an error while generating a response. Please try again later."
 
     def _format_context(self, context: List[Dict[str, Any]]) -> str:
-        """Format the context for the prompt."""
-        formatted_chunks = []
-
-        for i, item in enumerate(context):
-            text = item.get("text", "")
-            source = self._format_source(item)
-            formatted_chunks.append(f"[{i+1}] {text}\nSource: {source}")
-
-        return "\n\n".join(formatted_chunks)
+        """Format the best context chunks for the prompt within the context token budget."""
+        assembler = ContextAssembler(
+            CONTEXT_TOKEN_BUDGET,
+            score_key="score",
+            render=lambda item, text, position: f"[{position}] {text}\nSource: {self._format_source(item)}"
+        )
+        self.last_context = assembler.assemble(context)
+        CONTEXT_TOKENS.observe(self.last_context.tokens)
+        CONTEXT_TOKENS_SAVED.inc(self.last_context.tokens_saved)
+
+        return "\n\n".join(self.last_context.sections)
 
     def _format_source(self, item: Dict[str, Any]) -> str:
         """Format the source information."""
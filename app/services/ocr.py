@@ -0,0 +1,143 @@
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import OCR_WORKERS, OCR_CACHE_FOLDER, OCR_MAX_DIMENSION
+from app.utils.log import get_logger
+
+logger = get_logger("ocr")
+
+# One pool per process, shared by every OCRService (FileProcessor is created per request);
+# spawned, since OCR is requested from threads and forking a threaded process is unsafe
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS), mp_context=get_context("spawn"))
+        return _executor
+
+def _ocr_image(data: bytes, max_dimension: int) -> Tuple[str, Tuple[int, int], Tuple[int, int]]:
+    """Downscale and OCR one image. Runs in a worker process."""
+    from PIL import Image
+    import pytesseract
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    original_size = image.size
+
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    return pytesseract.image_to_string(image), original_size, image.size
+
+def ocr_engine_available() -> bool:
+    """Whether Pillow, pytesseract and the tesseract binary are all installed."""
+    return (
+        importlib.util.find_spec("PIL") is not None
+        and importlib.util.find_spec("pytesseract") is not None
+        and shutil.which("tesseract") is not None
+    )
+
+class OCRService:
+    """Extract text from images in a worker pool, caching results by image content hash."""
+
+    def __init__(self, cache_folder: Path = OCR_CACHE_FOLDER, max_dimension: int = OCR_MAX_DIMENSION):
+        self.cache_folder = Path(cache_folder)
+        self.max_dimension = max_dimension
+        self.available = ocr_engine_available()
+        self.last_result: Dict[str, Any] = {}
+
+    def _cache_key(self, data: bytes) -> str:
+        # The text depends on the resolution OCR ran at, so entries are per OCR_MAX_DIMENSION
+        digest = hashlib.sha256(data)
+        digest.update(f"\0max_dimension={self.max_dimension}".encode("ascii"))
+        return digest.hexdigest()
+
+    def _cache_path(self, content_hash: str) -> Path:
+        return self.cache_folder / f"{content_hash}.json"
+
+    def _read_cache(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(content_hash)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning("Ignoring an unreadable OCR cache entry", extra={"path": str(path), "error": str(e)})
+            return None
+
+    def _write_cache(self, content_hash: str, entry: Dict[str, Any]) -> None:
+        self.cache_folder.mkdir(parents=True, exist_ok=True)
+        # Write a uniquely named file then rename, so a concurrent reader never sees a
+        # partial file and two writers of the same image never share a temporary file
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.cache_folder, prefix=f".{content_hash}-",
+                                         suffix=".tmp", delete=False) as f:
+            temp_path = f.name
+            try:
+                json.dump(entry, f, ensure_ascii=False)
+            except BaseException:
+                f.close()
+                os.unlink(temp_path)
+                raise
+        try:
+            os.replace(temp_path, self._cache_path(content_hash))
+        except OSError:
+            os.unlink(temp_path)
+            raise
+
+    def extract_text(self, file_path: Path) -> str:
+        """OCR an image file, returning "" when no OCR engine is installed."""
+        started = time.perf_counter()
+        data = Path(file_path).read_bytes()
+        content_hash = self._cache_key(data)
+
+        cached = self._read_cache(content_hash)
+        if cached is not None:
+            self.last_result = {
+                "hash": content_hash,
+                "cached": True,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            logger.debug("OCR cache hit", extra={"file": Path(file_path).name, **self.last_result})
+            return cached["text"]
+
+        if not self.available:
+            self.last_result = {"hash": content_hash, "cached": False, "error": "ocr_engine_not_installed"}
+            logger.warning("OCR engine not installed (needs Pillow, pytesseract and tesseract); skipping the image",
+                           extra={"file": Path(file_path).name})
+            return ""
+
+        text, original_size, ocr_size = _get_executor().submit(_ocr_image, data, self.max_dimension).result()
+        elapsed = time.perf_counter() - started
+
+        self._write_cache(content_hash, {
+            "text": text,
+            "original_size": list(original_size),
+            "ocr_size": list(ocr_size),
+            "seconds": round(elapsed, 3),
+        })
+        self.last_result = {
+            "hash": content_hash,
+            "cached": False,
+            "seconds": round(elapsed, 3),
+            "original_size": list(original_size),
+            "ocr_size": list(ocr_size),
+        }
+        logger.info("Image OCR done", extra={"file": Path(file_path).name, **self.last_result})
+        return text
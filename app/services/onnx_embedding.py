@@ -0,0 +1,119 @@
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an exported ONNX graph, run with onnxruntime on CPU.
+
+    The folder is produced by export_onnx_model.py and holds the ONNX graph,
+    the fast tokenizer and the sentence-transformers pooling configuration, so
+    vectors match what HuggingFaceEmbeddings returns for the same model.
+    """
+
+    def __init__(
+        self,
+        model_folder: Path,
+        quantized: bool = False,
+        num_threads: int = 0,
+        batch_size: int = 32,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_folder = Path(model_folder)
+        self.batch_size = max(1, batch_size)
+
+        model_path = self.model_folder / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}. Run export_onnx_model.py first."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.max_length = self._read_max_length()
+        self.tokenizer = Tokenizer.from_file(str(self.model_folder / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        # Pad each batch only up to its longest sequence
+        self.tokenizer.enable_padding()
+
+        self.pooling_mode = self._read_pooling_mode()
+        self.normalize = self._read_normalize()
+
+    def _read_json(self, relative_path: str) -> Optional[dict]:
+        path = self.model_folder / relative_path
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_max_length(self) -> int:
+        config = self._read_json("sentence_bert_config.json") or {}
+        return int(config.get("max_seq_length", 512))
+
+    def _read_pooling_mode(self) -> str:
+        config = self._read_json("1_Pooling/config.json") or {}
+        if config.get("pooling_mode_cls_token"):
+            return "cls"
+        return "mean"
+
+    def _read_normalize(self) -> bool:
+        modules = self._read_json("modules.json") or []
+        return any(module.get("type", "").endswith("Normalize") for module in modules)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        if self.pooling_mode == "cls":
+            pooled = token_embeddings[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.clip(norms, 1e-12, None)
+
+        return pooled
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in length-sorted batches so padding stays small."""
+        if not texts:
+            return []
+
+        # HuggingFaceEmbeddings does the same before encoding
+        texts = [text.replace("\n", " ") for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch_ids = order[start:start + self.batch_size]
+            batch_vectors = self._encode_batch([texts[i] for i in batch_ids])
+            for i, vector in zip(batch_ids, batch_vectors):
+                vectors[i] = vector.tolist()
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -1,11 +1,14 @@
-from typing import List, Dict, Any, Literal
+from typing import List, Dict, Any, Literal, Optional
 from pathlib import Path
+import asyncio
 import warnings
 
 from langchain_chroma import Chroma
 
 from app.config import CHROMA_INDEX_FOLDER, TOP_K_RESULTS
 from app.services.embedding import EmbeddingService
+from app.utils.metadata_filter import Where, all_of
+from app.utils.schools import school_where
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
@@ -71,12 +74,51 @@ class VectorStore:
 
         # Persistence is automatic; no manual persist needed
 
-    def search(self, query: str, top_k: int = TOP_K_RESULTS) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = TOP_K_RESULTS, school: Optional[str] = None,
+               where: Optional[Where] = None) -> List[Dict[str, Any]]:
+        """The top_k chunks for a query, among those passing `where` and the school filter.
+
+        Filters use app/utils/metadata_filter.py's syntax and compile to a Chroma `where`
+        clause, so Chroma applies them during the search instead of the results being
+        filtered afterwards. Raises ValueError for a malformed filter.
+        """
         if self.vector_store is None:
             return []
 
+        chroma_where = all_of(school_where(school), where)
         try:
-            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=top_k)
+            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=top_k, filter=chroma_where)
+            return [
+                {
+                    "text": doc.page_content,
+                    "metadata": doc.metadata,
+                    "score": float(score)
+                }
+                for doc, score in docs_with_scores
+            ]
+        except Exception as e:
+            print(f"Error searching vector store: {e}")
+            return []
+
+    async def asearch(self, query: str, top_k: int = TOP_K_RESULTS, school: Optional[str] = None,
+                      where: Optional[Where] = None) -> List[Dict[str, Any]]:
+        """Search using the micro-batched query embedding; suited to concurrent chat traffic.
+
+        Filters as in search().
+        """
+        if self.vector_store is None:
+            return []
+
+        chroma_where = all_of(school_where(school), where)
+        try:
+            embedding = await self.embedding_service.aembed_query(query)
+            loop = asyncio.get_running_loop()
+            docs_with_scores = await loop.run_in_executor(
+                None,
+                lambda: self.vector_store.similarity_search_by_vector_with_relevance_scores(
+                    embedding, k=top_k, filter=chroma_where
+                )
+            )
             return [
                 {
                     "text": doc.page_content,
@@ -5,20 +5,18 @@ from urllib.parse import urlparse
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 
 from langchain_community.document_loaders import WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.config import CHUNK_SIZE, CHUNK_OVERLAP
 from app.utils.helpers import generate_unique_id
+from app.utils.metadata_filter import url_domain
+from app.utils.schools import tag_school
+from app.utils.text_splitter import OffsetTextSplitter
 
 class WebScraper:
     """Scrape and process web content with Playwright for dynamic pages and LangChain fallback."""
 
     def __init__(self, use_playwright: bool = True):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-        )
+        self.text_splitter = OffsetTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
         self.use_playwright = use_playwright
 
         # Credentials from env, FB_EMAIL can be phone number or email
@@ -134,16 +132,20 @@ class WebScraper:
                 chunks_with_metadata = []
                 title = parsed_url.netloc  # fallback title
 
-                splits = self.text_splitter.split_text(content)
-                for chunk_text in splits:
+                for start, end in self.text_splitter.split_offsets(content):
+                    metadata = {
+                        "source_type": "web",
+                        "url": url,
+                        "domain": url_domain(url),
+                        "title": title,
+                        "start_index": start,
+                        "end_index": end
+                    }
+                    metadata["school"] = tag_school(content[start:end], metadata)
                     chunks_with_metadata.append({
                         "id": generate_unique_id(),
-                        "text": chunk_text,
-                        "metadata": {
-                            "source_type": "web",
-                            "url": url,
-                            "title": title
-                        }
+                        "text": content[start:end],
+                        "metadata": metadata
                     })
                 return chunks_with_metadata
             else:
@@ -161,20 +163,25 @@ class WebScraper:
         if documents and hasattr(documents[0], "metadata") and "title" in documents[0].metadata:
             title = documents[0].metadata["title"]
 
-        splits = self.text_splitter.split_documents(documents)
-
         chunks_with_metadata = []
-        for doc in splits:
-            metadata = doc.metadata.copy() if hasattr(doc, "metadata") else {}
-            metadata["source_type"] = "web"
-            metadata["url"] = url
-            if "title" not in metadata:
-                metadata["title"] = title
-
-            chunks_with_metadata.append({
-                "id": generate_unique_id(),
-                "text": doc.page_content,
-                "metadata": metadata
-            })
+        for doc in documents:
+            doc_metadata = doc.metadata if hasattr(doc, "metadata") else {}
+            text = doc.page_content
+            for start, end in self.text_splitter.split_offsets(text):
+                metadata = doc_metadata.copy()
+                metadata["source_type"] = "web"
+                metadata["url"] = url
+                metadata["domain"] = url_domain(url)
+                if "title" not in metadata:
+                    metadata["title"] = title
+                metadata["start_index"] = start
+                metadata["end_index"] = end
+                metadata["school"] = tag_school(text[start:end], metadata)
+
+                chunks_with_metadata.append({
+                    "id": generate_unique_id(),
+                    "text": text[start:end],
+                    "metadata": metadata
+                })
 
         return chunks_with_metadata
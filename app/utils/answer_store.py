@@ -0,0 +1,123 @@
+"""Precomputed answers to frequent questions, served only for the knowledge base version they were built from."""
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from app.utils.log import get_logger
+from app.utils.schools import school_filter
+
+logger = get_logger("answer_store")
+
+STORE_VERSION = 1
+
+# Words that do not change what is being asked; question words (where, when, how...) are kept
+STOP_WORDS = frozenset("""
+a an the and or of to in on at for with by from about is are was were be been am do does did
+can could would should will shall may might must i me my we our us you your it its this that these those
+there please tell know give let kindly hi hello hey star college durban school
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def question_tokens(question: str) -> FrozenSet[str]:
+    """Content words of a question, lowercased, punctuation and stop words dropped."""
+    return frozenset(word for word in _WORD.findall(question.lower()) if word not in STOP_WORDS)
+
+def question_key(question: str) -> str:
+    return " ".join(sorted(question_tokens(question)))
+
+def normalize_school(school: str) -> str:
+    """The school-select value a selection means (school_filter), or "all" for none.
+
+    "all", "All Star College Schools", nothing and a school's full name all key the same
+    answers as the prompt and retrieval treat them alike.
+    """
+    return school_filter(school) or "all"
+
+def knowledge_base_fingerprint(items: Iterable[Dict[str, Any]]) -> str:
+    """Hash of every chunk's ID (file and text), independent of load order."""
+    digest = hashlib.sha256()
+    for chunk_id in sorted(item.get("metadata", {}).get("chunk_id", "") for item in items):
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()[:16]
+
+@dataclass
+class StoredAnswer:
+    question: str
+    school: str
+    answer: str
+    sources: List[Dict[str, Any]]
+    metadata: Dict[str, Any]
+    tokens: FrozenSet[str] = frozenset()
+
+class AnswerStore:
+    """Stored answers keyed by (school, question key), with a word-overlap fallback."""
+
+    def __init__(self, entries: List[StoredAnswer], kb_fingerprint: str = "", version: str = "",
+                 min_similarity: float = 0.8):
+        self.kb_fingerprint = kb_fingerprint
+        self.version = version
+        self.min_similarity = min_similarity
+        self._exact: Dict[Tuple[str, str], StoredAnswer] = {}
+        # (school, word) -> entries containing the word, for the fuzzy fallback
+        self._by_word: Dict[Tuple[str, str], List[StoredAnswer]] = {}
+        for entry in entries:
+            entry.tokens = question_tokens(entry.question)
+            if not entry.tokens:
+                continue
+            self._exact.setdefault((entry.school, " ".join(sorted(entry.tokens))), entry)
+            for word in entry.tokens:
+                self._by_word.setdefault((entry.school, word), []).append(entry)
+        self.entries = len(self._exact)
+
+    @classmethod
+    def from_file(cls, path: str, min_similarity: float = 0.8) -> "AnswerStore":
+        """Load build_answer_store.py's output; an empty store if it is missing or unreadable."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except FileNotFoundError:
+            return cls([])
+        except (OSError, ValueError) as e:
+            logger.error("Could not load the answer store", extra={"path": path, "error": str(e)})
+            return cls([])
+        if table.get("format") != STORE_VERSION:
+            logger.warning("Ignoring an answer store with an unknown format", extra={"path": path, "format": table.get("format")})
+            return cls([])
+        entries = [
+            StoredAnswer(item["question"], normalize_school(item.get("school", "")), item["answer"],
+                         item.get("sources", []), item.get("metadata", {}))
+            for item in table.get("entries", [])
+        ]
+        return cls(entries, table.get("kb_fingerprint", ""), table.get("version", ""), min_similarity)
+
+    def active(self, kb_fingerprint: str) -> bool:
+        """Whether the store was built from the knowledge base that is loaded now."""
+        return self.entries > 0 and self.kb_fingerprint == kb_fingerprint
+
+    def match(self, question: str, school: str) -> Optional[Tuple[StoredAnswer, float]]:
+        """(stored answer, similarity) for the question, or None."""
+        tokens = question_tokens(question)
+        if not tokens:
+            return None
+        school = normalize_school(school)
+        entry = self._exact.get((school, " ".join(sorted(tokens))))
+        if entry is not None:
+            return entry, 1.0
+
+        best, best_similarity = None, 0.0
+        seen = set()
+        for word in tokens:
+            for candidate in self._by_word.get((school, word), ()):
+                if id(candidate) in seen:
+                    continue
+                seen.add(id(candidate))
+                similarity = len(tokens & candidate.tokens) / len(tokens | candidate.tokens)
+                if similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+        if best is not None and best_similarity >= self.min_similarity:
+            return best, best_similarity
+        return None
@@ -0,0 +1,185 @@
+"""Token-budgeted context assembly for LLM prompts: best chunks first, deduplicated, trimmed at a sentence."""
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.utils.log import get_logger
+
+logger = get_logger("context_budget")
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n\s*\n|\n(?=\s*[-•*\d])')
+_WORD = re.compile(r"\w+")
+
+class TokenCounter:
+    """Count tokens with the best local tokenizer available."""
+
+    def __init__(self, tokenizer_path: Optional[str] = None):
+        self._encode: Optional[Callable[[str], Sequence[int]]] = None
+        self.name = "estimate"
+
+        if tokenizer_path:
+            try:
+                from tokenizers import Tokenizer
+
+                tokenizer = Tokenizer.from_file(tokenizer_path)
+                self._encode = lambda text: tokenizer.encode(text, add_special_tokens=False).ids
+                self.name = f"tokenizers:{os.path.basename(tokenizer_path)}"
+                return
+            except Exception as e:
+                logger.warning("Could not load the tokenizer; falling back",
+                               extra={"tokenizer": tokenizer_path, "error": str(e)})
+
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding("cl100k_base")
+            self._encode = lambda text: encoding.encode(text, disallowed_special=())
+            self.name = "tiktoken:cl100k_base"
+        except Exception:
+            # Not installed, or the encoding could not be downloaded
+            pass
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encode is not None:
+            return len(self._encode(text))
+        return math.ceil(len(text) * 0.3)
+
+_default_counter: Optional[TokenCounter] = None
+_default_lock = threading.Lock()
+
+def get_token_counter() -> TokenCounter:
+    """Process-wide TokenCounter configured from CONTEXT_TOKENIZER_PATH."""
+    global _default_counter
+    with _default_lock:
+        if _default_counter is None:
+            _default_counter = TokenCounter(os.getenv("CONTEXT_TOKENIZER_PATH") or None)
+        return _default_counter
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def sentence_ends(text: str) -> List[int]:
+    """Offsets where sentences end: after . ! ?, at blank lines and before list items."""
+    ends = [match.start() for match in _SENTENCE_END.finditer(text) if match.start() > 0]
+    if not ends or ends[-1] < len(text):
+        ends.append(len(text))
+    return ends
+
+@dataclass
+class AssembledContext:
+    """Chunks chosen for a prompt, with their rendered sections and token accounting."""
+
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+    sections: List[str] = field(default_factory=list)
+    tokens: int = 0
+    # Tokens the candidates would have cost rendered in full, without a budget
+    candidate_tokens: int = 0
+    duplicates_dropped: int = 0
+    trimmed: int = 0
+    over_budget: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.candidate_tokens - self.tokens)
+
+class ContextAssembler:
+    """Fill a token budget greedily by relevance with de-duplicated, sentence-trimmed chunks.
+
+    `render(chunk, text, position)` turns a chunk into the prompt section that is counted
+    against the budget, so headers and source lines are paid for too.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int,
+        counter: Optional[TokenCounter] = None,
+        score_key: str = "relevance_score",
+        duplicate_threshold: float = 0.8,
+        min_trim_tokens: int = 40,
+        render: Optional[Callable[[Dict[str, Any], str, int], str]] = None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.counter = counter or get_token_counter()
+        self.score_key = score_key
+        self.duplicate_threshold = duplicate_threshold
+        self.min_trim_tokens = min_trim_tokens
+        self.render = render or (lambda chunk, text, position: text)
+
+    def _is_duplicate(self, shingles: Set[Tuple[str, ...]], chosen: List[Set[Tuple[str, ...]]]) -> bool:
+        # Containment rather than Jaccard, so a chunk inside a longer chosen chunk counts
+        if not shingles:
+            return True
+        return any(len(shingles & other) / len(shingles) >= self.duplicate_threshold for other in chosen)
+
+    def _trim_to_fit(self, chunk: Dict[str, Any], text: str, position: int, remaining: int) -> Optional[Tuple[str, int]]:
+        """Longest run of leading sentences whose rendered section fits in `remaining` tokens."""
+        ends = sentence_ends(text)
+        best = None
+        low, high = 1, len(ends) - 1
+        while low <= high:
+            middle = (low + high) // 2
+            trimmed = text[:ends[middle - 1]].rstrip()
+            tokens = self.counter.count(self.render(chunk, trimmed, position))
+            if tokens <= remaining:
+                best = (trimmed, tokens)
+                low = middle + 1
+            else:
+                high = middle - 1
+        return best
+
+    def assemble(self, chunks: List[Dict[str, Any]]) -> AssembledContext:
+        result = AssembledContext()
+        ranked = sorted(chunks, key=lambda chunk: chunk.get(self.score_key, 0.0), reverse=True)
+        chosen_shingles: List[Set[Tuple[str, ...]]] = []
+
+        for chunk in ranked:
+            text = chunk.get("text", "").strip()
+            position = len(result.chunks) + 1
+            section = self.render(chunk, text, position)
+            tokens = self.counter.count(section)
+            result.candidate_tokens += tokens
+
+            shingles = _shingles(text)
+            if self._is_duplicate(shingles, chosen_shingles):
+                result.duplicates_dropped += 1
+                continue
+
+            remaining = self.budget_tokens - result.tokens
+            if tokens > remaining:
+                trimmed = self._trim_to_fit(chunk, text, position, remaining) if remaining >= self.min_trim_tokens else None
+                if trimmed is None:
+                    # A shorter, lower-ranked chunk may still fit
+                    result.over_budget += 1
+                    continue
+                text, tokens = trimmed
+                section = self.render(chunk, text, position)
+                result.trimmed += 1
+
+            result.chunks.append(dict(chunk, text=text))
+            result.sections.append(section)
+            result.tokens += tokens
+            chosen_shingles.append(shingles)
+
+        return result
+
+def fit_history(turns: List[Dict[str, str]], budget_tokens: int, counter: Optional[TokenCounter] = None) -> List[Dict[str, str]]:
+    """Most recent conversation turns whose contents fit in budget_tokens, oldest first."""
+    counter = counter or get_token_counter()
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for turn in reversed(turns):
+        tokens = counter.count(turn.get("content", "")) + 4  # role and message framing
+        if used + tokens > budget_tokens:
+            break
+        kept.append(turn)
+        used += tokens
+    kept.reverse()
+    return kept
@@ -0,0 +1,303 @@
+"""Read-only corpus pack: the processed chunks and a token index in one memory-mapped file shared by workers."""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.utils.answer_store import knowledge_base_fingerprint
+from app.utils.knowledge_base import FileSignature, file_signature
+from app.utils.log import get_logger
+from app.utils.metadata_filter import BitmapIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers may build the pack concurrently, which is only wasteful
+    fcntl = None
+
+logger = get_logger("corpus_pack")
+
+# Layout: magic, header length, JSON header ({"sections": {name: [offset, length]}, ...}),
+# then the sections, 8-byte aligned. Offset tables are native-endian uint64 with one
+# entry more than there are records; postings are uint32 chunk IDs.
+MAGIC = b"SBPACK01"
+PACK_FORMAT = 3
+
+def _offsets(blobs: Iterable[bytes]) -> array:
+    offsets = array("Q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return offsets
+
+def write_pack(path: str, items: Sequence[Dict[str, Any]], sources: FileSignature = (),
+               index_keys: Sequence[str] = ()) -> None:
+    """Write `items` ({"text", "metadata"}) as a pack at `path`, atomically.
+
+    Each of `index_keys` gets the IDs of the chunks with each of its (scalar) values.
+    """
+    texts = [item.get("text", "").encode("utf-8") for item in items]
+    lowered = [item.get("text", "").lower() for item in items]
+    lowered_bytes = [text.encode("utf-8") for text in lowered]
+    metadata = [json.dumps(item.get("metadata", {}), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                for item in items]
+
+    postings_by_token: Dict[str, List[int]] = {}
+    for chunk, text in enumerate(lowered):
+        for token in set(text.split()):
+            postings_by_token.setdefault(token, []).append(chunk)
+    vocabulary = sorted(postings_by_token)
+    # Joined by newlines (never part of a token), so a substring search over the whole
+    # vocabulary finds every token containing a term in one pass
+    vocabulary_bytes = [token.encode("utf-8") + b"\n" for token in vocabulary]
+    postings = array("I")
+    posting_offsets = array("Q", [0])
+    for token in vocabulary:
+        postings.extend(postings_by_token[token])
+        posting_offsets.append(len(postings))
+
+    index_ids = array("I")
+    # key -> [[value, start, end], ...]: JSON object keys would turn page numbers into strings
+    indexes: Dict[str, List[list]] = {}
+    by_key = _value_postings(((chunk, item.get("metadata", {})) for chunk, item in enumerate(items)), index_keys)
+    for key in index_keys:
+        indexes[key] = []
+        for (_, value), chunks in by_key.get(key, {}).items():
+            indexes[key].append([value, len(index_ids), len(index_ids) + len(chunks)])
+            index_ids.extend(chunks)
+
+    sections = [
+        ("text", b"".join(texts)),
+        ("text_offsets", _offsets(texts).tobytes()),
+        ("lowered", b"".join(lowered_bytes)),
+        ("lowered_offsets", _offsets(lowered_bytes).tobytes()),
+        ("metadata", b"".join(metadata)),
+        ("metadata_offsets", _offsets(metadata).tobytes()),
+        ("vocabulary", b"".join(vocabulary_bytes)),
+        ("vocabulary_offsets", _offsets(vocabulary_bytes).tobytes()),
+        ("postings", postings.tobytes()),
+        ("posting_offsets", posting_offsets.tobytes()),
+        ("index_ids", index_ids.tobytes()),
+    ]
+    header = {
+        "format": PACK_FORMAT,
+        "byteorder": sys.byteorder,
+        "version": knowledge_base_fingerprint(items),
+        "chunks": len(items),
+        "tokens": len(vocabulary),
+        "sources": [list(entry) for entry in sources],
+        "indexes": indexes,
+    }
+    # Section offsets depend on the header length, which depends on the offsets; a
+    # fixed-width placeholder pass settles it
+    header["sections"] = {name: [0, len(data)] for name, data in sections}
+    header_length = len(json.dumps(header).encode("utf-8")) + 20 * len(sections)
+    position = _align(len(MAGIC) + 8 + header_length)
+    for name, data in sections:
+        header["sections"][name] = [position, len(data)]
+        position = _align(position + len(data))
+    header_bytes = json.dumps(header).encode("utf-8").ljust(header_length)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", header_length) + header_bytes)
+        for name, data in sections:
+            f.write(b"\0" * (header["sections"][name][0] - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+def _lookup(value: Any) -> Any:
+    # Typed, so 1 and True stay distinct values
+    return (type(value), value)
+
+def _value_postings(metadata: Iterable[Tuple[int, Dict[str, Any]]], keys: Optional[Sequence[str]] = None
+                    ) -> Dict[str, Dict[Any, array]]:
+    """key -> typed value -> chunk IDs, for the scalar values of `keys` (all keys if None)."""
+    postings: Dict[str, Dict[Any, array]] = {}
+    for chunk, chunk_metadata in metadata:
+        for key in chunk_metadata if keys is None else keys:
+            value = chunk_metadata.get(key)
+            if isinstance(value, (str, int, float, bool)):
+                postings.setdefault(key, {}).setdefault(_lookup(value), array("I")).append(chunk)
+    return postings
+
+class CorpusPack(BitmapIndex):
+    """A mapped pack; a read-only sequence of {"text", "metadata"} chunks.
+
+    Indexing materializes a fresh dict, so callers score with lowered()/candidates()
+    and only build dicts for the chunks they return.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._map[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a corpus pack")
+            (header_length,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+            start = len(MAGIC) + 8
+            header = json.loads(self._map[start:start + header_length])
+            if header.get("format") != PACK_FORMAT or header.get("byteorder") != sys.byteorder:
+                raise ValueError(f"{path} has an unsupported format")
+        except BaseException:
+            self._map.close()
+            raise
+        self.version: str = header["version"]
+        self.chunks: int = header["chunks"]
+        self.tokens: int = header["tokens"]
+        self.sources: FileSignature = tuple(tuple(entry) for entry in header["sources"])
+        self._sections = header["sections"]
+        self._indexes: Dict[str, Dict[Any, Tuple[Any, int, int]]] = {
+            key: {_lookup(value): (value, start, end) for value, start, end in entries}
+            for key, entries in header["indexes"].items()
+        }
+        # Keys filtered on that were not indexed when the pack was written
+        self._scanned: Dict[str, Dict[Any, array]] = {}
+
+        self._text_offsets = self._table("text_offsets", "Q")
+        self._lowered_offsets = self._table("lowered_offsets", "Q")
+        self._metadata_offsets = self._table("metadata_offsets", "Q")
+        self._vocabulary_offsets = self._table("vocabulary_offsets", "Q")
+        self._postings = self._table("postings", "I")
+        self._posting_offsets = self._table("posting_offsets", "Q")
+        self._index_ids = self._table("index_ids", "I")
+        self._text = self._sections["text"][0]
+        self._lowered = self._sections["lowered"][0]
+        self._metadata = self._sections["metadata"][0]
+        vocabulary_start, vocabulary_length = self._sections["vocabulary"]
+        self._vocabulary_range = (vocabulary_start, vocabulary_start + vocabulary_length)
+
+    def _table(self, name: str, typecode: str) -> memoryview:
+        # Views straight into the mapping: nothing is copied into the process
+        offset, length = self._sections[name]
+        return memoryview(self._map)[offset:offset + length].cast(typecode)
+
+    def close(self) -> None:
+        """Unmap the file; the pack must not be used afterwards."""
+        # The mapping can only be closed once no view into it is left
+        for view in (self._text_offsets, self._lowered_offsets, self._metadata_offsets, self._vocabulary_offsets,
+                     self._postings, self._posting_offsets, self._index_ids):
+            view.release()
+        self._map.close()
+
+    def __len__(self) -> int:
+        return self.chunks
+
+    def __getitem__(self, chunk: int) -> Dict[str, Any]:
+        if not 0 <= chunk < self.chunks:
+            raise IndexError(chunk)
+        return {"text": self.text(chunk), "metadata": self.metadata(chunk)}
+
+    def __iter__(self):
+        return (self[chunk] for chunk in range(self.chunks))
+
+    def text(self, chunk: int) -> str:
+        return self._map[self._text + self._text_offsets[chunk]:self._text + self._text_offsets[chunk + 1]].decode("utf-8")
+
+    def lowered(self, chunk: int) -> str:
+        return self._map[self._lowered + self._lowered_offsets[chunk]:
+                         self._lowered + self._lowered_offsets[chunk + 1]].decode("utf-8")
+
+    def metadata(self, chunk: int) -> Dict[str, Any]:
+        return json.loads(self._map[self._metadata + self._metadata_offsets[chunk]:
+                                    self._metadata + self._metadata_offsets[chunk + 1]])
+
+    def candidates(self, terms: Iterable[str]) -> List[int]:
+        """IDs of the chunks whose lowercased text may contain any of the terms, in order.
+
+        Exact for terms without whitespace: such a term occurs in a text exactly when it
+        occurs in one of the text's whitespace tokens. A phrase ("pass rate") can only
+        occur where every one of its words does, so it gets the chunks having them all.
+        """
+        chunks = set()
+        for term in terms:
+            words = term.split()
+            if not words:
+                continue
+            matched = self._containing(words[0])
+            for word in words[1:]:
+                if not matched:
+                    break
+                matched &= self._containing(word)
+            chunks |= matched
+        return sorted(chunks)
+
+    def _containing(self, word: str) -> Set[int]:
+        """IDs of the chunks with a token containing `word` (no whitespace)."""
+        chunks = set()
+        start, end = self._vocabulary_range
+        needle = word.encode("utf-8")
+        position = self._map.find(needle, start, end)
+        while position != -1:
+            token = bisect_right(self._vocabulary_offsets, position - start) - 1
+            chunks.update(self._postings[self._posting_offsets[token]:self._posting_offsets[token + 1]])
+            position = self._map.find(needle, start + self._vocabulary_offsets[token + 1], end)
+        return chunks
+
+    def _scan(self, key: str) -> Dict[Any, array]:
+        postings = self._scanned.get(key)
+        if postings is None:
+            logger.info("Indexing metadata key not in the pack", extra={"key": key, "chunks": self.chunks})
+            scanned = _value_postings(((chunk, self.metadata(chunk)) for chunk in range(self.chunks)), [key])
+            postings = self._scanned[key] = scanned.get(key, {})
+        return postings
+
+    def values(self, key: str) -> List[Any]:
+        if key in self._indexes:
+            return [value for value, _, _ in self._indexes[key].values()]
+        return [value for _, value in self._scan(key)]
+
+    def postings(self, key: str, value: Any) -> Sequence[int]:
+        try:
+            lookup = _lookup(value)
+            if key in self._indexes:
+                entry = self._indexes[key].get(lookup)
+                return self._index_ids[entry[1]:entry[2]] if entry else ()
+            return self._scan(key).get(lookup, ())
+        except TypeError:
+            return ()
+
+def ensure_pack(path: str, source_paths: Sequence[str], load: Callable[[], List[Dict[str, Any]]],
+                index_keys: Sequence[str] = ()) -> CorpusPack:
+    """The pack at `path`, rebuilt from load() first if the source files changed since it was built
+    or it does not index `index_keys`."""
+    sources = file_signature(source_paths)
+    pack = _open_current(path, sources, index_keys)
+    if pack is not None:
+        return pack
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            # Another worker may have built it while this one waited for the lock
+            pack = _open_current(path, sources, index_keys)
+            if pack is not None:
+                return pack
+            items = load()
+            write_pack(path, items, sources, index_keys)
+            logger.info("Corpus pack built", extra={"path": path, "chunks": len(items), "bytes": os.path.getsize(path)})
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+    return CorpusPack(path)
+
+def _open_current(path: str, sources: FileSignature, index_keys: Sequence[str]):
+    try:
+        pack = CorpusPack(path)
+    except (OSError, ValueError):
+        return None
+    if pack.sources == sources and all(key in pack._indexes for key in index_keys):
+        return pack
+    # Stale: unmap it now rather than when it is collected, before the file is replaced
+    pack.close()
+    return None
@@ -0,0 +1,155 @@
+"""Compact in-memory corpus: chunk texts in one buffer and metadata as columns of value IDs."""
+import json
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List
+
+from app.utils.metadata_filter import BitmapIndex
+
+class _Encoded(str):
+    """An unhashable metadata value (list, dict) kept as its JSON text."""
+
+def _lookup(value: Any) -> Any:
+    # Typed, so 1, 1.0 and True stay distinct values
+    return (type(value), value)
+
+class ChunkView:
+    """One chunk of a CorpusStore, read on demand."""
+
+    __slots__ = ("store", "id")
+
+    def __init__(self, store: "CorpusStore", chunk: int):
+        self.store = store
+        self.id = chunk
+
+    @property
+    def text(self) -> str:
+        return self.store.text(self.id)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.store.metadata(self.id)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "text":
+            return self.text
+        if key == "metadata":
+            return self.metadata
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in ("text", "metadata"):
+            raise KeyError(key)
+        return self.get(key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"text": self.text, "metadata": self.metadata}
+
+    def __repr__(self) -> str:
+        return f"ChunkView({self.id})"
+
+class CorpusStore(BitmapIndex):
+    """The chunks of one knowledge base version; immutable once built."""
+
+    def __init__(self, items: Iterable[Dict[str, Any]]):
+        texts = []
+        offsets = array("Q", [0])
+        # Value ID 0 means "no such key" for the chunk
+        self._values: List[Any] = [None]
+        self._value_ids: Dict[Any, int] = {}
+        self._columns: Dict[str, array] = {}
+        # key -> value ID -> IDs of the chunks with that value, built on first use
+        self._postings: Dict[str, Dict[int, array]] = {}
+        self.chars = 0
+
+        for chunk, item in enumerate(items):
+            text = item.get("text", "")
+            self.chars += len(text)
+            encoded = text.encode("utf-8")
+            texts.append(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            for key, value in (item.get("metadata") or {}).items():
+                column = self._columns.get(key)
+                if column is None:
+                    column = self._columns[key] = array("I", bytes(4 * chunk))
+                try:
+                    lookup = _lookup(value)
+                    value_id = self._value_ids.get(lookup)
+                except TypeError:
+                    value = _Encoded(json.dumps(value, ensure_ascii=False, sort_keys=True))
+                    lookup = _lookup(value)
+                    value_id = self._value_ids.get(lookup)
+                if value_id is None:
+                    value_id = self._value_ids[lookup] = len(self._values)
+                    self._values.append(value)
+                column.append(value_id)
+            for column in self._columns.values():
+                if len(column) == chunk:
+                    column.append(0)
+
+        self._text = b"".join(texts)
+        self._offsets = offsets
+        self.chunks = len(offsets) - 1
+
+    def __len__(self) -> int:
+        return self.chunks
+
+    def __getitem__(self, chunk):
+        if isinstance(chunk, slice):
+            return [ChunkView(self, i) for i in range(*chunk.indices(self.chunks))]
+        if chunk < 0:
+            chunk += self.chunks
+        if not 0 <= chunk < self.chunks:
+            raise IndexError(chunk)
+        return ChunkView(self, chunk)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        return (ChunkView(self, chunk) for chunk in range(self.chunks))
+
+    def text(self, chunk: int) -> str:
+        return self._text[self._offsets[chunk]:self._offsets[chunk + 1]].decode("utf-8")
+
+    def _value(self, value_id: int) -> Any:
+        value = self._values[value_id]
+        return json.loads(value) if type(value) is _Encoded else value
+
+    def metadata(self, chunk: int) -> Dict[str, Any]:
+        """A new dict of the chunk's metadata."""
+        return {key: self._value(column[chunk]) for key, column in self._columns.items() if column[chunk]}
+
+    def metadata_value(self, chunk: int, key: str, default: Any = None) -> Any:
+        """One metadata value, without building the dict."""
+        column = self._columns.get(key)
+        if column is None or not column[chunk]:
+            return default
+        return self._value(column[chunk])
+
+    def count_by(self, key: str, default: Any = None) -> Counter:
+        """Chunks per value of a metadata key, straight from the column."""
+        column = self._columns.get(key)
+        if column is None:
+            return Counter({default: self.chunks}) if self.chunks else Counter()
+        counts = Counter()
+        for value_id, count in Counter(column).items():
+            counts[self._value(value_id) if value_id else default] += count
+        return counts
+
+    def _key_postings(self, key: str) -> Dict[int, array]:
+        index = self._postings.get(key)
+        if index is None:
+            index = {}
+            for chunk, value_id in enumerate(self._columns.get(key, ())):
+                if value_id:
+                    index.setdefault(value_id, array("I")).append(chunk)
+            self._postings[key] = index
+        return index
+
+    def values(self, key: str) -> List[Any]:
+        return [self._value(value_id) for value_id in self._key_postings(key)]
+
+    def postings(self, key: str, value: Any) -> array:
+        try:
+            value_id = self._value_ids.get(_lookup(value))
+        except TypeError:
+            return array("I")
+        return self._key_postings(key).get(value_id, array("I"))
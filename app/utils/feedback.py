@@ -0,0 +1,301 @@
+"""Append-only feedback log, queued in memory and written in batches to JSONL or SQLite off the request path."""
+import abc
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from app.utils.log import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: run feedback_tool.py compact only while the app is stopped
+    fcntl = None
+
+logger = get_logger("feedback")
+
+FEEDBACK_VALUES = ("helpful", "not-helpful")
+FSYNC_POLICIES = ("batch", "interval", "off")
+
+def source_key(source: Dict[str, Any]) -> Optional[str]:
+    """Stable name for a cited source: its URL, file name or title, in that order.
+
+    source_file is only a last resort: in api/index.py it names the processed JSON file
+    (uploads_data.json...), which holds every document of its kind.
+    """
+    metadata = source.get("metadata") or {}
+    for name in ("url", "filename", "title", "source_file"):
+        value = metadata.get(name)
+        if value:
+            return str(value)
+    return None
+
+def feedback_record(question: str, answer: str, feedback: str, sources: Iterable[Dict[str, Any]],
+                    session_id: Optional[str] = None) -> Dict[str, Any]:
+    """One log entry; sources keep only their metadata, not the quoted content."""
+    return {
+        "timestamp": time.time(),
+        "feedback": feedback,
+        "question": question,
+        "answer": answer,
+        "session_id": session_id,
+        "sources": [{"metadata": source.get("metadata") or {}} for source in sources if isinstance(source, dict)],
+    }
+
+class FeedbackSink(abc.ABC):
+    """Durable storage for feedback records."""
+
+    @abc.abstractmethod
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """Store a batch of records."""
+
+    @abc.abstractmethod
+    def read(self) -> Iterator[Dict[str, Any]]:
+        """Every stored record, oldest first."""
+
+    def close(self) -> None:
+        pass
+
+@contextmanager
+def jsonl_lock(path: str):
+    """Exclusive lock on a JSONL log, held by appends and by feedback_tool.py's rewrite.
+
+    A separate .lock file, so the lock survives the log being replaced.
+    """
+    with open(f"{path}.lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+class JsonlFeedbackSink(FeedbackSink):
+    """One JSON object per line, appended; a batch is a single write."""
+
+    def __init__(self, path: str, fsync: str = "interval", fsync_interval: float = 1.0):
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._last_fsync = 0.0
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with jsonl_lock(self.path):
+            if self._file is not None and self._replaced():
+                # Rewritten by feedback_tool.py compact; append to the new file
+                self._file.close()
+                self._file = None
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+                                     for record in records))
+            self._file.flush()
+        now = time.monotonic()
+        if self.fsync == "batch" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _replaced(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        continue
+        except FileNotFoundError:
+            return
+
+    def close(self) -> None:
+        if self._file is not None:
+            if self.fsync != "off":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+class SqliteFeedbackSink(FeedbackSink):
+    """Feedback rows in a SQLite table; a batch is one transaction."""
+
+    # fsync policy -> PRAGMA synchronous (in WAL mode NORMAL syncs at checkpoints)
+    SYNCHRONOUS = {"batch": "FULL", "interval": "NORMAL", "off": "OFF"}
+
+    def __init__(self, path: str, fsync: str = "interval"):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(f"PRAGMA synchronous={self.SYNCHRONOUS[fsync]}")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS feedback ("
+            " id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, feedback TEXT NOT NULL,"
+            " question TEXT NOT NULL, answer TEXT NOT NULL, session_id TEXT, sources TEXT NOT NULL)"
+        )
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        rows = [
+            (record["timestamp"], record["feedback"], record["question"], record["answer"], record.get("session_id"),
+             json.dumps(record.get("sources", []), ensure_ascii=False, separators=(",", ":")))
+            for record in records
+        ]
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany(
+                    "INSERT INTO feedback (timestamp, feedback, question, answer, session_id, sources) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT timestamp, feedback, question, answer, session_id, sources FROM feedback ORDER BY id"
+            ).fetchall()
+        for timestamp, feedback, question, answer, session_id, sources in rows:
+            yield {"timestamp": timestamp, "feedback": feedback, "question": question, "answer": answer,
+                   "session_id": session_id, "sources": json.loads(sources)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+def create_feedback_sink(kind: str = "jsonl", path: str = "feedback.jsonl", fsync: str = "interval") -> FeedbackSink:
+    """Build the sink named by FEEDBACK_STORE: "jsonl" (default) or "sqlite"."""
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy {fsync!r}; expected one of {', '.join(FSYNC_POLICIES)}")
+    if kind == "sqlite":
+        return SqliteFeedbackSink(path, fsync)
+    if kind != "jsonl":
+        raise ValueError(f"Unknown feedback store {kind!r}; expected 'jsonl' or 'sqlite'")
+    return JsonlFeedbackSink(path, fsync)
+
+def chunk_key(source: Dict[str, Any]) -> Optional[str]:
+    """The cited chunk's ID (metadata chunk_id), when the answer reported one."""
+    value = (source.get("metadata") or {}).get("chunk_id")
+    return str(value) if value else None
+
+def count_by_source(records: Iterable[Dict[str, Any]], key=source_key) -> Dict[str, List[int]]:
+    """source key (or another key of a cited source) -> [helpful, not helpful] over the given records."""
+    counts: Dict[str, List[int]] = {}
+    for record in records:
+        _count(counts, record, key)
+    return counts
+
+def _count(counts: Dict[str, List[int]], record: Dict[str, Any], key=source_key) -> None:
+    if record.get("feedback") not in FEEDBACK_VALUES:
+        return
+    column = FEEDBACK_VALUES.index(record["feedback"])
+    # A source cited twice in one answer is counted once
+    for name in {key(source) for source in record.get("sources", [])} - {None}:
+        counts.setdefault(name, [0, 0])[column] += 1
+
+class FeedbackLog:
+    """Queue feedback in memory and write it to a FeedbackSink in batches from a background task."""
+
+    def __init__(self, sink: FeedbackSink, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_pending: int = 10000):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.received = {value: 0 for value in FEEDBACK_VALUES}
+        self.written = 0
+        self.dropped = 0
+        self.write_failures = 0
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue a record for writing; False if the queue is full and it was dropped."""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append(record)
+        if record.get("feedback") in self.received:
+            self.received[record["feedback"]] += 1
+        self._ensure_task()
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _ensure_task(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. a script); call flush() or close() to write
+            return
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything queued so far."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    await asyncio.to_thread(self.sink.write, batch)
+                except Exception as e:
+                    self.write_failures += 1
+                    logger.error("Feedback write failed; records kept for the next flush",
+                                 extra={"records": len(batch), "error": str(e)})
+                    # Back to the front, in order, still bounded by max_pending
+                    self._pending.extendleft(reversed(batch))
+                    while len(self._pending) > self.max_pending:
+                        self._pending.pop()
+                        self.dropped += 1
+                    return
+                self.written += len(batch)
+
+    async def close(self) -> None:
+        """Stop the background task, write what is queued and close the sink."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await asyncio.to_thread(self.sink.close)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_failures": self.write_failures,
+        }
@@ -0,0 +1,61 @@
+"""Retrieval boosts per chunk and per source, learned from user feedback by build_feedback_priors.py."""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from app.utils.feedback import source_key
+from app.utils.log import get_logger
+
+logger = get_logger("feedback")
+
+# 2: source keys prefer url/filename/title over source_file; older tables are ignored
+PRIORS_VERSION = 2
+
+def chunk_id(source_file: str, text: str) -> str:
+    """Stable ID for a chunk: its file and text, hashed; unchanged across restarts and reorderings."""
+    return hashlib.sha1(f"{source_file}\0{text}".encode("utf-8")).hexdigest()[:12]
+
+def prior_boost(helpful: int, not_helpful: int, prior_votes: float = 4.0, strength: float = 0.2) -> float:
+    """Boost in [1 - strength, 1 + strength] from the smoothed helpful share.
+
+    prior_votes neutral votes (half each way) are added first, so a few ratings move
+    the boost only a little.
+    """
+    share = (helpful + prior_votes / 2) / (helpful + not_helpful + prior_votes)
+    return 1.0 + strength * (2 * share - 1)
+
+@dataclass
+class FeedbackPriors:
+    """chunk_id -> boost and source key -> boost; anything missing is 1.0."""
+
+    chunks: Dict[str, float] = field(default_factory=dict)
+    sources: Dict[str, float] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.chunks or self.sources)
+
+    def boost(self, metadata: Dict[str, Any]) -> float:
+        return self.chunks.get(metadata.get("chunk_id"), 1.0) * self.sources.get(source_key({"metadata": metadata}), 1.0)
+
+    def chunk_boosts(self, items: List[Dict[str, Any]]) -> List[float]:
+        """One combined boost per knowledge base item, in order."""
+        return [self.boost(item.get("metadata", {})) for item in items]
+
+def load_feedback_priors(path: str) -> FeedbackPriors:
+    """Priors from build_feedback_priors.py's output; empty (no effect) if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except FileNotFoundError:
+        return FeedbackPriors()
+    except (OSError, ValueError) as e:
+        logger.error("Could not load feedback priors", extra={"path": path, "error": str(e)})
+        return FeedbackPriors()
+    if table.get("version") != PRIORS_VERSION:
+        logger.warning("Ignoring feedback priors with an unknown version", extra={"path": path, "version": table.get("version")})
+        return FeedbackPriors()
+    return FeedbackPriors(
+        {key: float(value) for key, value in table.get("chunks", {}).items()},
+        {key: float(value) for key, value in table.get("sources", {}).items()},
+    )
@@ -0,0 +1,146 @@
+"""Bounded conversation history: recent turns verbatim, older ones folded into a summary in the background."""
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.utils.log import get_logger
+from app.utils.sessions import MemorySessionStore, SessionState, SessionStore
+
+logger = get_logger("history")
+
+Turn = Dict[str, str]
+# (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+def normalize_role(role: str) -> str:
+    """Map the frontend's "bot" role to the chat API's "assistant"."""
+    return "assistant" if role in ("bot", "assistant") else "user"
+
+class HistoryManager:
+    """Per-session turn buffers with a rolling summary, keyed by session ID."""
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        store: Optional[SessionStore] = None,
+        keep_recent: int = 6,
+        summarize_batch: int = 4,
+        max_recent_turns: int = 12,
+        max_summary_chars: int = 1500,
+    ):
+        self.summarize = summarize
+        self.store = store or MemorySessionStore()
+        self.keep_recent = keep_recent
+        self.summarize_batch = summarize_batch
+        self.max_recent_turns = max(max_recent_turns, keep_recent + summarize_batch)
+        self.max_summary_chars = max_summary_chars
+        self._lock = threading.Lock()
+        self._summarizing: Set[str] = set()
+        self._tasks = set()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def context(self, session_id: str) -> Tuple[str, List[Turn]]:
+        """Return (summary, recent turns) to put in the prompt for this session."""
+        state = self.store.get(session_id)
+        if state is None:
+            return "", []
+        # Bounded even if summarization is slow or failing
+        turns = state.turns[-self.max_recent_turns:]
+        return state.summary, [{"role": role, "content": content} for role, content in turns]
+
+    def record(self, session_id: str, role: str, content: str) -> None:
+        """Append a turn, scheduling summarization of older turns if enough have piled up."""
+        with self._lock:
+            state = self.store.get(session_id) or SessionState()
+            state.turns.append((normalize_role(role), content))
+            # Never hold more than the summarizer could catch up on
+            overflow = len(state.turns) - self.max_recent_turns - self.summarize_batch
+            if overflow > 0:
+                del state.turns[:overflow]
+                state.first_turn += overflow
+            self.store.put(session_id, state)
+
+            due = (
+                session_id not in self._summarizing
+                and len(state.turns) - self.keep_recent >= self.summarize_batch
+            )
+            if due:
+                self._summarizing.add(session_id)
+                batch_size = len(state.turns) - self.keep_recent
+                batch = [{"role": role, "content": content} for role, content in state.turns[:batch_size]]
+                # Turns numbered below this are covered by the new summary
+                folded_until = state.first_turn + batch_size
+                previous_summary = state.summary
+
+        if due:
+            self._schedule(session_id, previous_summary, batch, folded_until)
+
+    def _schedule(self, session_id: str, previous_summary: str, batch: List[Turn], folded_until: int) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. a script); summarize on the next async record
+            with self._lock:
+                self._summarizing.discard(session_id)
+            return
+        task = loop.create_task(self._fold(session_id, previous_summary, batch, folded_until))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, session_id: str, previous_summary: str, batch: List[Turn], folded_until: int) -> None:
+        try:
+            summary = (await self.summarize(previous_summary, batch)).strip()[:self.max_summary_chars]
+        except Exception as e:
+            summary = None
+            self.summary_failures += 1
+            logger.warning("History summarization failed", extra={"session_id": session_id, "error": str(e)})
+
+        with self._lock:
+            self._summarizing.discard(session_id)
+            if not summary:
+                return
+            state = self.store.get(session_id)
+            if state is None:
+                # Expired or evicted while summarizing
+                return
+            # Drop the folded turns, minding any trimmed from the front meanwhile
+            folded = max(0, folded_until - state.first_turn)
+            del state.turns[:folded]
+            state.first_turn += folded
+            state.summary = summary
+            self.store.put(session_id, state)
+            self.summaries += 1
+
+    async def drain(self) -> None:
+        """Wait for in-flight summarizations (used on shutdown and in benchmarks)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.store.stats(),
+            "summarizing": len(self._tasks),
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+        }
+
+def format_turns(turns: List[Turn]) -> str:
+    """Render turns as "User: ..." / "Assistant: ..." lines for a summarization prompt."""
+    return "\n".join(f"{'Assistant' if turn['role'] == 'assistant' else 'User'}: {turn['content']}" for turn in turns)
+
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of a conversation between a user and the Star College assistant. "
+    "Keep names, years, numbers and the user's stated interests (school, grade, topic) that later "
+    "questions may refer back to. Write at most 5 short sentences and return only the summary."
+)
+
+def summary_messages(previous_summary: str, turns: List[Turn]) -> List[Dict[str, str]]:
+    """Chat messages asking an LLM to fold turns into the previous summary."""
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": (
+            f"Current summary:\n{previous_summary or '(none)'}\n\n"
+            f"New turns:\n{format_turns(turns)}\n\nUpdated summary:"
+        )},
+    ]
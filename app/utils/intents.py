@@ -0,0 +1,101 @@
+"""Canned answers (greetings, quick answers) matched with one compiled regex before retrieval."""
+import json
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    triggers: Tuple[str, ...]
+    answer: str
+    source: Dict[str, Any]
+    response_type: str
+    max_words: Optional[int] = None
+
+class IntentRouter:
+    """Match questions to canned intents and serve their pre-serialized responses."""
+
+    def __init__(self, intents: List[Intent], system_type: str = "", max_payloads: int = 64):
+        self.intents = intents
+        self.system_type = system_type
+        self.max_payloads = max_payloads
+        # Intent positions (priorities) matched by each trigger, including via its prefixes
+        owners: Dict[str, set] = {}
+        for position, intent in enumerate(intents):
+            for trigger in intent.triggers:
+                owners.setdefault(trigger, set()).add(position)
+        self._implied: Dict[str, frozenset] = {
+            trigger: frozenset().union(*(positions for other, positions in owners.items() if trigger.startswith(other)))
+            for trigger in owners
+        }
+        # Zero-width lookahead so overlapping triggers are all seen; longest first at each position
+        alternation = "|".join(re.escape(trigger) for trigger in sorted(owners, key=len, reverse=True))
+        self._scan = re.compile(f"(?=({alternation}))") if owners else None
+        self._payloads: Dict[Tuple[str, str, bool], bytes] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        intents = [
+            Intent(
+                name=item["name"],
+                triggers=tuple(trigger.lower() for trigger in item["triggers"]),
+                answer=item["answer"],
+                source=item["source"],
+                response_type=item["response_type"],
+                max_words=item.get("max_words"),
+            )
+            for item in config["intents"]
+        ]
+        return cls(intents, config.get("system_type", ""))
+
+    def match(self, message: str) -> Optional[Intent]:
+        """First intent, in priority order, with a trigger in the question."""
+        if self._scan is None:
+            return None
+        matched = set()
+        for found in self._scan.finditer(message.lower().strip()):
+            matched |= self._implied[found.group(1)]
+        words = None
+        for position in sorted(matched):
+            intent = self.intents[position]
+            if intent.max_words is not None:
+                if words is None:
+                    words = len(message.split())
+                if words > intent.max_words:
+                    continue
+            return intent
+        return None
+
+    def payload(self, intent: Intent, school_context: str, verbose: bool = False) -> bytes:
+        """JSON body for an intent's response, serialized once per school context.
+
+        The default body carries the answer once; verbose adds the legacy "response"
+        copy and the system type.
+        """
+        key = (intent.name, school_context, verbose)
+        body = self._payloads.get(key)
+        if body is not None:
+            return body
+
+        response = {"answer": intent.answer}
+        if verbose:
+            response["response"] = intent.answer
+        response["sources"] = [intent.source]
+        response["metadata"] = {"response_type": intent.response_type, "school_context": school_context}
+        if verbose:
+            response["metadata"] = {"system_type": self.system_type, **response["metadata"]}
+        body = json.dumps(response, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # The school comes from the request, so only a bounded number are kept
+        with self._lock:
+            if len(self._payloads) < self.max_payloads:
+                self._payloads[key] = body
+        return body
+
+def with_field(body: bytes, name: str, value: Any) -> bytes:
+    """Append one top-level field to a serialized JSON object without re-serializing it."""
+    return body[:-1] + b',' + json.dumps(name).encode("utf-8") + b':' + json.dumps(value, ensure_ascii=False).encode("utf-8") + b'}'
@@ -0,0 +1,154 @@
+"""Immutable, versioned knowledge base snapshots, rebuilt in the background and swapped in on reload."""
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from app.utils.log import get_logger
+from app.utils.singleflight import SingleFlight
+
+logger = get_logger("knowledge_base")
+
+# (path, mtime_ns, size) per watched file; None for files that do not exist
+FileSignature = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+def file_signature(paths: Sequence[str]) -> FileSignature:
+    signature = []
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+            signature.append((path, stat_result.st_mtime_ns, stat_result.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def file_digest(paths: Sequence[str]) -> str:
+    """Hash of the files' contents (missing files count as empty), for versioning derived data."""
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+@dataclass(frozen=True)
+class KnowledgeBaseSnapshot:
+    """One immutable version of the knowledge base."""
+
+    version: str
+    # A list of chunk dicts, or a CorpusPack (app/utils/corpus_pack.py)
+    items: Sequence[Dict[str, Any]]
+    # App-specific data derived from the items (feedback priors, answer store, ...)
+    extras: Dict[str, Any] = field(default_factory=dict)
+    files: FileSignature = ()
+    loaded_at: float = field(default_factory=time.time)
+
+class KnowledgeBase:
+    """The current snapshot, rebuilt in the background and swapped atomically.
+
+    `build(initial)` returns a new snapshot; initial is True for the first load, which
+    should fall back rather than fail, and False for reloads, which should raise on a
+    broken source so the current snapshot is kept.
+    """
+
+    def __init__(self, build: Callable[[bool], KnowledgeBaseSnapshot], watch_paths: Callable[[], Sequence[str]],
+                 poll_interval: float = 5.0):
+        self._build = build
+        self._watch_paths = watch_paths
+        self.poll_interval = poll_interval
+        self._current: Optional[KnowledgeBaseSnapshot] = None
+        self._flight = SingleFlight()
+        self._watcher: Optional[asyncio.Task] = None
+        # Last file state a build was attempted for, so a broken file is not retried every poll
+        self._attempted: FileSignature = ()
+        self.reloads = 0
+        self.reload_failures = 0
+
+    @property
+    def current(self) -> KnowledgeBaseSnapshot:
+        """The snapshot to use for a whole request; built synchronously on first use."""
+        snapshot = self._current
+        if snapshot is None:
+            snapshot = self._current = self._build(True)
+            self._attempted = snapshot.files
+        return snapshot
+
+    def swap(self, snapshot: KnowledgeBaseSnapshot) -> None:
+        """Make `snapshot` current (also used by benchmarks to install a synthetic corpus)."""
+        self._current = snapshot
+
+    async def reload(self, reason: str = "manual") -> Tuple[bool, KnowledgeBaseSnapshot]:
+        """Rebuild and swap; (whether the version changed, the current snapshot)."""
+        return await self._flight.do("reload", lambda: self._reload(reason))
+
+    async def _reload(self, reason: str) -> Tuple[bool, KnowledgeBaseSnapshot]:
+        previous = self._current
+        self._attempted = file_signature(self._watch_paths())
+        started = time.perf_counter()
+        try:
+            snapshot = await asyncio.to_thread(self._build, False)
+        except Exception as e:
+            self.reload_failures += 1
+            logger.error("Knowledge base reload failed; keeping the current version",
+                         extra={"reason": reason, "error": str(e),
+                                "version": previous.version if previous else None})
+            raise
+        changed = previous is None or snapshot.version != previous.version
+        if not changed:
+            # The version covers everything the snapshot is built from, so there is nothing new
+            logger.info("Knowledge base unchanged; keeping the current version",
+                        extra={"reason": reason, "version": previous.version})
+            return False, previous
+        self._current = snapshot
+        self.reloads += 1
+        logger.info("Knowledge base reloaded", extra={
+            "reason": reason,
+            "changed": changed,
+            "version": snapshot.version,
+            "previous_version": previous.version if previous else None,
+            "chunks": len(snapshot.items),
+            "seconds": round(time.perf_counter() - started, 3),
+        })
+        return changed, snapshot
+
+    def files_changed(self) -> bool:
+        return file_signature(self._watch_paths()) != self._attempted
+
+    async def watch(self) -> None:
+        """Reload whenever a watched file changes, polling every poll_interval seconds."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self.files_changed():
+                try:
+                    await self.reload("files_changed")
+                except Exception:
+                    # Logged by _reload; retried when the files change again
+                    pass
+
+    def start_watching(self) -> None:
+        if self.poll_interval > 0 and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.get_running_loop().create_task(self.watch())
+
+    async def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._current
+        return {
+            "version": snapshot.version if snapshot else None,
+            "chunks": len(snapshot.items) if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+        }
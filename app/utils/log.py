@@ -0,0 +1,152 @@
+"""Structured JSON logging through a queue, tagged with the request ID and sampled per request."""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+ROOT_LOGGER = "starbot"
+REQUEST_ID_HEADER = b"x-request-id"
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+_sampled_var: ContextVar[Optional[bool]] = ContextVar("log_sampled", default=None)
+
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _ContextQueueHandler(QueueHandler):
+    """Stamps the request ID and renders args and tracebacks before a record is queued.
+
+    prepare() runs in the caller's thread, where the request's contextvars are visible.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.traceback = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "starbot.retrieval=DEBUG,starbot.api=WARNING" into {logger: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(level: Optional[str] = None, levels: Optional[Dict[str, str]] = None) -> None:
+    """Route the "starbot" logger tree through a background JSON writer. Safe to call repeatedly."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _ContextQueueHandler(log_queue)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers[:] = [queue_handler]
+        root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+        # Keep our records out of the root logger (uvicorn and basicConfig handlers)
+        root.propagate = False
+
+        for name, module_level in (levels or parse_levels(os.getenv("LOG_LEVELS", ""))).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under "starbot", configuring logging on first use."""
+    configure_logging()
+    return logging.getLogger(name if name.startswith(ROOT_LOGGER) else f"{ROOT_LOGGER}.{name}")
+
+def set_sample_rate(rate: float) -> None:
+    global _sample_rate
+    _sample_rate = rate
+
+def sampled() -> bool:
+    """Whether verbose diagnostics should be logged for the current request.
+
+    Decided once per request so a sampled request logs all of its diagnostics.
+    """
+    decision = _sampled_var.get()
+    if decision is None:
+        decision = random.random() < _sample_rate
+        _sampled_var.set(decision)
+    return decision
+
+class RequestContextMiddleware:
+    """ASGI middleware assigning each request an ID (from X-Request-ID or generated) and a sampling decision.
+
+    The ID is echoed back in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ""
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+
+        id_token = request_id_var.set(request_id)
+        sampled_token = _sampled_var.set(random.random() < _sample_rate)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(id_token)
+            _sampled_var.reset(sampled_token)
@@ -0,0 +1,193 @@
+"""Chroma-style `where` metadata filters, checked, translated for Chroma and evaluated on bitmaps."""
+import abc
+import operator
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+Where = Dict[str, Any]
+
+# Keys corpus packs index when written; other keys are indexed on first use, by a scan
+FILTER_KEYS = ("school", "source_type", "file_type", "filename", "source_file", "url", "domain", "page")
+
+_COMPARISONS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+_RANGES = ("$gt", "$gte", "$lt", "$lte")
+_SCALARS = (str, int, float, bool)
+
+# Bit positions set in each byte value, for turning bitmaps back into chunk IDs
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _conditions(key: str, condition: Any) -> List[Tuple[str, Any]]:
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    if not condition:
+        raise ValueError(f"Empty condition for {key!r}")
+    for op, operand in condition.items():
+        if op in ("$in", "$nin"):
+            if not isinstance(operand, list) or not operand or not all(isinstance(v, _SCALARS) for v in operand):
+                raise ValueError(f"{op} on {key!r} takes a non-empty list of strings or numbers")
+        elif op in _RANGES:
+            if not _number(operand):
+                raise ValueError(f"{op} on {key!r} takes a number")
+        elif op in _COMPARISONS:
+            if not isinstance(operand, _SCALARS):
+                raise ValueError(f"{op} on {key!r} takes a string or number")
+        else:
+            raise ValueError(f"Unknown filter operator {op!r}")
+    return list(condition.items())
+
+def compile_where(where: Optional[Where]) -> Optional[Where]:
+    """`where` checked and in Chroma's explicit form (one key per dict); None for no filter.
+
+    Operators are $eq, $ne, $gt, $gte, $lt, $lte (numbers only), $in, $nin, $and and
+    $or; a dict with several keys or operators means all of them.
+
+    Raises ValueError for a malformed filter.
+    """
+    if not where:
+        return None
+    if not isinstance(where, dict):
+        raise ValueError("A filter is a dict of metadata conditions")
+    clauses = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            if not isinstance(condition, list) or not condition:
+                raise ValueError(f"{key} takes a non-empty list of filters")
+            parts = [compile_where(part) for part in condition]
+            if None in parts:
+                raise ValueError(f"{key} takes non-empty filters")
+            # Chroma wants at least two filters under $and/$or
+            clauses.append(parts[0] if len(parts) == 1 else {key: parts})
+        elif key.startswith("$"):
+            raise ValueError(f"Unknown filter operator {key!r}")
+        else:
+            clauses.extend({key: {op: operand}} for op, operand in _conditions(key, condition))
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def all_of(*wheres: Optional[Where]) -> Optional[Where]:
+    """One compiled filter requiring every given filter; None if none is given."""
+    return compile_where({"$and": [where for where in wheres if where]} if any(wheres) else None)
+
+def _accepts(op: str, operand: Any, value: Any) -> bool:
+    if not isinstance(value, _SCALARS):
+        return False
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op in _RANGES and not _number(value):
+        return False
+    try:
+        return _COMPARISONS[op](value, operand)
+    except TypeError:
+        return False
+
+def matches(where: Optional[Where], metadata: Dict[str, Any]) -> bool:
+    """Whether a chunk's metadata passes a compiled filter."""
+    if where is None:
+        return True
+    ((key, condition),) = where.items()
+    if key == "$and":
+        return all(matches(part, metadata) for part in condition)
+    if key == "$or":
+        return any(matches(part, metadata) for part in condition)
+    if key not in metadata:
+        return False
+    ((op, operand),) = condition.items()
+    return _accepts(op, operand, metadata[key])
+
+def ids_bitmap(chunks: Iterable[int], size: int) -> int:
+    """A bitmap with the bits of `chunks` set."""
+    data = bytearray((size + 7) // 8)
+    for chunk in chunks:
+        data[chunk >> 3] |= 1 << (chunk & 7)
+    return int.from_bytes(data, "little")
+
+def bitmap_ids(bitmap: int) -> List[int]:
+    """The chunk IDs set in a bitmap, in order."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    chunks = []
+    for index, byte in enumerate(data):
+        if byte:
+            base = index << 3
+            chunks.extend(base + bit for bit in _BITS[byte])
+    return chunks
+
+def url_domain(url: str) -> str:
+    """The host of a URL, lowercased and without "www.", for the "domain" metadata key."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+class BitmapIndex(abc.ABC):
+    """Filter evaluation for a corpus of `chunks` chunks addressed by position.
+
+    Subclasses list each metadata key's distinct values and their chunk IDs; the
+    bitmaps of the most recently used values are kept.
+    """
+
+    BITMAP_CACHE = 256
+
+    chunks: int
+
+    @abc.abstractmethod
+    def values(self, key: str) -> Iterable[Any]:
+        """The distinct values of `key` in the corpus."""
+
+    @abc.abstractmethod
+    def postings(self, key: str, value: Any) -> Sequence[int]:
+        """IDs of the chunks whose metadata `key` is `value`, in order."""
+
+    def bitmap(self, key: str, value: Any) -> int:
+        cache = getattr(self, "_bitmaps", None)
+        if cache is None:
+            cache = self._bitmaps = OrderedDict()
+        # Typed, so 1 and True stay distinct values
+        cache_key = (key, type(value), value)
+        bitmap = cache.get(cache_key)
+        if bitmap is None:
+            bitmap = cache[cache_key] = ids_bitmap(self.postings(key, value), self.chunks)
+            if len(cache) > self.BITMAP_CACHE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(cache_key)
+        return bitmap
+
+    def matching(self, where: Where) -> int:
+        """Bitmap of the chunks passing a compiled filter."""
+        ((key, condition),) = where.items()
+        if key == "$and":
+            bitmap = self.matching(condition[0])
+            for part in condition[1:]:
+                if not bitmap:
+                    break
+                bitmap &= self.matching(part)
+            return bitmap
+        if key == "$or":
+            bitmap = 0
+            for part in condition:
+                bitmap |= self.matching(part)
+            return bitmap
+        ((op, operand),) = condition.items()
+        bitmap = 0
+        for value in self.values(key):
+            if _accepts(op, operand, value):
+                bitmap |= self.bitmap(key, value)
+        return bitmap
+
+    def filter(self, where: Optional[Where]) -> Optional[List[int]]:
+        """IDs of the chunks passing `where`, in order; None when there is no filter.
+
+        Raises ValueError for a malformed filter.
+        """
+        where = compile_where(where)
+        return None if where is None else bitmap_ids(self.matching(where))
@@ -0,0 +1,63 @@
+"""Which Star College school a chunk is about (or SHARED), for school-filtered retrieval."""
+import re
+from typing import Any, Dict, Optional, Set, Tuple
+
+SHARED = "shared"
+
+# The frontend's school-select values
+SCHOOLS = ("boys-high", "girls-high", "primary", "pre-primary")
+
+# Their labels in the school select, for prompts
+SCHOOL_NAMES = {
+    "boys-high": "Star College Durban Boys High",
+    "girls-high": "Star College Durban Girls High",
+    "primary": "Star College Durban Primary",
+    "pre-primary": "Little Dolphin Star Pre-Primary School",
+}
+
+# Names as written in documents, page titles and URL slugs
+_NAMES = {
+    "boys-high": re.compile(r"\bboys'?[\s_-]*high", re.IGNORECASE),
+    "girls-high": re.compile(r"\bgirls'?[\s_-]*high", re.IGNORECASE),
+    # "primary" alone is too common a word ("primary goal")
+    "primary": re.compile(r"(?<!pre)(?<!pre[\s_-])\bprimary[\s_-]*(?:school|phase|campus)"
+                          r"|\bstar[\s_-]*college[\s_-]*(?:durban[\s_-]*)?primary", re.IGNORECASE),
+    "pre-primary": re.compile(r"\bpre[\s_-]?primary|\bpre[\s_-]?school|\blittle[\s_-]*dolphin", re.IGNORECASE),
+}
+
+# Text about the school levels in general ("pre-primary, primary and high school")
+_GENERAL = re.compile(r"\bhigh[\s_-]*schools?\b|\b(?:all|both)\s+(?:\w+\s+)?schools\b", re.IGNORECASE)
+
+def schools_mentioned(text: str) -> Set[str]:
+    return {school for school, name in _NAMES.items() if name.search(text)}
+
+def _general(text: str) -> bool:
+    # Named high schools are not general: drop them before looking for "high school"
+    return bool(_GENERAL.search(_NAMES["girls-high"].sub("", _NAMES["boys-high"].sub("", text))))
+
+def tag_school(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """The chunk's school, or SHARED; a valid "school" already in metadata wins."""
+    metadata = metadata or {}
+    if metadata.get("school") in SCHOOLS or metadata.get("school") == SHARED:
+        return metadata["school"]
+    sources = " ".join(str(metadata[key]) for key in ("filename", "source_file", "url", "title") if metadata.get(key))
+    mentioned = schools_mentioned(text) | schools_mentioned(sources)
+    return mentioned.pop() if len(mentioned) == 1 and not _general(text) else SHARED
+
+def school_filter(selected: Optional[str]) -> Optional[str]:
+    """The school a request selected ("boys-high", a display name...), or None for all schools."""
+    value = (selected or "").strip().lower()
+    if value in SCHOOLS:
+        return value
+    mentioned = schools_mentioned(value)
+    return mentioned.pop() if len(mentioned) == 1 else None
+
+def school_partitions(selected: Optional[str]) -> Optional[Tuple[str, str]]:
+    """The partitions a request searches: its school's and the shared one, or None for all."""
+    school = school_filter(selected)
+    return (school, SHARED) if school else None
+
+def school_where(selected: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The metadata filter (app/utils/metadata_filter.py) for a request's school partitions."""
+    partitions = school_partitions(selected)
+    return {"school": {"$in": list(partitions)}} if partitions else None
@@ -0,0 +1,187 @@
+"""Server-side chat session storage, in memory or in SQLite, so clients send a session ID instead of their history."""
+import abc
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# (role, content), with role "user" or "assistant"
+StoredTurn = Tuple[str, str]
+
+# Rough per-turn and per-session overhead, for the memory cap
+_TURN_OVERHEAD = 64
+_SESSION_OVERHEAD = 256
+
+@dataclass
+class SessionState:
+    """Rolling summary plus the turns not yet folded into it, oldest first."""
+
+    summary: str = ""
+    turns: List[StoredTurn] = field(default_factory=list)
+    # Number of turns ever dropped from the front of `turns` (summarized or trimmed)
+    first_turn: int = 0
+
+    def size(self) -> int:
+        return _SESSION_OVERHEAD + len(self.summary) + sum(len(content) + _TURN_OVERHEAD for _, content in self.turns)
+
+class SessionStore(abc.ABC):
+    """Get/put/delete SessionState by session ID."""
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """The session's state, or None if it is unknown or expired."""
+
+    @abc.abstractmethod
+    def put(self, session_id: str, state: SessionState) -> None:
+        """Store the session's state, replacing any earlier one."""
+
+    @abc.abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Forget the session."""
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Counters for /health and metrics."""
+
+class MemorySessionStore(SessionStore):
+    """In-process sessions with idle TTL and an LRU-evicted global size cap."""
+
+    def __init__(self, ttl_seconds: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # session_id -> (state, size, last access); ordered least recently used first
+        self._sessions: "OrderedDict[str, Tuple[SessionState, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _drop(self, session_id: str) -> None:
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+
+    def _expire(self, now: float) -> None:
+        # Access order is also expiry order, so expired sessions are at the front
+        while self._sessions:
+            session_id, (_, _, accessed) = next(iter(self._sessions.items()))
+            if now - accessed < self.ttl_seconds:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            state, size, _ = entry
+            self._sessions[session_id] = (state, size, now)
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def put(self, session_id: str, state: SessionState) -> None:
+        now = time.time()
+        size = state.size()
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+            self._sessions[session_id] = (state, size, now)
+            self._bytes += size
+            self._expire(now)
+            while self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._drop(next(iter(self._sessions)))
+                self.evicted += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "bytes": self._bytes, "expired": self.expired, "evicted": self.evicted}
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in a SQLite file shared by the workers on one host, with the same TTL and size cap."""
+
+    def __init__(self, path: str, ttl_seconds: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, summary TEXT NOT NULL, turns TEXT NOT NULL,"
+            " first_turn INTEGER NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)")
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary, turns, first_turn FROM sessions WHERE id = ? AND accessed > ?",
+                (session_id, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (now, session_id))
+        summary, turns, first_turn = row
+        return SessionState(summary, [tuple(turn) for turn in json.loads(turns)], first_turn)
+
+    def put(self, session_id: str, state: SessionState) -> None:
+        now = time.time()
+        turns = json.dumps(state.turns, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO sessions (id, summary, turns, first_turn, size, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, state.summary, turns, state.first_turn, state.size(), now),
+                )
+                self._connection.execute("DELETE FROM sessions WHERE accessed <= ?", (now - self.ttl_seconds,))
+                self._evict()
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Oldest first until under the cap, always keeping the most recent session
+        for session_id, size in self._connection.execute(
+            "SELECT id, size FROM sessions ORDER BY accessed"
+        ).fetchall()[:-1]:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self.evicted += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sessions, total = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {"sessions": sessions, "bytes": total, "evicted": self.evicted}
+
+def create_session_store(kind: str = "memory", path: str = "sessions.db", ttl_seconds: float = 3600,
+                         max_bytes: int = 64 * 1024 * 1024) -> SessionStore:
+    """Build the store named by SESSION_STORE: "memory" (default) or "sqlite"."""
+    if kind == "sqlite":
+        return SqliteSessionStore(path, ttl_seconds, max_bytes)
+    if kind != "memory":
+        raise ValueError(f"Unknown session store {kind!r}; expected 'memory' or 'sqlite'")
+    return MemorySessionStore(ttl_seconds, max_bytes)
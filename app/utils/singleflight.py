@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key into a single execution.
+
+    The first caller for a key runs the work; callers arriving while it is in flight
+    await the same future instead of repeating it. Nothing is kept once the call
+    finishes, so this complements a response cache rather than replacing it.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._in_flight:
+            future = self._in_flight[key]
+            self.deduplicated += 1
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            try:
+                # Shield so a waiter disconnecting does not cancel the shared work
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled; retry, possibly as the new leader
+                self.deduplicated -= 1
+            finally:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.leaders += 1
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._in_flight),
+            "waiters": sum(self._waiters.values()),
+            "leaders": self.leaders,
+            "deduplicated": self.deduplicated,
+        }
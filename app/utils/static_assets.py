@@ -0,0 +1,142 @@
+"""
+Cache-friendly serving of the web interface.
+
+index.html is read once, its /static and /images references are rewritten to
+fingerprinted filenames (logo.3f2a9c1b.png), and it is kept in memory with gzip and,
+when the brotli package is installed, brotli variants. Each variant has a strong
+ETag, so revalidation costs a 304. FingerprintedStaticFiles serves those fingerprinted
+names with a one-year immutable Cache-Control; plain names are served as before but
+must be revalidated.
+"""
+import gzip
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional, Tuple
+
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_FINGERPRINTED = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{8})(?P<suffix>\.[A-Za-z0-9]+)$")
+# Quoted /static/... or images/... references in HTML attributes and inline scripts
+_ASSET_REFERENCE = re.compile(r"""(?P<quote>["'])(?P<slash>/?)(?P<prefix>static|images)/(?P<path>[^"'?#]+)(?P=quote)""")
+
+_fingerprints: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+def file_fingerprint(full_path: str) -> str:
+    """First 8 hex digits of the file's SHA-256, cached until its mtime or size changes."""
+    stat_result = os.stat(full_path)
+    version = (stat_result.st_mtime_ns, stat_result.st_size)
+    cached = _fingerprints.get(full_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    fingerprint = digest.hexdigest()[:8]
+    _fingerprints[full_path] = (version, fingerprint)
+    return fingerprint
+
+def fingerprinted_name(path: str, fingerprint: str) -> str:
+    stem, suffix = os.path.splitext(path)
+    return f"{stem}.{fingerprint}{suffix}"
+
+def fingerprint_references(html: str, directories: Mapping[str, str]) -> str:
+    """Rewrite quoted static/... and images/... references to fingerprinted names.
+
+    `directories` maps each URL prefix ("static", "images") to the folder it serves;
+    references to files that do not exist are left alone.
+    """
+    def rewrite(match):
+        directory = directories.get(match.group("prefix"))
+        full_path = os.path.join(directory, match.group("path")) if directory else None
+        if not full_path or not os.path.isfile(full_path):
+            return match.group(0)
+        name = fingerprinted_name(match.group("path"), file_fingerprint(full_path))
+        quote = match.group("quote")
+        return f"{quote}{match.group('slash')}{match.group('prefix')}/{name}{quote}"
+
+    return _ASSET_REFERENCE.sub(rewrite, html)
+
+@dataclass
+class CompressedAsset:
+    """A response body held in memory with precomputed encodings and strong ETags."""
+
+    content_type: str
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+    # One per encoding, since the bytes differ
+    etags: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_bytes(cls, content: bytes, content_type: str) -> "CompressedAsset":
+        bodies = {"identity": content, "gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(content, quality=11)
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        etags = {encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"' for encoding in bodies}
+        return cls(content_type, bodies, etags)
+
+    def select(self, accept_encoding: str) -> str:
+        """Smallest encoding the client accepts (q=0 excludes one)."""
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            name, _, params = part.strip().partition(";")
+            q = params.strip()
+            if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+                continue
+            accepted.add(name.strip())
+        candidates = [encoding for encoding in self.bodies if encoding == "identity" or encoding in accepted or "*" in accepted]
+        return min(candidates, key=lambda encoding: len(self.bodies[encoding]))
+
+    def response(self, headers: Mapping[str, str], cache_control: str = REVALIDATE) -> Response:
+        """200 with the best encoding, or 304 when If-None-Match matches its ETag."""
+        encoding = self.select(headers.get("accept-encoding", ""))
+        response_headers = {"ETag": self.etags[encoding], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = headers.get("if-none-match", "")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if self.etags[encoding] in tags or "*" in tags:
+                return Response(status_code=304, headers=response_headers)
+
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type=self.content_type, headers=response_headers)
+
+def load_index_page(path: str, directories: Mapping[str, str]) -> Optional[CompressedAsset]:
+    """index.html with fingerprinted asset references, compressed; None if it is missing."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+    except FileNotFoundError:
+        return None
+    return CompressedAsset.from_bytes(fingerprint_references(html, directories).encode("utf-8"), "text/html; charset=utf-8")
+
+class FingerprintedStaticFiles(StaticFiles):
+    """StaticFiles that also serves name.<fingerprint>.ext with long-lived caching."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        match = _FINGERPRINTED.match(path)
+        if match:
+            original = match.group("stem") + match.group("suffix")
+            full_path, stat_result = self.lookup_path(original)
+            if stat_result is not None and os.path.isfile(full_path):
+                response = await super().get_response(original, scope)
+                # A stale fingerprint (from a cached page) still gets the current file, revalidated
+                current = file_fingerprint(full_path) == match.group("hash")
+                response.headers["Cache-Control"] = IMMUTABLE if current else REVALIDATE
+                return response
+
+        response = await super().get_response(path, scope)
+        response.headers.setdefault("Cache-Control", REVALIDATE)
+        return response
@@ -0,0 +1,111 @@
+from collections import deque
+from typing import List, Optional, Tuple
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+class OffsetTextSplitter:
+    """Recursive character splitter that works on offsets into the source text.
+
+    Produces exactly the chunks of LangChain's RecursiveCharacterTextSplitter with its
+    defaults (literal separators kept at the start of each piece, whitespace stripped,
+    len as the length function), but tracks (start, end) offsets instead of copying
+    substrings at every level. Chunk strings are only sliced out when emitted.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int, separators: Optional[List[str]] = None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+
+    def split_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Return the (start, end) offsets of each chunk in text."""
+        chunks: List[Tuple[int, int]] = []
+        self._split_range(text, 0, len(text), 0, chunks)
+        return chunks
+
+    def split_text(self, text: str) -> List[str]:
+        """Return the chunk strings, identical to RecursiveCharacterTextSplitter.split_text."""
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def _split_range(self, text: str, start: int, end: int, first_separator: int, chunks: List[Tuple[int, int]]) -> None:
+        separators = self.separators
+
+        # Use the first separator present in this range; "" splits into characters
+        separator = separators[-1]
+        next_separator = len(separators)
+        for i in range(first_separator, len(separators)):
+            candidate = separators[i]
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                next_separator = i + 1
+                break
+
+        good_pieces: List[Tuple[int, int]] = []
+        for piece_start, piece_end in self._pieces(text, start, end, separator):
+            if piece_end - piece_start < self.chunk_size:
+                good_pieces.append((piece_start, piece_end))
+                continue
+
+            if good_pieces:
+                self._merge(text, good_pieces, chunks)
+                good_pieces = []
+            if next_separator >= len(separators):
+                # No finer separator left; LangChain keeps the oversized piece unstripped
+                chunks.append((piece_start, piece_end))
+            else:
+                self._split_range(text, piece_start, piece_end, next_separator, chunks)
+
+        if good_pieces:
+            self._merge(text, good_pieces, chunks)
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> List[Tuple[int, int]]:
+        """Split [start, end) before each separator occurrence, dropping empty pieces."""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+
+        pieces = []
+        piece_start = start
+        position = text.find(separator, start, end)
+        while position != -1:
+            if position > piece_start:
+                pieces.append((piece_start, position))
+            piece_start = position
+            position = text.find(separator, position + len(separator), end)
+        if end > piece_start:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int]], chunks: List[Tuple[int, int]]) -> None:
+        """Greedily combine adjacent pieces into chunks, carrying chunk_overlap characters over."""
+        window = deque()
+        total = 0
+        for piece_start, piece_end in pieces:
+            length = piece_end - piece_start
+            if total + length > self.chunk_size and window:
+                self._emit(text, window[0][0], window[-1][1], chunks)
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    dropped_start, dropped_end = window.popleft()
+                    total -= dropped_end - dropped_start
+            window.append((piece_start, piece_end))
+            total += length
+
+        if window:
+            self._emit(text, window[0][0], window[-1][1], chunks)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, chunks: List[Tuple[int, int]]) -> None:
+        """Record [start, end) with surrounding whitespace trimmed, skipping blank chunks."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            chunks.append((start, end))
@@ -0,0 +1,144 @@
+"""Shared helpers for the benchmark scripts: percentiles, corpus loading and result files."""
+import json
+import math
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+PROCESSED_FOLDER = ROOT_DIR / os.getenv("PROCESSED_FOLDER", "processed")
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as milliseconds."""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+def load_corpus_texts(limit: int = 0) -> List[str]:
+    """Chunk texts from the processed JSON files, falling back to star_college_info.txt."""
+    texts = []
+    for name in ("sample_data.json", "uploads_data.json", "web_data.json"):
+        path = PROCESSED_FOLDER / name
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                texts.extend(item["text"] for item in json.load(f) if item.get("text"))
+
+    if not texts:
+        info_path = ROOT_DIR / "star_college_info.txt"
+        with open(info_path, "r", encoding="utf-8") as f:
+            texts = [block.strip() for block in f.read().split("\n\n") if block.strip()]
+
+    return texts[:limit] if limit else texts
+
+def load_corpus_documents() -> List[Dict[str, Any]]:
+    """Processed chunks ({"text", "metadata"}) as the apps load them.
+
+    Without processed JSON files, star_college_info.txt sections and the chunked
+    pages of the PDFs in data/uploads stand in, so evaluations run on a fresh checkout.
+    """
+    documents = []
+    for name in ("sample_data.json", "uploads_data.json", "web_data.json"):
+        path = PROCESSED_FOLDER / name
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for item in json.load(f):
+                    if item.get("text"):
+                        metadata = dict(item.get("metadata") or {})
+                        metadata.setdefault("source_file", name)
+                        documents.append({"text": item["text"], "metadata": metadata})
+    if documents:
+        return documents
+
+    with open(ROOT_DIR / "star_college_info.txt", "r", encoding="utf-8") as f:
+        for block in f.read().split("\n\n"):
+            if block.strip():
+                documents.append({
+                    "text": block.strip(),
+                    "metadata": {"source_type": "sample", "source_file": "star_college_info.txt"},
+                })
+
+    try:
+        import fitz
+        from app.config import CHUNK_OVERLAP, CHUNK_SIZE
+        from app.utils.text_splitter import OffsetTextSplitter
+
+        splitter = OffsetTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        for pdf_path in sorted((ROOT_DIR / "data" / "uploads").glob("*.pdf")):
+            with fitz.open(str(pdf_path)) as pdf:
+                for page_number, page in enumerate(pdf, start=1):
+                    for chunk in splitter.split_text(page.get_text()):
+                        documents.append({
+                            "text": chunk,
+                            "metadata": {
+                                "source_type": "file",
+                                "source_file": pdf_path.name,
+                                "filename": pdf_path.name,
+                                "page": page_number,
+                            },
+                        })
+    except ImportError:
+        print("PyMuPDF not installed, skipping PDF pages")
+
+    return documents
+
+def synthetic_corpus(chunks: int) -> List[Dict[str, Any]]:
+    """The local corpus repeated to `chunks` chunks, each worded and sourced distinctly."""
+    documents = load_corpus_documents()
+    items = []
+    for i in range(chunks):
+        document = documents[i % len(documents)]
+        metadata = dict(document["metadata"])
+        metadata["source_file"] = f"{metadata.get('source_file', 'document')}#{i // len(documents)}"
+        items.append({"text": f"{document['text']} (section {i})", "metadata": metadata})
+    return items
+
+def serve_in_thread(app) -> str:
+    """Run an ASGI app under uvicorn on a free local port in a daemon thread; returns its base URL."""
+    import socket
+    import threading
+
+    import uvicorn
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+def save_results(name: str, results: Dict[str, Any]) -> Path:
+    """Write results to benchmarks/results/<name>-<revision>.json for comparison across commits."""
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    revision = git_revision()
+    payload = {"benchmark": name, "revision": revision, "timestamp": time.time(), "results": results}
+    path = RESULTS_DIR / f"{name}-{revision}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Saved results to {path}")
+    return path
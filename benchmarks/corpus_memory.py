@@ -0,0 +1,130 @@
+"""
+Corpus memory per worker: JSON-loaded lists versus the shared corpus pack.
+
+Starts 1, 4 and 8 worker processes the way uvicorn starts its workers (spawned
+interpreters), each loading the corpus the way app/routes/chat.py does and answering
+the benchmark questions with keyword_search, and measures every worker while all of
+them are alive:
+
+    json  json.load of the processed files into lists of dicts (CORPUS_PACK=False)
+    pack  the memory-mapped processed/corpus.pack (app/utils/corpus_pack.py)
+
+RSS counts shared pages in full in every process; PSS splits them between the
+processes mapping them and USS is what the process holds alone, so total PSS is the
+host memory the workers really use. "corpus" is the RSS growth from loading and
+querying. The pack is built before the workers start, as the first worker to see new
+data would; the corpus is the local one repeated to --chunks with distinct wording.
+Needs Linux (/proc/self/smaps_rollup). Embedding models are not loaded.
+
+    python -m benchmarks.corpus_memory --chunks 50000 --workers 1 4 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.common import save_results, synthetic_corpus
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+def memory_kb() -> Dict[str, int]:
+    """rss, pss and uss of this process in kB."""
+    values = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+def load_chunks(folder: str) -> List[Dict]:
+    from app.utils.feedback_priors import chunk_id
+
+    with open(os.path.join(folder, "uploads_data.json"), "r", encoding="utf-8") as f:
+        items = json.load(f)
+    for item in items:
+        item["metadata"]["chunk_id"] = chunk_id(item["metadata"].get("source_file", ""), item["text"])
+    return items
+
+def load_pack(folder: str):
+    from app.utils.corpus_pack import ensure_pack
+
+    return ensure_pack(os.path.join(folder, "corpus.pack"), [os.path.join(folder, "uploads_data.json")],
+                       lambda: load_chunks(folder))
+
+def worker(mode: str, folder: str, questions: List[str], ready, measure, results) -> None:
+    os.environ["LOG_LEVEL"] = "WARNING"
+    from app.services.keyword_search import keyword_search
+
+    before = memory_kb()
+    corpus = load_pack(folder) if mode == "pack" else load_chunks(folder)
+    for question in questions:
+        keyword_search(question, corpus, 5)
+
+    # Measure only once every worker has loaded, so shared pages are split between all of them
+    ready.wait()
+    measure.wait()
+    after = memory_kb()
+    results.put({**after, "corpus": after["rss"] - before["rss"]})
+
+def run(mode: str, workers: int, folder: str, questions: List[str]) -> Dict[str, float]:
+    context = multiprocessing.get_context("spawn")
+    ready, measure = context.Barrier(workers + 1), context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, folder, questions, ready, measure, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    measure.wait()
+    samples = [results.get(timeout=300) for _ in processes]
+    for process in processes:
+        process.join()
+
+    def mean_mb(key: str) -> float:
+        return round(sum(sample[key] for sample in samples) / len(samples) / 1024, 1)
+
+    return {
+        "workers": workers,
+        "rss_mb": mean_mb("rss"),
+        "pss_mb": mean_mb("pss"),
+        "uss_mb": mean_mb("uss"),
+        "corpus_rss_mb": mean_mb("corpus"),
+        "total_pss_mb": round(sum(sample["pss"] for sample in samples) / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000, help="Corpus size")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    args = parser.parse_args()
+
+    items = synthetic_corpus(args.chunks)
+    questions = load_questions(args.questions)
+
+    results = {"chunks": args.chunks, "runs": {}}
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, "uploads_data.json"), "w", encoding="utf-8") as f:
+            json.dump(items, f)
+        print(f"{args.chunks} chunks, {os.path.getsize(os.path.join(folder, 'uploads_data.json')) / 2**20:.1f} MB of JSON")
+        print(f"{'mode':5} {'workers':>7} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9} {'corpus MB':>10} {'total pss':>10}")
+        for mode in ("json", "pack"):
+            if mode == "pack":
+                results["pack_mb"] = round(os.path.getsize(load_pack(folder).path) / 2**20, 1)
+            results["runs"][mode] = []
+            for workers in args.workers:
+                row = run(mode, workers, folder, questions)
+                results["runs"][mode].append(row)
+                print(f"{mode:5} {workers:>7} {row['rss_mb']:>9} {row['pss_mb']:>9} {row['uss_mb']:>9} "
+                      f"{row['corpus_rss_mb']:>10} {row['total_pss_mb']:>10}")
+    save_results("corpus_memory", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Memory and per-query allocation of api/index.py's corpus: dicts versus CorpusStore.
+
+Builds a synthetic corpus of --chunks chunks and measures, with tracemalloc:
+
+    dicts  the chunks as json.load returns them, one dict plus a metadata dict per
+           chunk, and retrieval as it was: a result dict for every chunk above
+           min_score, sorted, then cut to the top 5
+    store  app/utils/corpus_store.py, and retrieve_relevant_chunks scoring by chunk
+           ID and building result dicts for the returned chunks only
+
+Both use the same similarity scorer, so the difference is the representation.
+"Peak" is the most memory a query allocates on top of the corpus.
+
+    python -m benchmarks.corpus_store --chunks 100000
+"""
+import argparse
+import gc
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Keep per-request log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import api.index as index
+from app.utils.corpus_store import CorpusStore
+from app.utils.feedback_priors import chunk_id
+from benchmarks.common import save_results, summarize, synthetic_corpus
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+def retrieve_from_dicts(query: str, items: List[Dict[str, Any]], max_results: int = 5,
+                        min_score: float = 0.15) -> List[Dict[str, Any]]:
+    """retrieve_relevant_chunks over a list of dicts, as before CorpusStore (feedback priors left out)."""
+    score_text = index.similarity_scorer(query)
+    results = []
+    for idx, item in enumerate(items):
+        text = item.get('text', '').strip()
+        if not text or len(text) < 10:
+            continue
+        score = score_text(text)
+        if score >= min_score:
+            metadata = item.get('metadata', {})
+            source_type = metadata.get('source_type', '')
+            if source_type == 'file':
+                score *= 1.2
+            elif source_type == 'sample':
+                score *= 1.1
+            elif source_type == 'web':
+                score *= 1.05
+            if len(text) > 200:
+                score *= 1.1
+            results.append({'text': text, 'metadata': metadata, 'relevance_score': round(score, 3),
+                            'chunk_length': len(text), 'chunk_index': idx})
+    results.sort(key=lambda x: x['relevance_score'], reverse=True)
+    diverse_results = []
+    source_counts = {}
+    for result in results:
+        source_file = result['metadata'].get('source_file', 'unknown')
+        source_count = source_counts.get(source_file, 0)
+        if source_count < 3 or len(diverse_results) < 2:
+            diverse_results.append(result)
+            source_counts[source_file] = source_count + 1
+        if len(diverse_results) >= max_results:
+            break
+    return diverse_results[:max_results]
+
+def load_dicts(serialized: str) -> List[Dict[str, Any]]:
+    """The chunks as read_processed_files and build_snapshot leave them."""
+    items = json.loads(serialized)
+    for item in items:
+        item['metadata']['chunk_id'] = chunk_id(item['metadata'].get('source_file', ''), item['text'])
+    return items
+
+def traced_mb(build: Callable[[], Any]) -> tuple:
+    """(result, MB it holds after a collection)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, round(current / 2**20, 1)
+
+def measure_queries(search: Callable[[str], Any], questions: List[str], rounds: int) -> Dict[str, Any]:
+    latencies = []
+    for _ in range(rounds):
+        for question in questions:
+            started = time.perf_counter()
+            search(question)
+            latencies.append(time.perf_counter() - started)
+
+    peaks = []
+    tracemalloc.start()
+    for question in questions:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        search(question)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return {
+        "time": summarize(latencies),
+        "mean_peak_kb": round(sum(peaks) / len(peaks) / 1024, 1),
+        "max_peak_kb": round(max(peaks) / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000, help="Corpus size")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    serialized = json.dumps(synthetic_corpus(args.chunks))
+    print(f"{args.chunks} chunks, {len(serialized) / 2**20:.1f} MB of JSON, {len(questions)} questions")
+
+    items, dicts_mb = traced_mb(lambda: load_dicts(serialized))
+    store, store_mb = traced_mb(lambda: CorpusStore(load_dicts(serialized)))
+    snapshot = index.build_snapshot(items=load_dicts(serialized))
+
+    results = {
+        "chunks": args.chunks,
+        "dicts": {"corpus_mb": dicts_mb, **measure_queries(lambda q: retrieve_from_dicts(q, items), questions, args.rounds)},
+        "store": {"corpus_mb": store_mb, **measure_queries(
+            lambda q: index.retrieve_relevant_chunks(q, snapshot=snapshot), questions, args.rounds)},
+    }
+    print(f"{'':6} {'corpus MB':>10} {'p50 ms':>9} {'p95 ms':>9} {'mean peak KB':>13} {'max peak KB':>12}")
+    for name in ("dicts", "store"):
+        row = results[name]
+        print(f"{name:6} {row['corpus_mb']:>10} {row['time']['p50_ms']:>9} {row['time']['p95_ms']:>9} "
+              f"{row['mean_peak_kb']:>13} {row['max_peak_kb']:>12}")
+    save_results("corpus_store", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare the PyTorch (HuggingFaceEmbeddings) and ONNX embedding backends.
+
+Checks parity as the cosine similarity between the two backends' vectors for the same
+texts, and measures throughput and per-batch latency on the local corpus.
+Exits with status 1 when any vector falls below --min-cosine (--min-cosine-int8 for
+the quantized model).
+
+    python -m benchmarks.embedding_backends --threads 4 --batch-size 32
+"""
+import argparse
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import EMBEDDING_MODEL, ONNX_MODEL_FOLDER
+from benchmarks.common import load_corpus_texts, save_results, summarize
+
+def cosine_similarities(a: List[List[float]], b: List[List[float]]) -> np.ndarray:
+    a_arr = np.asarray(a, dtype=np.float64)
+    b_arr = np.asarray(b, dtype=np.float64)
+    dots = (a_arr * b_arr).sum(axis=1)
+    norms = np.linalg.norm(a_arr, axis=1) * np.linalg.norm(b_arr, axis=1)
+    return dots / np.clip(norms, 1e-12, None)
+
+def measure(model, texts: List[str], batch_size: int, rounds: int) -> Dict[str, float]:
+    """Embed the corpus `rounds` times in batches, recording each batch's latency."""
+    model.embed_documents(texts[:batch_size])  # warm up
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for start in range(0, len(texts), batch_size):
+            batch_started = time.perf_counter()
+            model.embed_documents(texts[start:start + batch_size])
+            latencies.append(time.perf_counter() - batch_started)
+    elapsed = time.perf_counter() - started
+
+    query_latencies = []
+    for text in texts[:50]:
+        query_started = time.perf_counter()
+        model.embed_query(text)
+        query_latencies.append(time.perf_counter() - query_started)
+
+    result = {"texts_per_sec": round(len(texts) * rounds / elapsed, 2)}
+    result["batch_latency"] = summarize(latencies)
+    result["query_latency"] = summarize(query_latencies)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=512, help="Number of corpus texts to embed")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime intra-op threads (0 = default)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-cosine-int8", type=float, default=0.97)
+    parser.add_argument("--skip-pytorch", action="store_true", help="Only benchmark the ONNX backend")
+    args = parser.parse_args()
+
+    from app.services.onnx_embedding import OnnxEmbeddings
+
+    texts = load_corpus_texts(args.limit)
+    print(f"Benchmarking {len(texts)} texts with {EMBEDDING_MODEL}")
+
+    backends = {}
+    if not args.skip_pytorch:
+        from app.services.embedding import HuggingFaceEmbeddings
+        backends["pytorch"] = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    for name, quantized in (("onnx", False), ("onnx_int8", True)):
+        try:
+            backends[name] = OnnxEmbeddings(
+                ONNX_MODEL_FOLDER, quantized=quantized, num_threads=args.threads, batch_size=args.batch_size
+            )
+        except FileNotFoundError as e:
+            print(f"Skipping {name}: {e}")
+
+    results = {"texts": len(texts), "batch_size": args.batch_size, "threads": args.threads, "backends": {}}
+    for name, model in backends.items():
+        print(f"Measuring {name}...")
+        results["backends"][name] = measure(model, texts, args.batch_size, args.rounds)
+        print(f"  {results['backends'][name]['texts_per_sec']} texts/sec")
+
+    parity_ok = True
+    if "pytorch" in backends:
+        reference = backends["pytorch"].embed_documents(texts)
+        results["parity"] = {}
+        for name, model in backends.items():
+            if name == "pytorch":
+                continue
+            similarities = cosine_similarities(reference, model.embed_documents(texts))
+            results["parity"][name] = {
+                "min_cosine": round(float(similarities.min()), 6),
+                "mean_cosine": round(float(similarities.mean()), 6),
+            }
+            print(f"Parity {name}: min cosine {similarities.min():.6f}, mean {similarities.mean():.6f}")
+            threshold = args.min_cosine_int8 if name.endswith("int8") else args.min_cosine
+            if similarities.min() < threshold:
+                parity_ok = False
+                print(f"  below the {threshold} threshold")
+
+    save_results("embedding_backends", results)
+    if not parity_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
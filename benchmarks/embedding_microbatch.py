@@ -0,0 +1,87 @@
+"""
+Load test for micro-batched query embeddings.
+
+Simulates concurrent chat requests that each need one query embedding and compares
+unbatched calls (one forward pass per request on the default thread pool) with
+EmbeddingService.aembed_query, reporting throughput and latency percentiles.
+
+    python -m benchmarks.embedding_microbatch --concurrency 64 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from app.config import QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS
+from app.services.embedding import EmbeddingService, QueryBatcher
+from benchmarks.common import load_corpus_texts, save_results, summarize
+
+async def run_load(
+    embed: Callable[[str], Awaitable[List[float]]], queries: List[str], concurrency: int, total: int
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = iter(range(total))
+
+    async def client():
+        for i in remaining:
+            started = time.perf_counter()
+            await embed(queries[i % len(queries)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {"requests_per_sec": round(total / elapsed, 2)}
+    result.update(summarize(latencies))
+    return result
+
+async def main_async(args) -> None:
+    service = EmbeddingService(backend=args.backend) if args.backend else EmbeddingService()
+    service.load_model()
+    model = service.model
+
+    # Question-sized inputs: the first sentence of each corpus chunk
+    queries = [text.split(".")[0][:120] for text in load_corpus_texts()]
+    random.Random(0).shuffle(queries)
+    model.embed_documents(queries[:8])  # warm up
+
+    async def unbatched(text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, model.embed_query, text)
+
+    service.query_batcher = QueryBatcher(
+        model.embed_documents, max_wait_ms=args.max_wait_ms, max_batch=args.max_batch
+    )
+
+    results = {
+        "backend": service.backend,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "max_wait_ms": args.max_wait_ms,
+        "max_batch": args.max_batch,
+    }
+    print(f"Unbatched: {args.requests} requests at concurrency {args.concurrency}...")
+    results["unbatched"] = await run_load(unbatched, queries, args.concurrency, args.requests)
+    print(f"  {results['unbatched']}")
+
+    print("Micro-batched...")
+    results["batched"] = await run_load(service.aembed_query, queries, args.concurrency, args.requests)
+    batcher = service.query_batcher
+    results["batched"]["mean_batch_size"] = round(batcher.queries / max(batcher.batches, 1), 2)
+    print(f"  {results['batched']}")
+
+    save_results("embedding_microbatch", results)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["huggingface", "onnx"], default=None)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-wait-ms", type=float, default=QUERY_BATCH_MAX_WAIT_MS)
+    parser.add_argument("--max-batch", type=int, default=QUERY_BATCH_MAX_SIZE)
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
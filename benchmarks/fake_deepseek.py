@@ -0,0 +1,155 @@
+"""
+Local stand-in for the DeepSeek chat completions API, for load tests.
+
+Answers POST /v1/chat/completions with a canned completion after a configurable
+delay: a fixed latency plus jitter (time to first token) and completion_tokens /
+tokens_per_sec (generation time). A fraction of requests can fail with HTTP 500,
+HTTP 429, or hang past the client timeout. Like DeepSeek's context cache, prompt
+prefixes seen before (in 64-token units, ~4 characters per token) are reported as
+prompt_cache_hit_tokens. GET /stats reports request counts.
+
+    python -m benchmarks.fake_deepseek --port 8900 --latency-ms 400 --tokens-per-sec 60 --error-rate 0.02
+
+Then run the app with DEEPSEEK_API_URL=http://127.0.0.1:8900/v1/chat/completions.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Set
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CACHE_UNIT_CHARS = 64 * 4
+
+ANSWER_WORDS = (
+    "Star College Durban has maintained a **100%** matric pass rate since 2002 and is known for "
+    "Mathematics, Science and Computer Technology, with students placing in national olympiads."
+).split()
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 300.0
+    jitter_ms: float = 100.0
+    tokens_per_sec: float = 0.0  # 0 returns the whole completion after latency_ms
+    completion_tokens: int = 120
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 60.0
+    seed: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    seen_prefixes: Set[bytes] = field(default_factory=set)
+
+def cached_prefix_chars(config: FakeConfig, prompt: str) -> int:
+    """Length of the longest previously seen prompt prefix, in whole cache units."""
+    hit_chars = 0
+    digest = hashlib.sha1()
+    for end in range(CACHE_UNIT_CHARS, len(prompt) + 1, CACHE_UNIT_CHARS):
+        digest.update(prompt[end - CACHE_UNIT_CHARS:end].encode("utf-8"))
+        key = digest.digest()
+        if key in config.seen_prefixes and hit_chars == end - CACHE_UNIT_CHARS:
+            hit_chars = end
+        config.seen_prefixes.add(key)
+    return hit_chars
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake DeepSeek")
+    rng = random.Random(config.seed)
+
+    def count(outcome: str) -> None:
+        config.counts[outcome] = config.counts.get(outcome, 0) + 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "".join(f"{message.get('role')}:{message.get('content', '')}" for message in body.get("messages", []))
+        max_tokens = body.get("max_tokens") or config.completion_tokens
+        completion_tokens = min(config.completion_tokens, max_tokens)
+
+        roll = rng.random()
+        if roll < config.hang_rate:
+            count("hang")
+            await asyncio.sleep(config.hang_seconds)
+        elif roll < config.hang_rate + config.rate_limit_rate:
+            count("rate_limited")
+            return JSONResponse({"error": {"message": "Rate limit reached", "type": "rate_limit"}}, status_code=429)
+        elif roll < config.hang_rate + config.rate_limit_rate + config.error_rate:
+            count("error")
+            return JSONResponse({"error": {"message": "Internal error", "type": "server_error"}}, status_code=500)
+
+        delay = config.latency_ms / 1000 + rng.uniform(0, config.jitter_ms / 1000)
+        if config.tokens_per_sec > 0:
+            delay += completion_tokens / config.tokens_per_sec
+        await asyncio.sleep(delay)
+        count("ok")
+
+        content = " ".join(ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(completion_tokens))
+        prompt_tokens = len(prompt) // 4
+        hit_tokens = cached_prefix_chars(config, prompt) // 4
+        return {
+            "id": f"fake-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "deepseek-chat"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return config.counts
+
+    return app
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Fake server options, shared with the load test which starts the server itself."""
+    defaults = FakeConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_sec)
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="fraction answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="fraction answered with HTTP 429")
+    parser.add_argument("--hang-rate", type=float, default=defaults.hang_rate, help="fraction that hang for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=defaults.hang_seconds)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        seed=args.seed,
+    )
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Load test for the chat pipeline against a local fake DeepSeek server.
+
+Starts benchmarks/fake_deepseek.py and the app under test (api/index.py or app/main.py
+under uvicorn, with DEEPSEEK_API_URL pointing at the fake), then replays a question mix
+at a fixed arrival rate. Arrivals are open-loop, and latency is measured from each
+request's scheduled start, so a backed-up server shows up in the percentiles rather than
+slowing the load down. Reports client-side latency, throughput and errors, plus the
+per-stage timings and error counters the app exports on /metrics.
+
+    python -m benchmarks.load_test --app api --rps 20 --duration 30 --latency-ms 400 --error-rate 0.02
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 --rps 5   # already running app
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import fake_deepseek
+from benchmarks.common import ROOT_DIR, save_results, summarize
+
+APP_MODULES = {"api": "api.index:app", "app": "app.main:app"}
+DEFAULT_QUESTIONS = Path(__file__).resolve().parent / "questions.txt"
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+MetricSamples = Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]
+
+def load_questions(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def parse_metrics(text: str) -> MetricSamples:
+    """Parse Prometheus text exposition into {(name, sorted labels): value}."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            key = (name, tuple(sorted(_LABEL.findall(labels or ""))))
+            samples[key] = float(value)
+    return samples
+
+def histogram_quantile(quantile: float, buckets: List[Tuple[float, float]]) -> float:
+    """Estimate a quantile from cumulative (upper bound, count) buckets, interpolating like Prometheus."""
+    if not buckets or buckets[-1][1] == 0:
+        return 0.0
+    rank = quantile * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+def stage_report(before: MetricSamples, after: MetricSamples) -> Dict[str, Dict[str, float]]:
+    """Per-stage count, mean and estimated percentiles (ms) over the test window."""
+    delta = {key: value - before.get(key, 0.0) for key, value in after.items()}
+    stages: Dict[str, Dict[float, float]] = {}
+    sums: Dict[str, float] = {}
+    for (name, labels), value in delta.items():
+        label_map = dict(labels)
+        if name == "starbot_stage_duration_seconds_bucket":
+            stages.setdefault(label_map["stage"], {})[float(label_map["le"])] = value
+        elif name == "starbot_stage_duration_seconds_sum":
+            sums[label_map["stage"]] = value
+
+    report = {}
+    for stage, bucket_map in stages.items():
+        buckets = sorted(bucket_map.items())
+        count = buckets[-1][1]
+        if not count:
+            continue
+        report[stage] = {
+            "count": int(count),
+            "mean_ms": round(sums.get(stage, 0.0) / count * 1000, 3),
+            "p50_ms": round(histogram_quantile(0.50, buckets) * 1000, 3),
+            "p95_ms": round(histogram_quantile(0.95, buckets) * 1000, 3),
+            "p99_ms": round(histogram_quantile(0.99, buckets) * 1000, 3),
+        }
+    return report
+
+def counter_deltas(before: MetricSamples, after: MetricSamples, name: str, label: Optional[str] = None) -> Dict[str, int]:
+    deltas = {}
+    for (sample_name, labels), value in after.items():
+        if sample_name != name:
+            continue
+        key = dict(labels).get(label, "") if label else name
+        increase = int(value - before.get((sample_name, labels), 0.0))
+        if increase:
+            deltas[key] = increase
+    return deltas
+
+def classify(response: httpx.Response) -> Tuple[str, str]:
+    """Return (outcome, response type) for a chat response."""
+    if response.status_code != 200:
+        return f"http_{response.status_code}", ""
+    try:
+        body = response.json()
+    except ValueError:
+        return "invalid_json", ""
+    metadata = body.get("metadata") or {}
+    if metadata.get("error") or metadata.get("error_type"):
+        return "error_response", ""
+    if not body.get("answer") or body["answer"].startswith("I'm sorry, there was an error"):
+        return "error_response", ""
+    if metadata.get("cached"):
+        return "ok", "cached"
+    return "ok", metadata.get("response_type", "rag")
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+async def run_load(args, target: str, questions: List[str]) -> Dict:
+    rng = random.Random(args.seed)
+    total = int(args.rps * args.duration)
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    response_types: Dict[str, int] = {}
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=target, timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client, "/metrics")
+        before = parse_metrics((await client.get("/metrics")).text)
+
+        async def one_request(question: str, scheduled: float) -> None:
+            async with in_flight:
+                try:
+                    response = await client.post("/chat", json={"question": question, "school": ""})
+                    outcome, response_type = classify(response)
+                except httpx.TimeoutException:
+                    outcome, response_type = "client_timeout", ""
+                except httpx.TransportError:
+                    outcome, response_type = "transport_error", ""
+            latencies.append(time.perf_counter() - scheduled)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if response_type:
+                response_types[response_type] = response_types.get(response_type, 0) + 1
+
+        print(f"Sending {total} requests at {args.rps} req/s to {target}...")
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            scheduled = started + i / args.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            question = rng.choice(questions)
+            if args.cache_bust:
+                question = f"{question} ({i})"
+            tasks.append(asyncio.create_task(one_request(question, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        after = parse_metrics((await client.get("/metrics")).text)
+
+    failed = total - outcomes.get("ok", 0)
+    client_report = {"requests": total, "seconds": round(elapsed, 2), "throughput_rps": round(total / elapsed, 2)}
+    client_report.update(summarize(latencies))
+    client_report["error_rate"] = round(failed / total, 4) if total else 0.0
+    return {
+        "client": client_report,
+        "outcomes": outcomes,
+        "response_types": response_types,
+        "stages": stage_report(before, after),
+        "server_errors": counter_deltas(before, after, "starbot_errors_total", "type"),
+        "prompt_tokens": counter_deltas(before, after, "starbot_llm_prompt_tokens_total", "cache"),
+    }
+
+def start_process(command: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    # App logs go to stdout; set BENCH_VERBOSE=1 to see them
+    stdout = None if os.getenv("BENCH_VERBOSE") else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=stdout)
+
+def fake_command(args) -> List[str]:
+    command = [sys.executable, "-m", "benchmarks.fake_deepseek", "--port", str(args.fake_port)]
+    for name in ("latency_ms", "jitter_ms", "tokens_per_sec", "completion_tokens", "error_rate",
+                 "rate_limit_rate", "hang_rate", "hang_seconds", "seed"):
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    return command
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=sorted(APP_MODULES), default="api", help="app to start under uvicorn")
+    parser.add_argument("--target", help="URL of an already running app; skips starting one (and the fake server)")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--cache-bust", action="store_true", help="make every question unique to bypass the response cache")
+    fake_deepseek.add_arguments(parser)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    processes = []
+    try:
+        if args.target:
+            target = args.target
+        else:
+            env = dict(os.environ)
+            env["DEEPSEEK_API_URL"] = f"http://127.0.0.1:{args.fake_port}/v1/chat/completions"
+            env["DEEPSEEK_API_KEY"] = "fake-key"
+            processes.append(start_process(fake_command(args), env))
+            processes.append(start_process(
+                [sys.executable, "-m", "uvicorn", APP_MODULES[args.app], "--port", str(args.port), "--log-level", "warning"],
+                env,
+            ))
+            target = f"http://127.0.0.1:{args.port}"
+
+        report = asyncio.run(run_load(args, target, questions))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    client = report["client"]
+    print(f"Throughput: {client['throughput_rps']} req/s | error rate {client['error_rate']:.2%}")
+    print(f"Latency: p50 {client['p50_ms']} ms, p95 {client['p95_ms']} ms, p99 {client['p99_ms']} ms")
+    print(f"Outcomes: {report['outcomes']} | response types: {report['response_types']}")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:14} n={stats['count']:<6} mean {stats['mean_ms']:>9} ms  p95 {stats['p95_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms")
+    prompt_tokens = report["prompt_tokens"]
+    if prompt_tokens.get("hit") or prompt_tokens.get("miss"):
+        hit_ratio = prompt_tokens.get("hit", 0) / (prompt_tokens.get("hit", 0) + prompt_tokens.get("miss", 0))
+        print(f"Prompt tokens: {prompt_tokens} | prefix cache hit ratio {hit_ratio:.1%}")
+    if report["server_errors"]:
+        print(f"Server errors by type: {report['server_errors']}")
+
+    report["config"] = {
+        key: getattr(args, key) for key in (
+            "app", "target", "rps", "duration", "cache_bust", "latency_ms", "jitter_ms",
+            "tokens_per_sec", "completion_tokens", "error_rate", "rate_limit_rate", "hang_rate",
+        )
+    }
+    report["config"]["questions"] = str(args.questions)
+    save_results(f"load_test-{args.app if not args.target else 'external'}", report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Metadata-filtered retrieval: filters evaluated in the index versus over-fetching.
+
+Builds a synthetic corpus of --chunks chunks with file/web metadata (200 file names,
+40 pages each, 5 domains), then for filters from selective to broad measures:
+
+    filter      time to find the chunks passing the filter: a scan of the metadata
+                dicts (matches()), CorpusStore's bitmaps and a corpus pack's value
+                indexes (first query, then with the bitmaps cached)
+    api         retrieve_relevant_chunks(where=...) scoring only those chunks, versus
+                scoring everything, keeping every result and filtering afterwards
+    pack        keyword_search(where=...) over the pack, versus the same over-fetch
+    chroma      VectorStore.search(where=...) over a temporary index, versus no
+                filter (skipped without langchain_chroma and the embedding model)
+
+    python -m benchmarks.metadata_filter --chunks 50000 --max-questions 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Keep per-request log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import api.index as index
+from app.services.keyword_search import keyword_search
+from app.utils.corpus_pack import CorpusPack, write_pack
+from app.utils.metadata_filter import FILTER_KEYS, compile_where, matches, url_domain
+from benchmarks.common import save_results, summarize, synthetic_corpus
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+DOMAINS = ["starcollege.co.za", "horizon.org.za", "news.example.com", "sport.example.com", "kzn.gov.za"]
+
+FILTERS = {
+    "one file (0.4%)": {"filename": "report-17.pdf"},
+    "file pages 0-9 (5%)": {"filename": {"$in": [f"report-{i}.pdf" for i in range(20)]}, "page": {"$lt": 10}},
+    "domain or docx (~20%)": {"$or": [{"domain": "starcollege.co.za"}, {"file_type": "docx"}]},
+    "pages 10-29 (~40%)": {"page": {"$gte": 10, "$lte": 29}},
+    "files (80%)": {"source_type": "file"},
+}
+
+def assign_metadata(items: List[Dict[str, Any]], seed: int = 1) -> None:
+    """80% PDF/DOCX pages over 200 files, 20% web pages over 5 domains."""
+    rng = random.Random(seed)
+    for item in items:
+        metadata = item["metadata"]
+        if rng.random() < 0.8:
+            metadata.update(source_type="file", file_type="docx" if rng.random() < 0.1 else "pdf",
+                            filename=f"report-{rng.randrange(200)}.pdf", page=rng.randrange(40))
+        else:
+            url = f"https://www.{rng.choice(DOMAINS)}/page-{rng.randrange(500)}"
+            metadata.update(source_type="web", url=url, domain=url_domain(url))
+
+def timed(run: Callable[[], Any], repeat: int = 1) -> float:
+    """Mean milliseconds per call."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return round((time.perf_counter() - started) / repeat * 1000, 3)
+
+def time_questions(search: Callable[[str], Any], questions: List[str]) -> Dict[str, float]:
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        search(question)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+def over_fetch(results: List[Dict[str, Any]], where: Dict[str, Any], k: int = 5) -> List[Dict[str, Any]]:
+    return [result for result in results if matches(where, result.get("metadata", {}))][:k]
+
+def chroma_search(items: List[Dict[str, Any]], folder: str):
+    from app.services.vector_store import VectorStore
+
+    store = VectorStore()
+    store.index_folder = Path(folder)
+    store.vector_store = None
+    store.add_documents(items)
+    if store.vector_store is None:
+        raise RuntimeError("could not build a Chroma index")
+    return store.search
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000, help="Corpus size")
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--max-questions", type=int, default=10, help="Questions per filter and mode")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)[:args.max_questions]
+    items = synthetic_corpus(args.chunks)
+    assign_metadata(items)
+    snapshot = index.build_snapshot(items=items)
+    store = snapshot.items
+
+    results: Dict[str, Any] = {"chunks": args.chunks, "questions": len(questions), "filters": {}}
+    with tempfile.TemporaryDirectory() as folder:
+        write_pack(os.path.join(folder, "corpus.pack"), items, index_keys=FILTER_KEYS)
+        pack = CorpusPack(os.path.join(folder, "corpus.pack"))
+
+        search = None
+        try:
+            search = chroma_search(items, os.path.join(folder, "chroma"))
+        except Exception as e:
+            print(f"Skipping chroma: {e}")
+
+        unfiltered = {
+            "api": time_questions(lambda q: index.retrieve_relevant_chunks(q, snapshot=snapshot), questions),
+            "pack": time_questions(lambda q: keyword_search(q, pack, 5), questions),
+        }
+        if search:
+            unfiltered["chroma"] = time_questions(lambda q: search(q, 5), questions)
+        results["unfiltered"] = unfiltered
+        print(f"{args.chunks} chunks, {len(questions)} questions; unfiltered p50: api {unfiltered['api']['p50_ms']} ms, "
+              f"pack {unfiltered['pack']['p50_ms']} ms")
+        print(f"{'filter':22} {'chunks':>7} {'scan ms':>8} {'store ms':>9} {'pack ms':>8} {'cached':>7} "
+              f"{'api p50':>8} {'api post':>9} {'pack p50':>9} {'pack post':>10}")
+
+        for name, where in FILTERS.items():
+            compiled = compile_where(where)
+            passing = store.filter(where)
+            row = {
+                "where": compiled,
+                "chunks": len(passing),
+                "scan_ms": timed(lambda: [i for i, item in enumerate(items) if matches(compiled, item["metadata"])]),
+                "store_ms": timed(lambda: store.filter(where)),
+                "pack_first_ms": timed(lambda: pack.filter(where)),
+                "pack_cached_ms": timed(lambda: pack.filter(where), repeat=5),
+                "api": time_questions(lambda q: index.retrieve_relevant_chunks(q, snapshot=snapshot, where=where), questions),
+                # Without pushdown: keep every scored chunk, then filter
+                "api_post_filter": time_questions(lambda q: over_fetch(index.retrieve_relevant_chunks(
+                    q, max_results=len(store), snapshot=snapshot), compiled), questions),
+                "pack": time_questions(lambda q: keyword_search(q, pack, 5, where=where), questions),
+                "pack_post_filter": time_questions(lambda q: over_fetch(keyword_search(q, pack, len(pack)), compiled),
+                                                   questions),
+            }
+            if search:
+                row["chroma"] = time_questions(lambda q: search(q, 5, where=where), questions)
+            results["filters"][name] = row
+            print(f"{name:22} {row['chunks']:>7} {row['scan_ms']:>8} {row['store_ms']:>9} {row['pack_first_ms']:>8} "
+                  f"{row['pack_cached_ms']:>7} {row['api']['p50_ms']:>8} {row['api_post_filter']['p50_ms']:>9} "
+                  f"{row['pack']['p50_ms']:>9} {row['pack_post_filter']['p50_ms']:>10}")
+    save_results("metadata_filter", results)
+
+if __name__ == "__main__":
+    main()
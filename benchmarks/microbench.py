@@ -0,0 +1,128 @@
+"""
+Microbenchmarks for the hot functions in api/index.py.
+
+Times calculate_similarity_score (one query against one chunk),
+retrieve_relevant_chunks (one query against the whole corpus),
+enhance_response_formatting (one LLM answer), the intent router that serves greetings
+and quick answers (match, and match plus its pre-serialized body) and loading the
+processed JSON (build_snapshot from disk, and a bare json.load of the same file).
+--scale repeats the corpus to see how retrieval grows with the knowledge base.
+
+    python -m benchmarks.microbench --scale 4 --rounds 3
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+# Keep per-call log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import api.index as index
+from app.utils.intents import with_field
+from benchmarks.common import load_corpus_texts, save_results, summarize
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+def time_calls(function: Callable[..., Any], calls: Sequence[tuple], rounds: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    for _ in range(rounds):
+        for args in calls:
+            started = time.perf_counter()
+            function(*args)
+            latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+def corpus_items(scale: int) -> List[Dict[str, Any]]:
+    texts = load_corpus_texts()
+    source_types = ("file", "web", "sample")
+    items = []
+    for copy in range(scale):
+        for i, text in enumerate(texts):
+            items.append({
+                "text": text,
+                "metadata": {"source_type": source_types[i % 3], "source_file": f"bench_{copy}_{i % 7}.json"},
+            })
+    return items
+
+def llm_answers(texts: List[str]) -> List[str]:
+    """Answer-shaped inputs: prose paragraphs plus bulleted versions of the same sentences."""
+    answers = []
+    for text in texts:
+        sentences = [s.strip() for s in text[:800].split(".") if s.strip()]
+        answers.append("\n\n\n".join(sentences))
+        answers.append("**Key points:**\n" + "\n".join(f"- {s}" for s in sentences))
+    return answers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="repeat the corpus this many times")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    items = corpus_items(args.scale)
+    texts = [item["text"] for item in items]
+    print(f"{len(items)} chunks, {len(questions)} questions")
+
+    results: Dict[str, Any] = {"chunks": len(items), "questions": len(questions), "scale": args.scale}
+
+    pairs = [(question, text) for question in questions[:10] for text in texts[:200]]
+    results["calculate_similarity_score"] = time_calls(index.calculate_similarity_score, pairs, args.rounds)
+
+    index.knowledge_base.swap(index.build_snapshot(items=items))
+    results["retrieve_relevant_chunks"] = time_calls(
+        index.retrieve_relevant_chunks, [(question, 5, 0.1) for question in questions], args.rounds
+    )
+
+    answers = llm_answers(texts[:100])
+    results["enhance_response_formatting"] = time_calls(
+        index.enhance_response_formatting, [(answer,) for answer in answers], args.rounds
+    )
+
+    greetings = ["hi", "Hello there", "where is star college", "What were the matric results?"]
+    results["intent_match"] = time_calls(
+        index.intent_router.match, [(question,) for question in questions + greetings], args.rounds * 10
+    )
+
+    def intent_response(question):
+        intent = index.intent_router.match(question)
+        if intent is not None:
+            with_field(index.intent_router.payload(intent, "All Schools"), "session_id", "bench")
+
+    results["intent_response"] = time_calls(intent_response, [(question,) for question in greetings], args.rounds * 100)
+
+    # build_snapshot reads processed/*.json relative to the working directory
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_path = Path(temp_dir) / "processed" / "sample_data.json"
+        data_path.parent.mkdir()
+        with open(data_path, "w", encoding="utf-8") as f:
+            json.dump(items, f)
+        results["json_file_kb"] = round(data_path.stat().st_size / 1024, 1)
+
+        def load_from_disk():
+            index.build_snapshot()
+
+        def json_load():
+            with open(data_path, "r", encoding="utf-8") as f:
+                json.load(f)
+
+        os.chdir(temp_dir)
+        try:
+            results["load_processed_data"] = time_calls(load_from_disk, [()], args.rounds * 5)
+            results["json_load"] = time_calls(json_load, [()], args.rounds * 5)
+        finally:
+            os.chdir(original_cwd)
+
+    for name, value in results.items():
+        if isinstance(value, dict):
+            print(f"{name:28} n={value['count']:<6} mean {value['mean_ms']:>9} ms  p50 {value['p50_ms']:>9} ms  p99 {value['p99_ms']:>9} ms")
+
+    save_results(f"microbench-x{args.scale}", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Retrieval quality and speed regression harness. Offline, with no LLM calls.
+
+Runs every labeled question in benchmarks/retrieval_labels.jsonl through each retriever
+over the same corpus (processed/*.json, or the fallback from benchmarks.common):
+
+    heuristic  retrieve_relevant_chunks from api/index.py, with its lower-threshold retry
+    keyword    keyword_search used by app/routes/chat.py
+    chroma     VectorStore.search over a temporary Chroma index built from the corpus
+               (skipped when chromadb or the embedding model is unavailable)
+
+A retrieved chunk is relevant when it contains one of the question's "expected" phrases
+(case and whitespace insensitive), so labels survive re-chunking. Questions whose
+phrases match no chunk in the corpus are reported and left out of the scores.
+
+For each k it reports hit@k (at least one relevant chunk in the top k), recall@k
+(relevant chunks retrieved / relevant chunks in the corpus) and MRR@k. It also
+reports per-query latency.
+
+    python -m benchmarks.retrieval_eval --k 1 3 5 --retrievers heuristic keyword
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Keep per-query log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.common import load_corpus_documents, save_results, summarize
+
+DEFAULT_LABELS = Path(__file__).resolve().parent / "retrieval_labels.jsonl"
+
+Retriever = Callable[[str, int], List[Dict[str, Any]]]
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def load_labels(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def heuristic_retriever(documents: List[Dict[str, Any]]) -> Retriever:
+    import api.index as index
+
+    index.knowledge_base.swap(index.build_snapshot(items=documents))
+
+    def retrieve(question: str, k: int) -> List[Dict[str, Any]]:
+        # Same two-step search as generate_rag_response
+        chunks = index.retrieve_relevant_chunks(question, max_results=k, min_score=0.1)
+        if not chunks:
+            chunks = index.retrieve_relevant_chunks(question, max_results=min(k, 3), min_score=0.05)
+        return chunks
+
+    return retrieve
+
+def keyword_retriever(documents: List[Dict[str, Any]]) -> Retriever:
+    from app.services.keyword_search import keyword_search
+
+    return lambda question, k: keyword_search(question, documents, k)
+
+def chroma_retriever(documents: List[Dict[str, Any]], index_folder: Path) -> Retriever:
+    from app.services.vector_store import VectorStore
+
+    store = VectorStore()
+    # Build a throwaway index from the evaluation corpus instead of the app's index
+    store.index_folder = index_folder
+    store.vector_store = None
+    store.add_documents(documents)
+    if store.vector_store is None:
+        raise RuntimeError("could not build a Chroma index")
+    return store.search
+
+def evaluate(retrieve: Retriever, labels: List[Dict[str, Any]], relevant_counts: List[int],
+             ks: List[int]) -> Dict[str, Any]:
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    recall = {k: 0.0 for k in ks}
+    reciprocal_ranks = {k: 0.0 for k in ks}
+    latencies = []
+    per_question = []
+
+    for label, relevant_total in zip(labels, relevant_counts):
+        expected = [normalize(phrase) for phrase in label["expected"]]
+        started = time.perf_counter()
+        results = retrieve(label["question"], max_k)
+        latencies.append(time.perf_counter() - started)
+
+        relevant_ranks = [
+            rank for rank, result in enumerate(results[:max_k], start=1)
+            if any(phrase in normalize(result.get("text", "")) for phrase in expected)
+        ]
+        for k in ks:
+            within_k = [rank for rank in relevant_ranks if rank <= k]
+            if within_k:
+                hits[k] += 1
+                reciprocal_ranks[k] += 1.0 / within_k[0]
+            recall[k] += min(len(within_k), relevant_total) / relevant_total
+        per_question.append({"question": label["question"], "first_relevant_rank": relevant_ranks[0] if relevant_ranks else None})
+
+    n = len(labels)
+    report: Dict[str, Any] = {}
+    for k in ks:
+        report[f"hit@{k}"] = round(hits[k] / n, 4)
+        report[f"recall@{k}"] = round(recall[k] / n, 4)
+        report[f"mrr@{k}"] = round(reciprocal_ranks[k] / n, 4)
+    report["latency"] = summarize(latencies)
+    report["per_question"] = per_question
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", type=Path, default=DEFAULT_LABELS)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--retrievers", nargs="+", choices=["heuristic", "keyword", "chroma"],
+                        default=["heuristic", "keyword", "chroma"])
+    args = parser.parse_args()
+
+    documents = load_corpus_documents()
+    normalized_texts = [normalize(document["text"]) for document in documents]
+
+    labels, relevant_counts, unanswerable = [], [], []
+    for label in load_labels(args.labels):
+        expected = [normalize(phrase) for phrase in label["expected"]]
+        count = sum(1 for text in normalized_texts if any(phrase in text for phrase in expected))
+        if count:
+            labels.append(label)
+            relevant_counts.append(count)
+        else:
+            unanswerable.append(label["question"])
+
+    print(f"{len(documents)} chunks, {len(labels)} labeled questions")
+    if unanswerable:
+        print(f"No relevant chunk in this corpus for {len(unanswerable)} questions (skipped): {unanswerable}")
+
+    results: Dict[str, Any] = {
+        "chunks": len(documents),
+        "questions": len(labels),
+        "unanswerable": unanswerable,
+        "retrievers": {},
+    }
+
+    with tempfile.TemporaryDirectory() as chroma_folder:
+        builders = {
+            "heuristic": lambda: heuristic_retriever(documents),
+            "keyword": lambda: keyword_retriever(documents),
+            "chroma": lambda: chroma_retriever(documents, Path(chroma_folder)),
+        }
+        for name in args.retrievers:
+            try:
+                retrieve = builders[name]()
+            except (ImportError, RuntimeError) as e:
+                print(f"Skipping {name}: {e}")
+                continue
+            results["retrievers"][name] = evaluate(retrieve, labels, relevant_counts, args.k)
+
+    columns = [f"{metric}@{k}" for k in args.k for metric in ("hit", "recall", "mrr")]
+    print(f"{'retriever':10} " + " ".join(f"{column:>9}" for column in columns) + f" {'p50 ms':>9} {'p95 ms':>9}")
+    for name, report in results["retrievers"].items():
+        row = " ".join(f"{report[column]:>9.3f}" for column in columns)
+        print(f"{name:10} {row} {report['latency']['p50_ms']:>9.3f} {report['latency']['p95_ms']:>9.3f}")
+
+    save_results("retrieval_eval", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Retrieval with and without a selected school.
+
+Builds a synthetic corpus of --chunks chunks, gives --shared of them to the shared
+partition and spreads the rest evenly over the four schools (the local corpus has no
+school-specific documents to learn the split from), then times each question:
+
+    api    api/index.py retrieve_relevant_chunks over its CorpusStore
+    pack   app/services/keyword_search.py over a corpus pack partitioned by school
+
+once for all schools and once per school. "searched" is how many chunks a question
+scores: the whole corpus, or the school's partition plus the shared one.
+
+    python -m benchmarks.school_partitions --chunks 50000 --shared 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Keep per-request log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import api.index as index
+from app.services.keyword_search import filtered_chunks, keyword_search
+from app.utils.corpus_pack import CorpusPack, write_pack
+from app.utils.schools import SCHOOLS, SHARED, school_where
+from benchmarks.common import save_results, summarize, synthetic_corpus
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+def assign_schools(items: List[Dict[str, Any]], shared: float) -> None:
+    """Every 1/shared-th chunk shared, the others round-robin over the schools."""
+    every = round(1 / shared) if shared else 0
+    for i, item in enumerate(items):
+        if every and i % every == 0:
+            item["metadata"]["school"] = SHARED
+        else:
+            item["metadata"]["school"] = SCHOOLS[i % len(SCHOOLS)]
+
+def time_questions(search: Callable[[str], Any], questions: List[str], rounds: int) -> Dict[str, float]:
+    latencies = []
+    for _ in range(rounds):
+        for question in questions:
+            started = time.perf_counter()
+            search(question)
+            latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000, help="Corpus size")
+    parser.add_argument("--shared", type=float, default=0.2, help="Fraction of chunks in the shared partition")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    items = synthetic_corpus(args.chunks)
+    assign_schools(items, args.shared)
+    snapshot = index.build_snapshot(items=items)
+
+    results = {"chunks": args.chunks, "shared": args.shared, "runs": []}
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "corpus.pack")
+        write_pack(path, items, index_keys=("school",))
+        pack = CorpusPack(path)
+
+        print(f"{args.chunks} chunks, {args.shared:.0%} shared, {len(questions)} questions")
+        print(f"{'school':12} {'searched':>9} {'api p50 ms':>11} {'api p95 ms':>11} {'pack p50 ms':>12} {'pack p95 ms':>12}")
+        for school in (None,) + SCHOOLS:
+            allowed = filtered_chunks(pack, school_where(school))
+            api = time_questions(lambda q: index.retrieve_relevant_chunks(q, snapshot=snapshot, school=school),
+                                 questions, args.rounds)
+            packed = time_questions(lambda q: keyword_search(q, pack, 5, school=school), questions, args.rounds)
+            row = {"school": school or "all", "searched": len(pack) if allowed is None else len(allowed),
+                   "api": api, "pack": packed}
+            results["runs"].append(row)
+            print(f"{row['school']:12} {row['searched']:>9} {api['p50_ms']:>11} {api['p95_ms']:>11} "
+                  f"{packed['p50_ms']:>12} {packed['p95_ms']:>12}")
+    save_results("school_partitions", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Chat response payload size and serialization time, before and after the slim schema.
+
+Generates real /chat responses for the benchmark questions through api/index.py's
+pipeline (against benchmarks/fake_deepseek.py, started in process with no latency),
+then serializes each one three ways:
+
+    fastapi_verbose  what /chat used to do: jsonable_encoder + JSONResponse, full metadata
+    orjson_verbose   ORJSONResponse with the full object (?debug=1)
+    orjson_slim      ORJSONResponse with the default slim schema
+
+and reports body size and per-response serialization time.
+
+    python -m benchmarks.serialization --rounds 200
+"""
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Keep per-request log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks import fake_deepseek
+from benchmarks.common import save_results, serve_in_thread, summarize
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+def time_serializer(serialize: Callable[[Dict[str, Any]], bytes], responses: List[Dict[str, Any]],
+                    rounds: int) -> Dict[str, Any]:
+    latencies = []
+    for _ in range(rounds):
+        for response in responses:
+            started = time.perf_counter()
+            serialize(response)
+            latencies.append(time.perf_counter() - started)
+    sizes = [len(serialize(response)) for response in responses]
+    return {"mean_bytes": round(sum(sizes) / len(sizes)), "max_bytes": max(sizes), "time": summarize(latencies)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    fake = fake_deepseek.create_app(fake_deepseek.FakeConfig(latency_ms=0, jitter_ms=0))
+    os.environ["DEEPSEEK_API_URL"] = serve_in_thread(fake) + "/v1/chat/completions"
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    import api.index as index
+
+    async def generate(questions: List[str]) -> List[Dict[str, Any]]:
+        index.load_processed_data()
+        responses = []
+        for question in questions:
+            key = index.request_key(question, "")
+            response = await index.generate_rag_response(question, "", key)
+            if response.get("metadata", {}).get("rag_pipeline"):
+                responses.append(dict(response, session_id="0" * 32))
+        return responses
+
+    responses = asyncio.run(generate(load_questions(args.questions)))
+    if not responses:
+        raise SystemExit("No RAG responses were generated")
+    print(f"{len(responses)} RAG responses ({index.FastJSONResponse.__name__} available)")
+
+    serializers = {
+        "fastapi_verbose": lambda response: JSONResponse(jsonable_encoder(response)).body,
+        "orjson_verbose": lambda response: index.chat_response(response, verbose=True).body,
+        "orjson_slim": lambda response: index.chat_response(response, verbose=False).body,
+    }
+    results: Dict[str, Any] = {"responses": len(responses)}
+    for name, serialize in serializers.items():
+        results[name] = time_serializer(serialize, responses, args.rounds)
+
+    baseline = results["fastapi_verbose"]
+    for name in serializers:
+        report = results[name]
+        print(f"{name:16} {report['mean_bytes']:>7} B ({report['mean_bytes'] / baseline['mean_bytes']:>5.0%})  "
+              f"p50 {report['time']['p50_ms']:>7.3f} ms  p99 {report['time']['p99_ms']:>7.3f} ms")
+
+    save_results("serialization", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Bytes served and time to first byte for the web interface, before and after caching.
+
+Serves index.html from two apps under uvicorn in process: "baseline" reads the file on
+every request and sends it uncompressed (the old / route), "cached" is api/index.py's
+/ route (in memory, gzip/brotli, ETag). Each is requested as a first visit without
+compression, with gzip, with brotli (when installed), and as a revisit that sends
+If-None-Match. A fingerprinted image from /images is also requested through app/main.py's
+FingerprintedStaticFiles to check its Cache-Control.
+
+    python -m benchmarks.static_serving --requests 200
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, Optional
+
+# Keep per-request log lines out of the timings
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+
+from app.utils.static_assets import FingerprintedStaticFiles, file_fingerprint, fingerprinted_name
+from benchmarks.common import ROOT_DIR, save_results, serve_in_thread, summarize
+
+def baseline_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/", response_class=HTMLResponse)
+    async def root():
+        with open(ROOT_DIR / "index.html", "r", encoding="utf-8") as f:
+            return HTMLResponse(content=f.read())
+
+    return app
+
+def measure(client: httpx.Client, url: str, headers: Dict[str, str], requests: int) -> Dict[str, Any]:
+    ttfb, total = [], []
+    wire_bytes = status = 0
+    response_headers: Dict[str, str] = {}
+    for _ in range(requests):
+        started = time.perf_counter()
+        with client.stream("GET", url, headers=headers) as response:
+            first = None
+            wire_bytes = 0
+            for chunk in response.iter_raw():
+                if first is None:
+                    first = time.perf_counter()
+                wire_bytes += len(chunk)
+            finished = time.perf_counter()
+            status = response.status_code
+            response_headers = dict(response.headers)
+        ttfb.append((first or finished) - started)
+        total.append(finished - started)
+    return {
+        "status": status,
+        "wire_bytes": wire_bytes,
+        "content_encoding": response_headers.get("content-encoding", "identity"),
+        "cache_control": response_headers.get("cache-control", ""),
+        "ttfb": summarize(ttfb),
+        "total": summarize(total),
+    }
+
+def run_scenarios(base_url: str, requests: int) -> Dict[str, Any]:
+    scenarios = {"identity": {"Accept-Encoding": "identity"}, "gzip": {"Accept-Encoding": "gzip"},
+                 "br": {"Accept-Encoding": "gzip, br"}}
+    results = {}
+    with httpx.Client() as client:
+        for name, headers in scenarios.items():
+            results[name] = measure(client, base_url + "/", headers, requests)
+        etag: Optional[str] = client.get(base_url + "/", headers=scenarios["br"]).headers.get("etag")
+        if etag:
+            results["revisit"] = measure(client, base_url + "/", dict(scenarios["br"], **{"If-None-Match": etag}), requests)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    import api.index as index
+
+    results: Dict[str, Any] = {
+        "baseline": run_scenarios(serve_in_thread(baseline_app()), args.requests),
+        "cached": run_scenarios(serve_in_thread(index.app), args.requests),
+    }
+
+    print(f"{'app':9} {'scenario':9} {'status':>6} {'encoding':>9} {'bytes':>7} {'ttfb p50':>9} {'ttfb p95':>9}")
+    for app_name, scenarios in results.items():
+        for name, report in scenarios.items():
+            print(f"{app_name:9} {name:9} {report['status']:>6} {report['content_encoding']:>9} {report['wire_bytes']:>7} "
+                  f"{report['ttfb']['p50_ms']:>8.3f}ms {report['ttfb']['p95_ms']:>8.3f}ms")
+
+    # Fingerprinted static file, as app/main.py mounts /images
+    images = FastAPI()
+    images.mount("/images", FingerprintedStaticFiles(directory=ROOT_DIR / "images"), name="images")
+    image = next(name for name in sorted(os.listdir(ROOT_DIR / "images")) if name.endswith(".png"))
+    url = f"{serve_in_thread(images)}/images/{fingerprinted_name(image, file_fingerprint(str(ROOT_DIR / 'images' / image)))}"
+    with httpx.Client() as client:
+        results["fingerprinted_image"] = measure(client, url, {}, min(args.requests, 50))
+    print(f"fingerprinted image: {results['fingerprinted_image']['status']} "
+          f"Cache-Control: {results['fingerprinted_image']['cache_control']}")
+
+    save_results("static_serving", results)
+
+if __name__ == "__main__":
+    main()
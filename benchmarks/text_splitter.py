@@ -0,0 +1,95 @@
+"""
+Golden check and benchmark for OffsetTextSplitter against LangChain's RecursiveCharacterTextSplitter.
+
+Every text in the corpus (processed JSON chunks, star_college_info.txt, the pages of the
+PDFs in data/uploads and a concatenation of all of them, to mimic a large crawl) must
+split into identical chunks. Exits with status 1 on the first mismatch, otherwise
+reports throughput and peak traced memory for both splitters.
+
+    python -m benchmarks.text_splitter --rounds 5
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.config import CHUNK_OVERLAP, CHUNK_SIZE
+from app.utils.text_splitter import OffsetTextSplitter
+from benchmarks.common import ROOT_DIR, load_corpus_texts, save_results
+
+def golden_texts() -> List[str]:
+    texts = load_corpus_texts()
+    with open(ROOT_DIR / "star_college_info.txt", "r", encoding="utf-8") as f:
+        texts.append(f.read())
+
+    try:
+        import fitz
+
+        for pdf_path in sorted((ROOT_DIR / "data" / "uploads").glob("*.pdf")):
+            with fitz.open(str(pdf_path)) as pdf:
+                texts.extend(page.get_text() for page in pdf)
+    except ImportError:
+        print("PyMuPDF not installed, skipping PDF pages")
+
+    texts.append("\n\n".join(texts))
+    return texts
+
+def measure(split: Callable[[str], List[str]], texts: List[str], rounds: int) -> Dict[str, float]:
+    total_chars = sum(len(text) for text in texts)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            split(text)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for text in texts:
+        split(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "mb_per_sec": round(total_chars * rounds / elapsed / 1_000_000, 3),
+        "seconds": round(elapsed, 4),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    langchain_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, length_function=len
+    )
+    offset_splitter = OffsetTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    texts = golden_texts()
+    print(f"Checking {len(texts)} texts ({sum(map(len, texts)):,} chars)...")
+    for i, text in enumerate(texts):
+        expected = langchain_splitter.split_text(text)
+        offsets = offset_splitter.split_offsets(text)
+        actual = [text[start:end] for start, end in offsets]
+        if actual != expected:
+            print(f"Mismatch in text {i}: {len(expected)} LangChain chunks vs {len(actual)}")
+            sys.exit(1)
+    print("All chunk boundaries match")
+
+    results = {
+        "texts": len(texts),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "langchain": measure(langchain_splitter.split_text, texts, args.rounds),
+        "offset": measure(offset_splitter.split_text, texts, args.rounds),
+    }
+    for name in ("langchain", "offset"):
+        print(f"{name}: {results[name]}")
+
+    save_results("text_splitter", results)
+
+if __name__ == "__main__":
+    main()
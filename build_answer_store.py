@@ -0,0 +1,145 @@
+"""
+Answer the most frequent questions ahead of time (processed/answer_store.json).
+
+Mines questions from sampled request logs (JSON log lines with "Chat question", see
+LOG_SAMPLE_RATE), the feedback log and plain question lists, groups variations that
+share the same content words, and runs the full RAG pipeline of api/index.py (real
+DeepSeek calls) for the --top most frequent groups in each school. Questions the intent
+router already answers are skipped, as are questions whose answers were mostly rated
+not helpful. The output records the knowledge base fingerprint, so the server stops
+serving it as soon as the knowledge base changes; rebuild after reprocessing data.
+
+    python build_answer_store.py --logs logs/app.jsonl --questions benchmarks/questions.txt --top 200
+"""
+import argparse
+import asyncio
+import datetime
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.utils.answer_store import STORE_VERSION, normalize_school, question_key
+from app.utils.feedback import create_feedback_sink
+
+def questions_from_logs(paths: List[str]) -> List[Tuple[str, str]]:
+    """(question, school) from "Chat question" lines, joined to their request's school by request ID."""
+    questions, schools = {}, {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                request_id = entry.get("request_id") or id(entry)
+                if entry.get("message") == "Chat question" and entry.get("question"):
+                    questions[request_id] = entry["question"]
+                elif entry.get("message") == "Chat request":
+                    schools[request_id] = entry.get("school", "")
+    return [(question, schools.get(request_id, "")) for request_id, question in questions.items()]
+
+def questions_from_feedback(store: str, path: str) -> Tuple[List[Tuple[str, str]], Dict[str, Counter]]:
+    """Rated questions, and helpful/not-helpful votes per question key."""
+    sink = create_feedback_sink(store, path, "off")
+    try:
+        records = list(sink.read())
+    finally:
+        sink.close()
+    votes: Dict[str, Counter] = defaultdict(Counter)
+    for record in records:
+        votes[question_key(record.get("question", ""))][record.get("feedback")] += 1
+    return [(record["question"], "") for record in records if record.get("question")], votes
+
+def questions_from_lists(paths: List[str]) -> List[Tuple[str, str]]:
+    questions = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            questions.extend((line.strip(), "") for line in f if line.strip() and not line.startswith("#"))
+    return questions
+
+async def answer_all(index, selected: List[Tuple[str, str]], concurrency: int) -> List[Dict]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(question: str, school: str):
+        async with semaphore:
+            school_value = "" if school == "all" else school
+            response = await index.generate_rag_response(question, school_value, index.request_key(question, school_value))
+        metadata = response.get("metadata", {})
+        if metadata.get("error") or not metadata.get("rag_pipeline"):
+            print(f"  Skipping {question!r} ({school}): {metadata.get('error') or 'no RAG answer'}")
+            return None
+        return {
+            "question": question,
+            "school": school,
+            "answer": response["answer"],
+            "sources": response.get("sources", []),
+            # Serving it spends no tokens, so only the model is kept
+            "metadata": {key: metadata[key] for key in ("model_used",) if key in metadata},
+        }
+
+    results = await asyncio.gather(*(answer(question, school) for question, school in selected))
+    return [entry for entry in results if entry is not None]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", nargs="*", default=[], help="JSON log files with sampled questions")
+    parser.add_argument("--questions", nargs="*", default=[], help="Plain question lists, one per line")
+    parser.add_argument("--no-feedback", action="store_true", help="Do not mine the feedback log")
+    parser.add_argument("--top", type=int, default=200, help="Questions to answer per school")
+    parser.add_argument("--min-count", type=int, default=2, help="Times a question must have been asked")
+    parser.add_argument("--concurrency", type=int, default=4, help="DeepSeek calls in flight")
+    parser.add_argument("--output", default="processed/answer_store.json")
+    args = parser.parse_args()
+
+    # Imported here: it reads DEEPSEEK_API_KEY and the knowledge base the server will load
+    import api.index as index
+    from app.config import FEEDBACK_PATH, FEEDBACK_STORE
+
+    asked = questions_from_logs(args.logs) + questions_from_lists(args.questions)
+    votes: Dict[str, Counter] = {}
+    if not args.no_feedback:
+        rated, votes = questions_from_feedback(FEEDBACK_STORE, str(FEEDBACK_PATH))
+        asked += rated
+
+    # Group variations by content words per school; the most common wording is answered
+    counts: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+    for question, school in asked:
+        key = question_key(question)
+        if key and index.intent_router.match(question) is None:
+            counts[(normalize_school(school), key)][question] += 1
+
+    by_school: Dict[str, List[Tuple[int, str, str]]] = defaultdict(list)
+    for (school, key), wordings in counts.items():
+        total = sum(wordings.values())
+        rating = votes.get(key, Counter())
+        if total < args.min_count or rating["not-helpful"] > rating["helpful"]:
+            continue
+        by_school[school].append((total, key, wordings.most_common(1)[0][0]))
+    selected = [
+        (question, school)
+        for school, groups in sorted(by_school.items())
+        for _, _, question in sorted(groups, key=lambda group: (-group[0], group[1]))[:args.top]
+    ]
+    print(f"{len(asked)} questions asked, {len(selected)} frequent questions to answer")
+
+    snapshot = index.knowledge_base.current
+    entries = asyncio.run(answer_all(index, selected, args.concurrency))
+
+    generated_at = datetime.datetime.now(datetime.timezone.utc)
+    table = {
+        "format": STORE_VERSION,
+        "version": generated_at.strftime("%Y%m%dT%H%M%SZ"),
+        "generated_at": generated_at.isoformat(),
+        "kb_fingerprint": snapshot.extras["corpus_version"],
+        "entries": entries,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_suffix(".tmp")
+    temporary.write_text(json.dumps(table, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+    temporary.replace(output)
+    print(f"Wrote {len(entries)} answers (knowledge base {snapshot.extras['corpus_version']}, version {table['version']}) to {output}")
+
+if __name__ == "__main__":
+    main()
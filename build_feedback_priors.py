@@ -0,0 +1,70 @@
+"""
+Aggregate the feedback log into retrieval priors (processed/feedback_priors.json).
+
+Counts helpful/not-helpful ratings per cited chunk (metadata chunk_id) and per source
+(URL, file name or title) and turns each into a multiplicative boost around 1.0, smoothed
+toward neutral with --prior-votes. api/index.py loads the table at startup and
+multiplies it into retrieve_relevant_chunks' scores. Run it after compacting the log:
+
+    python feedback_tool.py compact
+    python build_feedback_priors.py
+"""
+import argparse
+import datetime
+import json
+import time
+from pathlib import Path
+
+from app.config import FEEDBACK_PATH, FEEDBACK_STORE
+from app.utils.feedback import chunk_key, count_by_source, create_feedback_sink
+from app.utils.feedback_priors import PRIORS_VERSION, prior_boost
+
+def boosts(counts, min_votes: int, prior_votes: float, strength: float):
+    table = {}
+    for key, (helpful, not_helpful) in sorted(counts.items()):
+        if helpful + not_helpful < min_votes:
+            continue
+        boost = round(prior_boost(helpful, not_helpful, prior_votes, strength), 3)
+        # Neutral entries would only cost lookups
+        if boost != 1.0:
+            table[key] = boost
+    return table
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=FEEDBACK_STORE, choices=["jsonl", "sqlite"])
+    parser.add_argument("--path", default=str(FEEDBACK_PATH), help="Feedback log")
+    parser.add_argument("--output", default="processed/feedback_priors.json")
+    parser.add_argument("--max-age-days", type=float, default=0, help="Only use recent ratings (0 uses all)")
+    parser.add_argument("--min-votes", type=int, default=2, help="Ratings needed before a chunk or source gets a prior")
+    parser.add_argument("--prior-votes", type=float, default=4.0, help="Neutral votes added before the real ones")
+    parser.add_argument("--chunk-strength", type=float, default=0.2, help="Largest chunk boost or penalty")
+    parser.add_argument("--source-strength", type=float, default=0.1, help="Largest source boost or penalty")
+    args = parser.parse_args()
+
+    sink = create_feedback_sink(args.store, args.path, "off")
+    try:
+        records = list(sink.read())
+    finally:
+        sink.close()
+    if args.max_age_days:
+        cutoff = time.time() - args.max_age_days * 86400
+        records = [record for record in records if record.get("timestamp", 0) >= cutoff]
+
+    table = {
+        "version": PRIORS_VERSION,
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "ratings": len(records),
+        "chunks": boosts(count_by_source(records, key=chunk_key), args.min_votes, args.prior_votes, args.chunk_strength),
+        "sources": boosts(count_by_source(records), args.min_votes, args.prior_votes, args.source_strength),
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_suffix(".tmp")
+    temporary.write_text(json.dumps(table, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+    temporary.replace(output)
+    print(f"{len(records)} ratings -> {len(table['chunks'])} chunk and {len(table['sources'])} source priors in {output}")
+
+if __name__ == "__main__":
+    main()
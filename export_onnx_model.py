@@ -0,0 +1,76 @@
+"""
+Export the embedding model (EMBEDDING_MODEL) to ONNX for the onnxruntime backend.
+Run this once, then set EMBEDDING_BACKEND=onnx (and optionally ONNX_QUANTIZED=True).
+Exporting needs optimum and torch; serving the exported model only needs onnxruntime and tokenizers.
+"""
+import argparse
+import shutil
+from pathlib import Path
+
+from app.config import EMBEDDING_MODEL, ONNX_MODEL_FOLDER
+from app.services.onnx_embedding import MODEL_FILE, QUANTIZED_MODEL_FILE
+
+# sentence-transformers files that describe pooling and normalization
+SENTENCE_TRANSFORMERS_FILES = ["modules.json", "sentence_bert_config.json", "1_Pooling/config.json"]
+
+def resolve_model_id(model_name: str) -> str:
+    """Short names like all-MiniLM-L6-v2 live under the sentence-transformers org."""
+    if "/" not in model_name and not Path(model_name).exists():
+        return f"sentence-transformers/{model_name}"
+    return model_name
+
+def export_model(model_id: str, output_dir: Path) -> None:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+
+    print(f"Exporting {model_id} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(output_dir)
+
+    # Saving a fast tokenizer writes tokenizer.json, which is all the runtime needs
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    tokenizer.save_pretrained(output_dir)
+
+def copy_sentence_transformers_config(model_id: str, output_dir: Path) -> None:
+    from huggingface_hub import snapshot_download
+
+    snapshot_dir = Path(snapshot_download(model_id, allow_patterns=SENTENCE_TRANSFORMERS_FILES))
+    for relative_path in SENTENCE_TRANSFORMERS_FILES:
+        source = snapshot_dir / relative_path
+        if source.exists():
+            target = output_dir / relative_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, target)
+        else:
+            print(f"  {relative_path} not found, defaults will be used")
+
+def quantize_model(output_dir: Path) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print("Quantizing weights to int8...")
+    quantize_dynamic(
+        model_input=str(output_dir / MODEL_FILE),
+        model_output=str(output_dir / QUANTIZED_MODEL_FILE),
+        weight_type=QuantType.QInt8,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Model name or path")
+    parser.add_argument("--output", default=str(ONNX_MODEL_FOLDER), help="Output folder")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 variant")
+    args = parser.parse_args()
+
+    model_id = resolve_model_id(args.model)
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    export_model(model_id, output_dir)
+    copy_sentence_transformers_config(model_id, output_dir)
+    if not args.no_quantize:
+        quantize_model(output_dir)
+
+    print(f"ONNX model saved to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Compact, export and summarize the feedback log (FEEDBACK_STORE / FEEDBACK_PATH).
+
+    python feedback_tool.py compact [--max-age-days 365] [--import-legacy feedback]
+    python feedback_tool.py export --format csv --output feedback.csv
+    python feedback_tool.py counts --output processed/feedback_counts.json
+    python feedback_tool.py stats
+
+compact drops unreadable lines and invalid ratings, keeps only the latest rating of an
+answer within a session (the buttons can be toggled), optionally drops old records and
+imports the per-request feedback/feedback_*.json files the app used to write, then
+rewrites the log. A JSONL log is replaced atomically, holding the lock the app's appends
+take, and a running app reopens it on its next write.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from app.config import FEEDBACK_PATH, FEEDBACK_STORE
+from app.utils.feedback import (
+    FEEDBACK_VALUES, JsonlFeedbackSink, SqliteFeedbackSink, count_by_source, create_feedback_sink, jsonl_lock,
+    source_key
+)
+
+def load_legacy(folder: Path) -> List[Dict[str, Any]]:
+    """Records from the old one-file-per-submission feedback folder."""
+    records = []
+    for path in sorted(folder.glob("feedback_*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            timestamp = datetime.datetime.strptime(legacy["timestamp"], "%Y%m%d_%H%M%S").timestamp()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  Skipping {path}: {e}")
+            continue
+        records.append({
+            "timestamp": timestamp,
+            "feedback": legacy.get("feedback", ""),
+            "question": legacy.get("question", ""),
+            "answer": legacy.get("answer", ""),
+            "session_id": None,
+            "sources": [{"metadata": source.get("metadata") or {}} for source in legacy.get("sources") or []],
+        })
+    return records
+
+def compact_records(records: List[Dict[str, Any]], max_age_days: float = 0) -> List[Dict[str, Any]]:
+    cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for position, record in enumerate(sorted(records, key=lambda record: record.get("timestamp", 0))):
+        if record.get("feedback") not in FEEDBACK_VALUES:
+            continue
+        if cutoff is not None and record.get("timestamp", 0) < cutoff:
+            continue
+        # Without a session ID two identical ratings may be different users, so keep both
+        session_id = record.get("session_id")
+        key = (session_id, record.get("question"), record.get("answer")) if session_id else position
+        latest[key] = record
+    return sorted(latest.values(), key=lambda record: record["timestamp"])
+
+def read_jsonl(sink: JsonlFeedbackSink) -> Tuple[List[Dict[str, Any]], int]:
+    """The log's records and the size they were read at, with the app's appends held off."""
+    with jsonl_lock(sink.path):
+        read_size = os.path.getsize(sink.path) if os.path.exists(sink.path) else 0
+        return list(sink.read()), read_size
+
+def rewrite_jsonl(path: str, records: List[Dict[str, Any]], read_size: int) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix=".feedback-", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            # Keep anything the app appended while we were compacting; the lock holds off
+            # further appends until the new file is in place
+            with jsonl_lock(path):
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as original:
+                        original.seek(read_size)
+                        f.write(original.read())
+                f.flush()
+                os.fsync(f.fileno())
+                os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+def rewrite_sqlite(sink: SqliteFeedbackSink, records: List[Dict[str, Any]]) -> None:
+    with sink._lock:
+        connection = sink._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM feedback")
+            connection.executemany(
+                "INSERT INTO feedback (timestamp, feedback, question, answer, session_id, sources) VALUES (?, ?, ?, ?, ?, ?)",
+                [(record["timestamp"], record["feedback"], record["question"], record["answer"], record.get("session_id"),
+                  json.dumps(record.get("sources", []), ensure_ascii=False, separators=(",", ":"))) for record in records],
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("VACUUM")
+
+def compact(args, sink) -> None:
+    if isinstance(sink, JsonlFeedbackSink):
+        records, read_size = read_jsonl(sink)
+    else:
+        records, read_size = list(sink.read()), 0
+    before = len(records)
+    if args.import_legacy:
+        legacy = load_legacy(Path(args.import_legacy))
+        print(f"Importing {len(legacy)} legacy records from {args.import_legacy}")
+        records.extend(legacy)
+    compacted = compact_records(records, args.max_age_days)
+
+    if isinstance(sink, JsonlFeedbackSink):
+        rewrite_jsonl(args.path, compacted, read_size)
+    else:
+        rewrite_sqlite(sink, compacted)
+    print(f"Compacted {args.path}: {before} records -> {len(compacted)}")
+
+def export(args, sink) -> None:
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "jsonl":
+            for record in sink.read():
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            writer = csv.writer(output)
+            writer.writerow(["timestamp", "feedback", "question", "answer", "session_id", "sources"])
+            for record in sink.read():
+                sources = sorted({source_key(source) for source in record.get("sources", [])} - {None})
+                writer.writerow([
+                    datetime.datetime.fromtimestamp(record["timestamp"], datetime.timezone.utc).isoformat(),
+                    record["feedback"], record["question"], record["answer"], record.get("session_id") or "",
+                    "|".join(sources),
+                ])
+    finally:
+        if args.output:
+            output.close()
+
+def counts(args, sink) -> None:
+    by_source = {
+        key: {"helpful": helpful, "not_helpful": not_helpful}
+        for key, (helpful, not_helpful) in sorted(count_by_source(sink.read()).items())
+    }
+    text = json.dumps(by_source, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Wrote counts for {len(by_source)} sources to {args.output}")
+    else:
+        print(text)
+
+def stats(args, sink) -> None:
+    records = list(sink.read())
+    totals = {value: sum(1 for record in records if record.get("feedback") == value) for value in FEEDBACK_VALUES}
+    print(f"{len(records)} records in {args.path}: " + ", ".join(f"{value} {count}" for value, count in totals.items()))
+    by_source = count_by_source(records)
+    print(f"{len(by_source)} rated sources; most rated:")
+    for key, (helpful, not_helpful) in sorted(by_source.items(), key=lambda item: -sum(item[1]))[:args.top]:
+        print(f"  {helpful:>5} helpful {not_helpful:>5} not helpful  {key}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=FEEDBACK_STORE, choices=["jsonl", "sqlite"])
+    parser.add_argument("--path", default=str(FEEDBACK_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = commands.add_parser("compact", help="Deduplicate and rewrite the log")
+    compact_parser.add_argument("--max-age-days", type=float, default=0, help="Drop older records (0 keeps all)")
+    compact_parser.add_argument("--import-legacy", help="Folder of old feedback_*.json files to merge in")
+    export_parser = commands.add_parser("export", help="Write every record as JSONL or CSV")
+    export_parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    export_parser.add_argument("--output", help="File to write (default stdout)")
+    counts_parser = commands.add_parser("counts", help="Helpful/not-helpful counts per source as JSON")
+    counts_parser.add_argument("--output", help="File to write (default stdout)")
+    stats_parser = commands.add_parser("stats", help="Totals and the most rated sources")
+    stats_parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # "off": the tool never appends, and compaction syncs its own rewrite
+    sink = create_feedback_sink(args.store, args.path, "off")
+    try:
+        {"compact": compact, "export": export, "counts": counts, "stats": stats}[args.command](args, sink)
+    finally:
+        sink.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os
 import http.server
-import socketserver
 
 # Create directory structure if it doesn't exist
 os.makedirs("static/css", exist_ok=True)
@@ -18,10 +17,11 @@ class MyHttpRequestHandler(http.server.SimpleHTTPRequestHandler):
             self.path = '/chatbot_widget_demo.html'
         return http.server.SimpleHTTPRequestHandler.do_GET(self)
 
-# Set up the server
+# Set up the server; one thread per connection so a slow client doesn't block the others
 handler_object = MyHttpRequestHandler
 PORT = 8080
-my_server = socketserver.TCPServer(("0.0.0.0", PORT), handler_object)
+my_server = http.server.ThreadingHTTPServer(("0.0.0.0", PORT), handler_object)
+my_server.daemon_threads = True
 
 # Start the server
 print(f"Server started at http://localhost:{PORT}")
@@ -13,7 +13,7 @@ class StarCollegeChatbot {
         this.schoolSelect = document.getElementById('school-select');
         this.fileUpload = document.getElementById('file-upload');
         this.themeToggle = document.getElementById('theme-toggle');
-        this.conversationHistory = [];
+        this.sessionId = null; // Assigned by the server; history is kept there
         
         this.initEventListeners();
         this.initMarked();
@@ -100,7 +100,8 @@ class StarCollegeChatbot {
     }
     
     clearChat() {
-        // Keep only the welcome message
+        // Keep only the welcome message, and start a new conversation
+        this.sessionId = null;
         while (this.chatMessages.children.length > 1) {
             this.chatMessages.removeChild(this.chatMessages.lastChild);
         }
@@ -113,9 +114,6 @@ class StarCollegeChatbot {
         // Add user message
         this.addMessage(question, 'user');
         
-        // Add to conversation history
-        this.conversationHistory.push({ role: 'user', content: question });
-        
         // Clear input
         this.userInput.value = '';
         
@@ -137,7 +135,7 @@ class StarCollegeChatbot {
                 body: JSON.stringify({ 
                     question: question,
                     school: selectedSchool,
-                    history: this.conversationHistory
+                    session_id: this.sessionId
                 })
             });
             
@@ -146,11 +144,11 @@ class StarCollegeChatbot {
             
             if (response.ok) {
                 const data = await response.json();
+                if (data.session_id) {
+                    this.sessionId = data.session_id;
+                }
                 this.addMessage(data.answer, 'bot', true);
                 
-                // Add bot response to conversation history
-                this.conversationHistory.push({ role: 'bot', content: data.answer });
-                
                 // Add sources if available
                 if (data.sources && data.sources.length > 0) {
                     this.addSources(data.sources);
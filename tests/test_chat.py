@@ -0,0 +1,72 @@
+import dataclasses
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.index as index
+from app.utils.answer_store import AnswerStore, StoredAnswer
+from app.utils.knowledge_base import KnowledgeBase
+
+QUESTION = "When was Star College founded?"
+
+@pytest.fixture
+def client(monkeypatch):
+    snapshot = index.build_snapshot(items=[{"text": "Star College was founded in 1991.", "metadata": {}}])
+    store = AnswerStore([StoredAnswer(QUESTION, "all", "In 1991.", [], {})], snapshot.extras["corpus_version"], "s1")
+    snapshot = dataclasses.replace(snapshot, extras=dict(snapshot.extras, answer_store=store))
+    monkeypatch.setattr(index, "knowledge_base", KnowledgeBase(lambda initial: snapshot, lambda: [], 0))
+    monkeypatch.setattr(index, "DEEPSEEK_API_KEY", "test")
+    index.response_cache.clear()
+
+    async def generate(message, selected_school, cache_key, history_messages=(), snapshot=None):
+        return {"answer": f"generated with {len(history_messages)} history messages", "sources": [],
+                "metadata": {"response_type": "rag_response"}}
+
+    monkeypatch.setattr(index, "generate_rag_response", generate)
+    return TestClient(index.app)
+
+def test_first_question_is_answered_from_the_store(client):
+    body = client.post("/chat?debug=1", json={"message": QUESTION}).json()
+    assert body["answer"] == "In 1991."
+    assert body["metadata"]["response_type"] == "precomputed_answer"
+
+def test_follow_up_skips_the_store(client):
+    history = [{"role": "user", "content": "Tell me about the girls high school"},
+               {"role": "assistant", "content": "It is in Durban."}]
+    body = client.post("/chat", json={"message": QUESTION, "history": history}).json()
+    assert body["answer"] == "generated with 2 history messages"
+
+    session_id = client.post("/chat", json={"message": "Tell me about the primary school",
+                                            "session_id": "s-follow-up"}).json()["session_id"]
+    body = client.post("/chat", json={"message": QUESTION, "session_id": session_id}).json()
+    assert body["answer"].startswith("generated with")
+
+def test_cache_hit_does_not_modify_the_cached_response(client):
+    question = "What sports does the school offer?"
+    key = index.request_key(question, "", [], index.knowledge_base.current.version)
+    cached = {"answer": "Soccer and chess.", "sources": [], "metadata": {"response_type": "rag_response", "cached": False}}
+    index.response_cache[key] = (cached, index.time.time())
+
+    body = client.post("/chat?debug=1", json={"message": question}).json()
+    assert body["answer"] == "Soccer and chess." and body["metadata"]["cached"] is True
+    assert cached["metadata"]["cached"] is False
+
+def test_conversation_without_a_session_id_gets_one_and_keeps_its_history(client):
+    first = client.post("/chat", json={"question": "Tell me about the primary school"}).json()
+    assert first["session_id"] and first["answer"] == "generated with 0 history messages"
+
+    second = client.post("/chat", json={"question": "And its fees?", "session_id": first["session_id"]}).json()
+    assert second["session_id"] == first["session_id"]
+    assert second["answer"] == "generated with 2 history messages"
+
+@pytest.mark.parametrize("school", ["all", "All Star College Schools", ""])
+def test_every_all_schools_selection_gets_the_stored_answer(client, school):
+    body = client.post("/chat?debug=1", json={"message": QUESTION, "school": school}).json()
+    assert body["metadata"]["response_type"] == "precomputed_answer"
+
+def test_school_names_share_stored_answers_and_cache_keys():
+    store = AnswerStore([StoredAnswer("Where is the primary school?", "primary", "Westville.", [], {})], "kb")
+    assert store.match("Where is the primary school?", "Star College Durban Primary") is not None
+    assert store.match("Where is the primary school?", "boys-high") is None
+    assert index.request_key("Fees?", "All Star College Schools") == index.request_key("Fees?", "all")
+    assert index.request_key("Fees?", "Star College Durban Primary") == index.request_key("Fees?", "primary")
@@ -0,0 +1,74 @@
+import pytest
+
+from app.services.keyword_search import keyword_search
+from app.utils.corpus_pack import CorpusPack, ensure_pack, write_pack
+from app.utils.metadata_filter import FILTER_KEYS
+
+ITEMS = [
+    {"text": "The matric pass rate was 100% again this year.", "metadata": {"source_type": "file", "filename": "report.pdf", "page": 1}},
+    {"text": "Tuition fees are payable each term.", "metadata": {"source_type": "file", "filename": "fees.pdf", "page": 0}},
+    {"text": "Star College was founded in 1991 in Durban.", "metadata": {"source_type": "web", "url": "https://starcollege.co.za/about"}},
+    {"text": "Students pass through the main gate; the rate of arrivals peaks at 7am.", "metadata": {"source_type": "web"}},
+    {"text": "Distinction counts rose in 2022.", "metadata": {"source_type": "file", "filename": "report.pdf", "page": 2}},
+    {"text": "Contact the office by email or phone.", "metadata": {"source_type": "sample"}},
+    {"text": "Our pass rate is the best in the province.", "metadata": {"source_type": "sample"}},
+]
+
+@pytest.fixture
+def pack(tmp_path):
+    path = str(tmp_path / "corpus.pack")
+    write_pack(path, ITEMS, index_keys=FILTER_KEYS)
+    return CorpusPack(path)
+
+def test_pack_reads_back_chunks(pack):
+    assert len(pack) == len(ITEMS)
+    assert [pack[i] for i in range(len(pack))] == ITEMS
+    assert pack.lowered(0) == ITEMS[0]["text"].lower()
+
+def test_candidates_cover_phrases(pack):
+    # "pass rate" spans two tokens; chunk 3 has both words but not the phrase, which scoring sorts out
+    assert pack.candidates(["pass rate"]) == [0, 3, 6]
+    assert pack.candidates(["fee"]) == [1]
+
+@pytest.mark.parametrize("question", [
+    "What were the results?",
+    "result",  # expands to "pass rate", the only term chunk 6 has
+    "pass rate",
+    "How much are the fees?",
+    "When was it founded in 1991",
+    "results in 2022",
+    "fees 2022?",  # the term is "2022?"; chunk 4 only has "2022"
+    "nothing matches this",
+])
+def test_pack_and_list_return_the_same_top_k(pack, question):
+    assert keyword_search(question, pack, 3) == keyword_search(question, ITEMS, 3)
+
+def test_ensure_pack_rebuilds_when_sources_change(tmp_path):
+    source = tmp_path / "uploads_data.json"
+    source.write_text("[]")
+    path = str(tmp_path / "corpus.pack")
+    loads = []
+
+    def load():
+        loads.append(1)
+        return ITEMS[:len(loads) + 1]
+
+    first = ensure_pack(path, [str(source)], load)
+    assert len(first) == 2 and ensure_pack(path, [str(source)], load).version == first.version
+    source.write_text("[1]")
+    assert len(ensure_pack(path, [str(source)], load)) == 3
+    assert len(loads) == 2
+
+def test_stale_pack_is_closed_before_rebuilding(tmp_path, monkeypatch):
+    source = tmp_path / "uploads_data.json"
+    source.write_text("[]")
+    path = str(tmp_path / "corpus.pack")
+    ensure_pack(path, [str(source)], lambda: ITEMS[:2])
+
+    closed = []
+    close = CorpusPack.close
+    monkeypatch.setattr(CorpusPack, "close", lambda self: (closed.append(self), close(self)))
+    source.write_text("[1]")
+    assert len(ensure_pack(path, [str(source)], lambda: ITEMS)) == len(ITEMS)
+    # Once before taking the lock and once after
+    assert len(closed) == 2 and all(pack._map.closed for pack in closed)
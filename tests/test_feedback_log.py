@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from app.utils.feedback import FeedbackLog, JsonlFeedbackSink, feedback_record
+from feedback_tool import compact_records, read_jsonl, rewrite_jsonl
+
+def record(feedback, question="Fees?", session_id="s1", timestamp=1.0):
+    return {"timestamp": timestamp, "feedback": feedback, "question": question, "answer": "R100",
+            "session_id": session_id, "sources": []}
+
+def lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def test_flush_writes_queued_records_in_batches(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+
+    async def run():
+        log = FeedbackLog(JsonlFeedbackSink(str(path)), batch_size=2, flush_interval=60)
+        for i in range(5):
+            assert log.submit(record("helpful", question=f"q{i}", timestamp=i))
+        await log.flush()
+        assert log.written == 5
+        assert log.stats()["pending"] == 0
+        await log.close()
+
+    asyncio.run(run())
+    assert [r["question"] for r in lines(path)] == ["q0", "q1", "q2", "q3", "q4"]
+
+def test_full_queue_drops_records(tmp_path):
+    log = FeedbackLog(JsonlFeedbackSink(str(tmp_path / "feedback.jsonl")), max_pending=2)
+    assert log.submit(record("helpful"))
+    assert log.submit(record("helpful"))
+    assert not log.submit(record("helpful"))
+    assert log.dropped == 1
+
+def test_compaction_keeps_latest_rating_and_later_appends(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    sink = JsonlFeedbackSink(str(path))
+    sink.write([record("helpful", timestamp=1), record("not-helpful", timestamp=2),
+                record("helpful", session_id=None, timestamp=3), record("bogus", timestamp=4)])
+
+    records, read_size = read_jsonl(sink)
+    compacted = compact_records(records)
+    assert [r["feedback"] for r in compacted] == ["not-helpful", "helpful"]
+
+    # The app appends between the read and the rewrite; the record must survive
+    sink.write([record("helpful", question="Uniform?", timestamp=5)])
+    rewrite_jsonl(str(path), compacted, read_size)
+    assert [(r["question"], r["feedback"]) for r in lines(path)] == [
+        ("Fees?", "not-helpful"), ("Fees?", "helpful"), ("Uniform?", "helpful")]
+
+    # The sink notices the replaced file and appends to it, not the unlinked one
+    sink.write([feedback_record("Hours?", "8-3", "helpful", [], "s2")])
+    assert lines(path)[-1]["question"] == "Hours?"
+    sink.close()
@@ -0,0 +1,27 @@
+from app.utils.feedback import count_by_source, feedback_record, source_key
+from app.utils.feedback_priors import FeedbackPriors, prior_boost
+
+from build_feedback_priors import boosts
+
+def web_chunk(url):
+    return {"metadata": {"source_file": "web_data.json", "url": url, "source_type": "web"}}
+
+def test_source_key_prefers_url_filename_and_title_over_source_file():
+    assert source_key(web_chunk("https://starcollege.co.za/fees")) == "https://starcollege.co.za/fees"
+    assert source_key({"metadata": {"source_file": "uploads_data.json", "filename": "report.pdf"}}) == "report.pdf"
+    assert source_key({"metadata": {"source_file": "sample_data.json", "title": "About"}}) == "About"
+    assert source_key({"metadata": {"source_file": "sample_data.json"}}) == "sample_data.json"
+    assert source_key({"metadata": {}}) is None
+
+def test_urls_from_the_same_file_get_different_priors():
+    fees, sport = web_chunk("https://starcollege.co.za/fees"), web_chunk("https://starcollege.co.za/sport")
+    records = (
+        [feedback_record("fees?", "answer", "helpful", [fees]) for _ in range(3)]
+        + [feedback_record("sport?", "answer", "not-helpful", [sport]) for _ in range(3)]
+    )
+    sources = boosts(count_by_source(records), min_votes=2, prior_votes=4.0, strength=0.1)
+    assert "web_data.json" not in sources
+
+    priors = FeedbackPriors(sources=sources)
+    assert priors.boost(fees["metadata"]) == round(prior_boost(3, 0, 4.0, 0.1), 3) > 1.0
+    assert priors.boost(sport["metadata"]) == round(prior_boost(0, 3, 4.0, 0.1), 3) < 1.0
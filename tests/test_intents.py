@@ -0,0 +1,51 @@
+import json
+import os
+import random
+
+import pytest
+
+from app.utils.intents import IntentRouter, with_field
+from benchmarks.load_test import DEFAULT_QUESTIONS, load_questions
+
+# The routing /chat did inline before data/intents.json
+WELCOME_TRIGGERS = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening", "greetings"]
+QUICK_ANSWERS = {
+    "what is star college": "what_is_star_college",
+    "where is star college": "where_is_star_college",
+    "matric results": "matric_results",
+    "schools": "schools",
+}
+
+def baseline_route(message):
+    message_lower = message.lower().strip()
+    if any(trigger in message_lower for trigger in WELCOME_TRIGGERS) and len(message.split()) <= 3:
+        return "welcome"
+    for key, name in QUICK_ANSWERS.items():
+        if key in message_lower:
+            return name
+    return None
+
+def random_messages(count, seed=1):
+    words = ["hello", "hi", "there", "what", "is", "star", "college", "where", "matric", "results", "schools",
+             "good", "morning", "evening", "greetings", "fees", "this", "history", "Hey", "WHAT", "IS"]
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(words) for _ in range(rng.randrange(1, 7))) for _ in range(count)]
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter.from_file(os.path.join(os.path.dirname(__file__), "..", "data", "intents.json"))
+
+def test_routes_like_the_inline_rules(router):
+    messages = load_questions(DEFAULT_QUESTIONS) + random_messages(5000) + [
+        "Hi", "  hello  ", "Hello, what is Star College?", "Where is Star College located?", "Tell me about the schools",
+        "This is a long question that says hello", "Good evening everyone", "Whichever", "",
+    ]
+    for message in messages:
+        intent = router.match(message)
+        assert (intent.name if intent else None) == baseline_route(message), message
+
+def test_payload_carries_the_answer_and_school(router):
+    intent = router.match("where is star college")
+    body = json.loads(with_field(router.payload(intent, "primary", verbose=True), "session_id", "s1"))
+    assert body["answer"] == intent.answer and body["session_id"] == "s1"
+    assert body["metadata"]["school_context"] == "primary"
@@ -0,0 +1,34 @@
+import asyncio
+import json
+
+import api.index as index
+from app.utils.knowledge_base import KnowledgeBase, KnowledgeBaseSnapshot
+
+ITEMS = [{"text": "Star College was founded in 1991.", "metadata": {"source_file": "sample_data.json"}}]
+
+def test_reload_keeps_the_snapshot_when_the_version_is_unchanged():
+    versions = iter(["v1", "v1", "v2"])
+    kb = KnowledgeBase(lambda initial: KnowledgeBaseSnapshot(version=next(versions), items=[]), lambda: [], 0)
+    first = kb.current
+
+    changed, snapshot = asyncio.run(kb.reload())
+    assert not changed and snapshot is first and kb.current is first and kb.reloads == 0
+
+    changed, snapshot = asyncio.run(kb.reload())
+    assert changed and snapshot.version == "v2" and kb.current is snapshot and kb.reloads == 1
+
+def test_version_covers_priors_and_answer_store(tmp_path, monkeypatch):
+    priors = tmp_path / "feedback_priors.json"
+    monkeypatch.setattr(index, "FEEDBACK_PRIORS_PATH", str(priors))
+    monkeypatch.setattr(index, "ANSWER_STORE_PATH", str(tmp_path / "answer_store.json"))
+
+    def build():
+        return index.build_snapshot(items=[dict(item, metadata=dict(item["metadata"])) for item in ITEMS])
+
+    before = build()
+    assert build().version == before.version
+    priors.write_text(json.dumps({"version": 2, "chunks": {}, "sources": {"sample_data.json": 1.1}}))
+    after = build()
+    assert after.version != before.version
+    # Answer stores are matched against the chunks alone
+    assert after.extras["corpus_version"] == before.extras["corpus_version"]
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+import api.index as index
+from app.utils.corpus_pack import CorpusPack, write_pack
+from app.utils.metadata_filter import FILTER_KEYS, all_of, bitmap_ids, compile_where, ids_bitmap, matches, url_domain
+
+@pytest.mark.parametrize("where, compiled", [
+    (None, None),
+    ({}, None),
+    ({"source_type": "file"}, {"source_type": {"$eq": "file"}}),
+    ({"page": {"$gte": 2, "$lte": 5}}, {"$and": [{"page": {"$gte": 2}}, {"page": {"$lte": 5}}]}),
+    ({"source_type": "file", "file_type": {"$in": ["pdf", "docx"]}},
+     {"$and": [{"source_type": {"$eq": "file"}}, {"file_type": {"$in": ["pdf", "docx"]}}]}),
+    ({"$or": [{"domain": "starcollege.co.za"}, {"filename": "a.pdf", "page": 1}]},
+     {"$or": [{"domain": {"$eq": "starcollege.co.za"}},
+              {"$and": [{"filename": {"$eq": "a.pdf"}}, {"page": {"$eq": 1}}]}]}),
+    # Chroma wants two or more filters under $and/$or
+    ({"$and": [{"school": "primary"}]}, {"school": {"$eq": "primary"}}),
+])
+def test_compile_where_produces_chromas_explicit_form(where, compiled):
+    assert compile_where(where) == compiled
+
+@pytest.mark.parametrize("where", [
+    "file", {"page": {"$gt": "2"}}, {"page": {"$near": 2}}, {"file_type": {"$in": []}},
+    {"$or": []}, {"$or": [{}]}, {"$not": {"page": 1}}, {"page": {}},
+])
+def test_malformed_filters_are_rejected(where):
+    with pytest.raises(ValueError):
+        compile_where(where)
+
+def test_all_of_combines_filters():
+    assert all_of(None, {}) is None
+    assert all_of({"school": "primary"}) == {"school": {"$eq": "primary"}}
+    assert all_of({"school": "primary"}, None, {"page": 1}) == {
+        "$and": [{"school": {"$eq": "primary"}}, {"page": {"$eq": 1}}]}
+
+def test_matches_follows_chroma_semantics():
+    metadata = {"source_type": "file", "page": 3, "flag": True}
+    assert matches(compile_where({"page": {"$gt": 2}}), metadata)
+    # A comparison needs the key, even $ne and $nin
+    assert not matches(compile_where({"url": {"$ne": "x"}}), metadata)
+    assert not matches(compile_where({"url": {"$nin": ["x"]}}), metadata)
+    # Ranges only compare numbers, and booleans are not numbers
+    assert not matches(compile_where({"flag": {"$gte": 0}}), metadata)
+    assert not matches(compile_where({"source_type": {"$lt": 5}}), metadata)
+
+def test_bitmaps_round_trip():
+    chunks = sorted(random.Random(1).sample(range(5000), 300))
+    assert bitmap_ids(ids_bitmap(chunks, 5000)) == chunks
+    assert bitmap_ids(0) == []
+
+def test_url_domain():
+    assert url_domain("https://WWW.StarCollege.co.za/about?x=1") == "starcollege.co.za"
+    assert url_domain("not a url") == ""
+
+@pytest.mark.parametrize("index_keys", [FILTER_KEYS, ()])
+def test_corpus_filters_agree_with_matches(tmp_path, index_keys):
+    rng = random.Random(2)
+    items = [{"text": f"chunk {i}", "metadata": {
+        "source_type": rng.choice(["file", "web"]), "page": rng.randrange(10), "filename": f"f{rng.randrange(5)}.pdf",
+        **({"url": "https://starcollege.co.za/x"} if rng.random() < 0.3 else {}),
+    }} for i in range(500)]
+    store = index.build_snapshot(items=[dict(item, metadata=dict(item["metadata"])) for item in items]).items
+    # Without index keys the pack scans the metadata of a key on first use
+    write_pack(str(tmp_path / "corpus.pack"), items, index_keys=index_keys)
+    pack = CorpusPack(str(tmp_path / "corpus.pack"))
+    for where in [{"source_type": "web"}, {"page": {"$gte": 3, "$lt": 7}}, {"filename": {"$nin": ["f1.pdf", "f2.pdf"]}},
+                  {"$or": [{"url": {"$ne": ""}}, {"page": 0}]}, {"page": {"$in": [1, 2]}, "source_type": "file"}]:
+        compiled = compile_where(where)
+        expected = [i for i, item in enumerate(items) if matches(compiled, item["metadata"])]
+        assert store.filter(where) == expected, where
+        assert pack.filter(where) == expected, where
@@ -0,0 +1,23 @@
+import pytest
+
+import api.index as index
+from app.utils.schools import SHARED, school_filter, school_where, tag_school
+
+@pytest.mark.parametrize("selected, school", [
+    ("all", None), ("All Star College Schools", None), ("", None), (None, None),
+    ("boys-high", "boys-high"), ("Star College Durban Girls High", "girls-high"),
+    ("Little Dolphin Star Pre-Primary School", "pre-primary"),
+])
+def test_school_filter_normalises_select_values_and_names(selected, school):
+    assert school_filter(selected) == school
+
+def test_prompt_focuses_only_on_a_selected_school():
+    assert "SPECIFIC FOCUS" not in index.build_user_prompt(["context"], "Fees?", "all")
+    prompt = index.build_user_prompt(["context"], "Fees?", "primary")
+    assert "SPECIFIC FOCUS: Prioritize information about Star College Durban Primary" in prompt
+
+def test_tagging_and_where():
+    assert tag_school("The Boys High rugby team won.") == "boys-high"
+    assert tag_school("Our high schools offer rugby.") == SHARED
+    assert school_where("girls-high") == {"school": {"$in": ["girls-high", SHARED]}}
+    assert school_where("all") is None
@@ -0,0 +1,35 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.utils.text_splitter import OffsetTextSplitter
+
+WORDS = ["Star", "College", "matric", "pass", "rate", "fees", "Durban", "a", "the", "extraordinarily-long-hyphenated-word"]
+
+def random_text(rng: random.Random, length: int) -> str:
+    parts = []
+    while sum(map(len, parts)) < length:
+        parts.append(rng.choice(WORDS))
+        parts.append(rng.choice([" ", " ", " ", "  ", "\n", "\n\n", " \n ", "\n\n\n"]))
+    return "".join(parts)
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(20, 0), (50, 10), (100, 30), (200, 200), (1000, 200)])
+def test_chunks_match_langchain(chunk_size, chunk_overlap):
+    rng = random.Random(chunk_size)
+    ours = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    langchain = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for _ in range(50):
+        text = random_text(rng, rng.randrange(0, chunk_size * 6))
+        assert ours.split_text(text) == langchain.split_text(text)
+
+def test_offsets_point_into_the_text():
+    text = "First paragraph about fees.\n\nSecond paragraph, a little longer, about the matric pass rate."
+    splitter = OffsetTextSplitter(chunk_size=40, chunk_overlap=10)
+    offsets = splitter.split_offsets(text)
+    assert [text[start:end] for start, end in offsets] == splitter.split_text(text)
+    assert all(0 <= start < end <= len(text) for start, end in offsets)
+
+def test_overlap_larger_than_chunk_size_is_rejected():
+    with pytest.raises(ValueError):
+        OffsetTextSplitter(chunk_size=10, chunk_overlap=20)